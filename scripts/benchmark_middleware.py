@@ -0,0 +1,102 @@
+"""
+Measures the per-request overhead of the middleware stack on a trivial endpoint.
+
+Compares six ``BaseHTTPMiddleware`` layers setting a state value each (the old stack)
+against six pure ASGI ``StateMiddleware`` layers doing the same.
+The app is called directly without a server to leave out the network.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_middleware.py [requests]
+"""
+import asyncio
+import sys
+from time import perf_counter_ns
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import PlainTextResponse
+
+from muistot.middleware.base import StateMiddleware
+
+LAYERS = 6
+
+
+class OldMiddleware(BaseHTTPMiddleware):
+
+    async def dispatch(self, request, call_next):
+        request.state.value = 1
+        return await call_next(request)
+
+
+class NewMiddleware(StateMiddleware):
+
+    def state(self, scope):
+        return dict(value=1)
+
+
+def create_app(middleware=None):
+    app = Starlette()
+
+    @app.route("/")
+    async def index(_):
+        return PlainTextResponse("ok")
+
+    if middleware is not None:
+        for _ in range(LAYERS):
+            app.add_middleware(middleware)
+    return app
+
+
+async def run(app, n: int) -> float:
+    """Average time per request in microseconds
+    """
+
+    def receiver():
+        messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+        async def receive():
+            try:
+                return next(messages)
+            except StopIteration:
+                # Like a server, block until the client goes away
+                await asyncio.Future()
+
+        return receive
+
+    async def send(_):
+        pass
+
+    def scope():
+        return {
+            "type": "http",
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": "/",
+            "raw_path": b"/",
+            "root_path": "",
+            "query_string": b"",
+            "headers": [],
+            "client": ("127.0.0.1", 1234),
+            "server": ("test", 80),
+        }
+
+    for _ in range(min(n, 1000)):
+        await app(scope(), receiver(), send)
+    start = perf_counter_ns()
+    for _ in range(n):
+        await app(scope(), receiver(), send)
+    return (perf_counter_ns() - start) / n / 1E3
+
+
+async def main(n: int):
+    base = await run(create_app(), n)
+    print(f"{'no middleware':>20}: {base:8.1f} us/request")
+    for name, middleware in [("BaseHTTPMiddleware", OldMiddleware), ("StateMiddleware", NewMiddleware)]:
+        t = await run(create_app(middleware), n)
+        print(f"{name:>20}: {t:8.1f} us/request ({t - base:+.1f} us overhead for {LAYERS} layers)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000))
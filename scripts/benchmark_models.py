@@ -0,0 +1,61 @@
+"""
+Measures the CPU spent turning site rows into a serialized Sites response.
+
+Compares validating the models from the rows and again against the response model,
+like FastAPI does for a returned model, against constructing them from trusted rows.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_models.py [sites]
+"""
+import sys
+from datetime import datetime
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+
+from muistot.backend.models import Site, SiteInfo, Point, Sites, from_row
+from muistot.database.resultset import ResultSet
+
+
+def rows(n: int):
+    index = {k: i for i, k in enumerate([
+        "id", "lon", "lat", "lang", "name", "abstract", "description", "image",
+        "memories_count", "waiting_approval", "own", "creator", "modifier", "modified_at",
+    ])}
+    return [
+        ResultSet.of(index, (
+            f"site-{i}", 25.0, 65.0, "fi", f"Site {i}", ("Abstract " * 10).strip(), None, None,
+            i % 10, 0, 1, "creator", None, datetime.utcnow(),
+        ))
+        for i in range(n)
+    ]
+
+
+def validated(data):
+    sites = Sites(items=[Site(location=Point(**m), info=SiteInfo(**m), **m) for m in data])
+    # FastAPI re-validates returned models against the response model
+    content = Sites(**sites.dict(exclude_none=True))
+    return jsonable_encoder(content, exclude_none=True)
+
+
+def constructed(data):
+    sites = Sites.construct(items=[
+        from_row(Site, m, location=from_row(Point, m), info=from_row(SiteInfo, m))
+        for m in data
+    ])
+    return jsonable_encoder(sites, exclude_none=True)
+
+
+def main(n: int):
+    data = rows(n)
+    assert validated(data[:10]) == constructed(data[:10])
+    for name, f in [("validated", validated), ("constructed", constructed)]:
+        start = perf_counter()
+        f(data)
+        elapsed = perf_counter() - start
+        print(f"{name:>12}: {elapsed * 1E3:8.1f} ms ({elapsed / n * 1E6:.1f} us/site)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
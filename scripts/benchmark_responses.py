@@ -0,0 +1,54 @@
+"""
+Measures rendering a large Sites listing into a response body.
+
+Compares the stdlib JSONResponse after jsonable_encoder against ORJSONResponse on the models.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_responses.py [sites]
+"""
+import json
+import sys
+from time import perf_counter
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from muistot.backend.api.utils import ORJSONResponse
+from muistot.backend.models import Site, SiteInfo, Point, Sites
+
+
+def sites(n: int) -> Sites:
+    return Sites.construct(items=[
+        Site.construct(
+            id=f"site-{i}",
+            location=Point.construct(lon=25.0 + i / n, lat=65.0),
+            info=SiteInfo.construct(lang="fi", name=f"Site {i}", abstract="Abstract " * 10),
+            memories_count=i % 10,
+            own=False,
+            creator="creator",
+        )
+        for i in range(n)
+    ])
+
+
+def stdlib(content):
+    return JSONResponse(jsonable_encoder(content, exclude_none=True)).body
+
+
+def orjson(content):
+    return ORJSONResponse(content).body
+
+
+def main(n: int):
+    content = sites(n)
+    assert json.loads(stdlib(content)) == json.loads(orjson(content))
+    for name, f in [("json", stdlib), ("orjson", orjson)]:
+        start = perf_counter()
+        f(content)
+        elapsed = perf_counter() - start
+        print(f"{name:>8}: {elapsed * 1E3:8.1f} ms ({elapsed / n * 1E6:.1f} us/site)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
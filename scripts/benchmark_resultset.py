@@ -0,0 +1,68 @@
+"""
+Measures allocations and time for turning fetched rows into ResultSets.
+
+Compares the previous ResultSet, which copied every row into a dict and a list,
+against the current one sharing a column index between the rows of a result.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_resultset.py [rows]
+"""
+import sys
+import tracemalloc
+from time import perf_counter
+
+from muistot.database.resultset import ResultSet
+
+COLUMNS = [
+    "id", "name", "lat", "lon", "image", "published", "lang", "name_fi", "abstract", "description",
+    "memories_count", "creator", "modified_at",
+]
+
+
+class CopyingResultSet:
+    """The previous implementation
+    """
+
+    def __init__(self, items):
+        self.dict = dict()
+        self.list = list()
+        for k, v in items:
+            self.dict[k] = v
+            self.list.append(v)
+        self.values = self.dict.values
+        self.items = self.dict.items
+        self.get = self.dict.get
+        self.count = self.list.count
+        self.__reversed__ = self.list.__reversed__
+
+
+def copying(keys, rows):
+    return [CopyingResultSet(zip(keys, row)) for row in rows]
+
+
+def sharing(keys, rows):
+    index = {k: i for i, k in enumerate(keys)}
+    return [ResultSet.of(index, row) for row in rows]
+
+
+def measure(f, keys, rows):
+    tracemalloc.start()
+    start = perf_counter()
+    result = f(keys, rows)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak
+
+
+def main(n: int):
+    rows = [tuple(f"{c}-{i}" if c != "id" else i for c in COLUMNS) for i in range(n)]
+    for name, f in [("dict + list copy", copying), ("shared index", sharing)]:
+        elapsed, peak = measure(f, COLUMNS, rows)
+        print(f"{name:>18}: {elapsed * 1E3:8.1f} ms {peak / 2 ** 20:8.1f} MiB peak ({peak / n:.0f} B/row)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
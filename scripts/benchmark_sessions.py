@@ -0,0 +1,79 @@
+"""
+Measures the Redis memory footprint of sessions and the time to sweep their indexes.
+
+Writes the same keys ``SessionManager.start_session`` does for many sessions spread over users,
+with a share of them already expired in the user index, then reports ``used_memory``
+per session and how long a full ``SessionManager.sweep`` takes.
+
+Needs a running Redis, the selected database is flushed.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_sessions.py [redis_url] [sessions] [sessions_per_user]
+"""
+import asyncio
+import dataclasses
+import json
+import secrets
+import sys
+import time
+from hashlib import sha256
+from time import perf_counter
+
+from redis.asyncio import Redis
+
+from muistot.security.sessions import SessionManager, Session, USER_PREFIX, TOKEN_PREFIX
+
+BATCH = 10_000
+LIFETIME = 60 * 16
+EXPIRED_SHARE = 0.5
+
+
+async def used_memory(redis: Redis) -> int:
+    return (await redis.info("memory"))["used_memory"]
+
+
+async def fill(redis: Redis, n: int, per_user: int):
+    now = time.time()
+    for start in range(0, n, BATCH):
+        async with redis.pipeline(transaction=False) as pipe:
+            for i in range(start, min(start + BATCH, n)):
+                user = f"user-{i // per_user}"
+                token_hash = sha256(TOKEN_PREFIX + secrets.token_bytes(32)).digest()
+                expired = (i % per_user) < per_user * EXPIRED_SHARE
+                if not expired:
+                    session = Session(user=user, data=dict(scopes=["auth"], projects=[]))
+                    pipe.set(token_hash, json.dumps(dataclasses.asdict(session)), ex=LIFETIME)
+                pipe.zadd(f"{USER_PREFIX}{user}", {token_hash: now - 1 if expired else now + LIFETIME})
+            await pipe.execute()
+
+
+async def main(url: str, n: int, per_user: int):
+    redis = Redis.from_url(url)
+    try:
+        await redis.flushdb()
+        baseline = await used_memory(redis)
+
+        start = perf_counter()
+        await fill(redis, n, per_user)
+        elapsed = perf_counter() - start
+        filled = await used_memory(redis)
+        print(f"   fill: {elapsed:8.2f} s, {(filled - baseline) / n:6.1f} B/session ({(filled - baseline) / 2 ** 20:.1f} MiB)")
+
+        manager = SessionManager(redis=redis, token_bytes=32, lifetime=LIFETIME)
+        start = perf_counter()
+        removed = await manager.sweep()
+        elapsed = perf_counter() - start
+        swept = await used_memory(redis)
+        print(f"  sweep: {elapsed:8.2f} s, {removed} expired index entries, {(filled - swept) / 2 ** 20:.1f} MiB freed")
+    finally:
+        await redis.flushdb()
+        await redis.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(
+        sys.argv[1] if len(sys.argv) > 1 else "redis://localhost:6379/15",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1_000_000,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 4,
+    ))
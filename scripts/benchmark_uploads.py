@@ -0,0 +1,92 @@
+"""
+Measures concurrent base64 image handling and how long it blocks the event loop.
+
+Compares decoding, type checking and writing on the event loop against the file workers.
+A ticker task runs alongside the uploads and records the longest gap between its ticks.
+
+Usage:
+
+    PYTHONPATH=src python scripts/benchmark_uploads.py [uploads] [image]
+"""
+import asyncio
+import sys
+import tempfile
+from base64 import b64encode
+from pathlib import Path
+from time import perf_counter
+
+from muistot.config import Config
+from muistot.files import files
+from muistot.files.files import Files, check_file, write
+
+SAMPLE_IMAGE = Path(__file__).parent.parent / "src" / "test" / "server" / "backend" / "integration" / "sample_image.jpg"
+
+
+class User:
+    is_authenticated = True
+    identity = "benchmark"
+
+
+class DB:
+
+    def __init__(self):
+        self.id = 0
+
+    async def fetch_one(self, *_, **__):
+        self.id += 1
+        return [self.id, f"image-{self.id}.jpeg"]
+
+
+class Inline(Files):
+    """The handling before the file workers"""
+
+    async def handle(self, file_data):
+        data, file_type = check_file(file_data)
+        image_id, file_name = await self._insert(file_type)
+        write(self.path(file_name), data)
+        return image_id
+
+
+async def ticker(stop: asyncio.Event, gaps: list):
+    last = perf_counter()
+    while not stop.is_set():
+        await asyncio.sleep(0.001)
+        now = perf_counter()
+        gaps.append(now - last)
+        last = now
+
+
+async def run(cls, n: int, data: str):
+    handler = cls(DB(), User())
+    stop = asyncio.Event()
+    gaps = []
+    tick = asyncio.create_task(ticker(stop, gaps))
+    await asyncio.sleep(0.01)
+    start = perf_counter()
+    await asyncio.gather(*(handler.handle(data) for _ in range(n)))
+    elapsed = perf_counter() - start
+    stop.set()
+    await tick
+    return elapsed, max(gaps)
+
+
+def main(n: int, image: Path):
+    with open(image, "rb") as f:
+        data = b64encode(f.read()).decode("ascii")
+    Config.files.backlog = n
+    with tempfile.TemporaryDirectory() as location:
+        Config.files.location = Path(location)
+        for name, cls in [("inline", Inline), ("workers", Files)]:
+            files.workers = files.Workers()
+            elapsed, stall = asyncio.run(run(cls, n, data))
+            print(
+                f"{name:>8}: {elapsed * 1E3:8.1f} ms total"
+                f" ({n / elapsed:6.1f} uploads/s, longest loop stall {stall * 1E3:6.1f} ms)"
+            )
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 64,
+        Path(sys.argv[2]) if len(sys.argv) > 2 else SAMPLE_IMAGE,
+    )
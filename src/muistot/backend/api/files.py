@@ -1,11 +1,15 @@
 from textwrap import dedent
 
-from fastapi import Path, status, Request
+from fastapi import Depends, Path, status, Request
 from fastapi.responses import FileResponse, Response
 from headers import LOCATION
 
-from .utils import make_router
+from .utils import make_router, require_auth, d, ORJSONResponse
+from .utils.common_responses import UNAUTHENTICATED
+from ...database import Database
 from ...files import Files
+from ...middleware import DatabaseMiddleware, SessionMiddleware, RateLimitMiddleware
+from ...security import scopes, User
 
 router = make_router(tags=["Files"])
 
@@ -65,3 +69,61 @@ async def get_image(r: Request, image: str = Path(..., regex=Files.PATH.pattern)
         )
     else:
         return FileResponse(path=image.path, media_type=image.mime)
+
+
+@router.post(
+    "/images",
+    description=dedent(
+        """
+        Uploads an image as multipart form data.
+        
+        The returned image name can be used in place of base64 data in the image field of new or modified entities.
+        """
+    ),
+    response_class=ORJSONResponse,
+    status_code=201,
+    responses={
+        201: {
+            "description": "The image was uploaded",
+            "headers": {
+                LOCATION: {"description": "Path to the uploaded image", "type": "string"}
+            },
+            "content": {
+                "application/json": {
+                    "example": {"id": 1, "image": "1dc15d85-8433-11ec-8f55-0242ac140005.jpg"}
+                }
+            },
+        },
+        400: d("The file is missing or not an allowed image"),
+        401: UNAUTHENTICATED,
+        413: d("The file is too large"),
+        429: d("Too many uploads"),
+    },
+    dependencies=[RateLimitMiddleware.limit("upload", rate=1 / 6, burst=10)],
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {
+                "multipart/form-data": {
+                    "schema": {
+                        "type": "object",
+                        "properties": {"file": {"type": "string", "format": "binary"}},
+                        "required": ["file"],
+                    }
+                }
+            },
+        }
+    },
+)
+@require_auth(scopes.AUTHENTICATED)
+async def upload_image(
+        r: Request,
+        db: Database = Depends(DatabaseMiddleware.default),
+        user: User = Depends(SessionMiddleware.user),
+):
+    image_id, image = await Files(db, user).upload(r)
+    return ORJSONResponse(
+        {"id": image_id, "image": image},
+        status_code=status.HTTP_201_CREATED,
+        headers={LOCATION: r.url_for("get_image", image=image)},
+    )
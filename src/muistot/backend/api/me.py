@@ -1,9 +1,8 @@
 from textwrap import dedent
 
 from fastapi import Response, Depends
-from fastapi.responses import JSONResponse
 
-from .utils import make_router, d, require_auth
+from .utils import make_router, d, require_auth, ORJSONResponse
 from .utils.common_responses import UNAUTHENTICATED, UNAUTHORIZED
 from ..models import EmailStr, UID, UserData, PatchUser
 from ..services.me import (
@@ -23,7 +22,7 @@ router = make_router(tags=["Me"], default_response_class=Response)
 @router.get(
     "/me",
     response_model=UserData,
-    response_class=JSONResponse,
+    response_class=ORJSONResponse,
     responses={
         401: UNAUTHENTICATED,
         403: UNAUTHORIZED,
@@ -139,7 +138,7 @@ async def log_me_out(
         user: User = Depends(SessionMiddleware.user),
         sm: SessionManager = Depends(SessionMiddleware.get),
 ):
-    sm.end_session(user.token)
+    await sm.end_session(user.token)
 
 
 @router.delete(
@@ -156,4 +155,4 @@ async def log_me_out_all(
         user: User = Depends(SessionMiddleware.user),
         sm: SessionManager = Depends(SessionMiddleware.get),
 ):
-    sm.clear_sessions(user.identity)
+    await sm.clear_sessions(user.identity)
@@ -1,10 +1,29 @@
 from textwrap import dedent
-
-from fastapi import Request, Response
-
-from .utils import make_router, rex, deleted, modified, created, sample, require_auth, Repo
+from typing import Optional
+
+from fastapi import Request, Response, Depends
+from pydantic import conint
+
+from .utils import (
+    make_router,
+    rex,
+    deleted,
+    modified,
+    created,
+    sample,
+    require_auth,
+    Repo,
+    cached,
+    cacheable,
+    parse_fields,
+    page,
+    stream,
+    MAX_PAGE_SIZE,
+)
 from ..models import Memory, Memories, SID, PID, MID, NewMemory, ModifiedMemory
 from ..repos import MemoryRepo
+from ...cache import ResponseCache
+from ...middleware.cache import CacheMiddleware
 from ...security import scopes
 
 router = make_router(tags=["Memories"])
@@ -18,14 +37,32 @@ router = make_router(tags=["Memories"])
         Returns all memories for a single site.
         
         Optionally returns all comments with the memories.
+        
+        Memories can be paged with `limit`.
+        Pages are ordered by id and a full page returns a `next` cursor to be used as `after` for the next page.
+        
+        The returned fields can be limited with `fields` e.g. `fields=title,user`.
+        The id is always returned.
         """
     ),
     responses=rex.gets(Memories),
 )
 async def get_memories(
+        r: Request,
+        after: Optional[MID] = None,
+        limit: Optional[conint(ge=1, le=MAX_PAGE_SIZE)] = None,
+        fields: Optional[str] = None,
         repo: MemoryRepo = Repo(MemoryRepo),
+        cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Memories:
-    return Memories(items=await repo.all())
+    fields = parse_fields(fields, MemoryRepo.fields)
+
+    async def producer():
+        if after is not None or limit is not None or cacheable(r, cache, repo):
+            return page(Memories, await repo.all(after=after, limit=limit, fields=fields), limit, fields)
+        return stream(await repo.stream(fields=fields))
+
+    return await cached(r, cache, repo, "memories", producer)
 
 
 @router.get(
@@ -41,10 +78,15 @@ async def get_memories(
     responses=rex.get(Memory),
 )
 async def get_memory(
+        r: Request,
         memory: MID,
         repo: MemoryRepo = Repo(MemoryRepo),
+        cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Memory:
-    return await repo.one(memory)
+    async def producer():
+        return await repo.one(memory)
+
+    return await cached(r, cache, repo, "memory", producer, store=False)
 
 
 @router.post(
@@ -13,9 +13,12 @@ from .utils import (
     d,
     require_auth,
     Repo,
+    cached,
 )
 from ..models import PID, Project, Projects, NewProject, ModifiedProject, UID
 from ..repos import ProjectRepo
+from ...cache import ResponseCache
+from ...middleware.cache import CacheMiddleware
 from ...middleware.language import LanguageMiddleware, LanguageChecker
 from ...security import scopes
 
@@ -36,9 +39,14 @@ router = make_router(tags=["Projects"])
     responses=dict(filter(lambda e: e[0] != 404, rex.gets(Projects).items())),
 )
 async def get_projects(
+    r: Request,
     repo: ProjectRepo = Repo(ProjectRepo),
+    cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Projects:
-    return Projects(items=await repo.all())
+    async def producer():
+        return Projects.construct(items=await repo.all())
+
+    return await cached(r, cache, repo, "projects", producer)
 
 
 @router.get(
@@ -59,10 +67,15 @@ async def get_projects(
     ),
 )
 async def get_project(
+    r: Request,
     project: PID,
     repo: ProjectRepo = Repo(ProjectRepo),
+    cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Project:
-    return await repo.one(project)
+    async def producer():
+        return await repo.one(project)
+
+    return await cached(r, cache, repo, "project", producer, store=False)
 
 
 @router.post(
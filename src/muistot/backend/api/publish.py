@@ -1,3 +1,4 @@
+from functools import partial
 from textwrap import dedent
 from typing import Literal, Optional, Dict, Union
 
@@ -6,8 +7,9 @@ from pydantic import BaseModel, root_validator
 
 from .utils import make_router, sample, d, require_auth
 from ..models import SID, PID, MID
+from ...cache import ResponseCache
 from ...database import Database
-from ...middleware import DatabaseMiddleware, SessionMiddleware
+from ...middleware import DatabaseMiddleware, SessionMiddleware, CacheMiddleware, RateLimitMiddleware
 from ...security import scopes, User
 
 router = make_router(tags=["Admin"])
@@ -209,6 +211,7 @@ async def publish(
         order: PUPOrder = sample(PUPOrder),
         db: Database = Depends(DatabaseMiddleware.default),
         user: User = Depends(SessionMiddleware.user),
+        cache: ResponseCache = Depends(CacheMiddleware.get),
 ):
     project = order.identifier if order.type == "project" else order.parents["project"]
     if not user.is_admin_in(project):
@@ -231,6 +234,8 @@ async def publish(
     )
     if await db.fetch_val("SELECT ROW_COUNT()") == 1:
         resp.status_code = status.HTTP_204_NO_CONTENT
+        if cache is not None:
+            db.on_commit(partial(cache.invalidate, project, listing=order.type != "memory"))
     else:
         resp.status_code = status.HTTP_304_NOT_MODIFIED
 
@@ -267,7 +272,9 @@ class ReportOrder(OrderBase):
         404: d("Parents were not found"),
         422: d("Invalid entity"),
         403: d("Session token is invalid or user lacks privileges"),
+        429: d("Too many reports"),
     },
+    dependencies=[RateLimitMiddleware.limit("report", rate=1 / 6, burst=20)],
 )
 @require_auth(scopes.AUTHENTICATED)
 async def report(
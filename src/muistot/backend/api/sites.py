@@ -4,15 +4,41 @@ from typing import Optional
 from fastapi import HTTPException, status, Request, Response, Depends
 from pydantic import conint, confloat
 
-from .utils import make_router, rex, deleted, modified, created, sample, require_auth, Repo
-from ..models import SID, PID, Site, Sites, NewSite, ModifiedSite
+from .utils import (
+    make_router,
+    rex,
+    deleted,
+    modified,
+    created,
+    sample,
+    require_auth,
+    Repo,
+    cached,
+    cacheable,
+    parse_fields,
+    page,
+    stream,
+    MAX_PAGE_SIZE,
+)
+from ..models import SID, PID, Site, Sites, NewSite, ModifiedSite, BoundingBox, Clusters
 from ..repos import SiteRepo
+from ...cache import ResponseCache
+from ...middleware.cache import CacheMiddleware
 from ...middleware.language import LanguageMiddleware, LanguageChecker
 from ...security import scopes
 
 router = make_router(tags=["Sites"])
 
 
+def parse_bbox(bbox: Optional[str]) -> Optional[BoundingBox]:
+    if bbox is None:
+        return None
+    try:
+        return BoundingBox.parse(bbox)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Bad Bounding Box")
+
+
 @router.get(
     "/projects/{project}/sites",
     response_model=Sites,
@@ -20,23 +46,77 @@ router = make_router(tags=["Sites"])
         """
         Returns all sites for the current project.
         
-        This endpoint can be used in return-all or return nearest mode.
+        This endpoint can be used in return-all, return nearest or bounding box mode.
         The return nearest mode is useful if the project has a lot of projects.
-        Either all the query parameters have to be specified or none of them.
+        Either all the nearest mode query parameters have to be specified or none of them.
+        
+        The bounding box mode returns the sites in the current viewport of a map.
+        The box is given as `bbox=minLon,minLat,maxLon,maxLat` and can't be combined with the nearest mode.
+        
+        Sites can be paged with `limit` outside the nearest mode.
+        Pages are ordered by id and a full page returns a `next` cursor to be used as `after` for the next page.
+        
+        The returned fields can be limited with `fields` e.g. `fields=name,location`.
+        The id is always returned.
         """
     ),
     responses=rex.gets(Sites),
 )
 async def get_sites(
+        r: Request,
         n: Optional[conint(ge=1)] = None,
         lat: Optional[confloat(ge=0, le=90)] = None,
         lon: Optional[confloat(ge=-180, le=180)] = None,
+        bbox: Optional[str] = None,
+        after: Optional[SID] = None,
+        limit: Optional[conint(ge=1, le=MAX_PAGE_SIZE)] = None,
+        fields: Optional[str] = None,
         repo: SiteRepo = Repo(SiteRepo),
+        cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Sites:
     params = [n, lat, lon]
     if not all(map(lambda o: o is None, params)) and not all(map(lambda o: o is not None, params)):
         raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Bad Params")
-    return Sites(items=await repo.all(n, lat, lon))
+    if n is not None and (bbox is not None or after is not None or limit is not None):
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail="Bad Params")
+    bbox = parse_bbox(bbox)
+    fields = parse_fields(fields, SiteRepo.fields)
+
+    async def producer():
+        if any(map(lambda o: o is not None, [n, after, limit])) or cacheable(r, cache, repo):
+            return page(
+                Sites,
+                await repo.all(n, lat, lon, bbox=bbox, after=after, limit=limit, fields=fields),
+                limit,
+                fields,
+            )
+        return stream(await repo.stream(bbox=bbox, fields=fields))
+
+    return await cached(r, cache, repo, "sites", producer)
+
+
+@router.get(
+    "/projects/{project}/clusters",
+    response_model=Clusters,
+    description=dedent(
+        """
+        Returns the published sites of the current project grouped for a zoomed-out map view.
+        
+        The sites are grouped into a grid that gets finer with the zoom level.
+        A single map tile at the zoom level is split into an 8x8 grid.
+        Each cluster has the amount of sites, their centroid and one of the sites in it.
+        
+        The clusters can be limited to the current viewport with `bbox=minLon,minLat,maxLon,maxLat`.
+        """
+    ),
+    responses=rex.gets(Clusters),
+)
+async def get_clusters(
+        zoom: conint(ge=0, le=20),
+        bbox: Optional[str] = None,
+        repo: SiteRepo = Repo(SiteRepo),
+) -> Clusters:
+    return Clusters(items=await repo.clusters(zoom, parse_bbox(bbox)))
 
 
 @router.get(
@@ -51,11 +131,16 @@ async def get_sites(
     responses=rex.get(Site),
 )
 async def get_site(
+        r: Request,
         site: SID,
         include_memories: bool = False,
         repo: SiteRepo = Repo(SiteRepo),
+        cache: ResponseCache = Depends(CacheMiddleware.get),
 ) -> Site:
-    return await repo.one(site, include_memories=include_memories)
+    async def producer():
+        return await repo.one(site, include_memories=include_memories)
+
+    return await cached(r, cache, repo, "site", producer, store=False)
 
 
 @router.post(
@@ -1,17 +1,28 @@
 from . import common_responses as rex
 from .auth import require_auth
-from .default_router import created, modified, deleted, make_router
+from .cache import cached, cacheable
+from .default_router import created, modified, deleted, make_router, serialize, ORJSONResponse
 from .documentation_utilities import d, sample
+from .paging import parse_fields, page, MAX_PAGE_SIZE
 from .repo import Repo
+from .streaming import stream
 
 __all__ = [
     "created",
     "modified",
     "deleted",
     "make_router",
+    "serialize",
+    "ORJSONResponse",
     "d",
     "sample",
     "rex",
     "require_auth",
     "Repo",
+    "cached",
+    "cacheable",
+    "parse_fields",
+    "page",
+    "MAX_PAGE_SIZE",
+    "stream",
 ]
@@ -0,0 +1,96 @@
+from hashlib import blake2b
+from time import time
+from typing import Awaitable, Callable, Optional, Union
+
+from fastapi import Request, status
+from fastapi.responses import Response
+from headers import CACHE_CONTROL, ETAG, IF_NONE_MATCH, VARY
+from pydantic import BaseModel
+
+from .default_router import serialize, ORJSONResponse
+from ...repos.base import BaseRepo
+from ....cache import ResponseCache
+
+SHARED_MAX_AGE = 60
+PUBLIC = f"public, max-age=0, s-maxage={SHARED_MAX_AGE}"
+PRIVATE = "private, no-cache"
+VARIES = "Authorization, Accept-Language, Muistot-Language"
+
+
+def cacheable(request: Request, cache: Optional[ResponseCache], repo: BaseRepo) -> bool:
+    """Only anonymous responses without parameters are cached as they are the same for everyone
+    """
+    return cache is not None and not repo.authenticated and not request.query_params
+
+
+def etag(key: str, request: Request, repo: BaseRepo, ttl: int) -> str:
+    """Weak tag for the response version
+
+    The key changes with every write to the data, the rest covers what else the response depends on.
+    Tags expire with the cache entries as not every change goes through the cache invalidation.
+    """
+    h = blake2b(digest_size=16)
+    for part in (key, str(request.query_params), repo.identity or "", str(int(time() // ttl))):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return f'W/"{h.hexdigest()}"'
+
+
+def not_modified(request: Request, tag: str) -> bool:
+    """Weak comparison against If-None-Match
+
+    A wildcard is not honored as it could only match after the resource is known to exist.
+    """
+    header = request.headers.get(IF_NONE_MATCH, None)
+    if header is None:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    return tag in tags or tag[2:] in tags
+
+
+async def cached(
+        request: Request,
+        cache: Optional[ResponseCache],
+        repo: BaseRepo,
+        endpoint: str,
+        producer: Callable[[], Awaitable[Union[BaseModel, Response]]],
+        *,
+        store: bool = True,
+) -> Response:
+    """Serves reads with weak ETags and anonymous reads from the response cache
+
+    A matching If-None-Match is answered with 304 before the producer runs.
+    Authenticated users always get a fresh response as their view depends on their privileges.
+    The serialized form matches the one produced by the default routers.
+
+    Parameters
+    ----------
+    store
+        False to only tag the response without storing it in the cache
+    """
+    key = await cache.key(
+        endpoint,
+        lang=repo.lang,
+        project=repo.identifiers.get("project", None),
+        site=repo.identifiers.get("site", None),
+        memory=repo.identifiers.get("memory", None),
+    ) if cache is not None else None
+    if key is None:
+        return serialize(await producer())
+    headers = {
+        ETAG: etag(key, request, repo, cache.ttl),
+        CACHE_CONTROL: PRIVATE if repo.authenticated else PUBLIC,
+        VARY: VARIES,
+    }
+    if not_modified(request, headers[ETAG]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if store and cacheable(request, cache, repo):
+        data = await cache.get(key)
+        if data is None:
+            data = serialize(await producer()).body
+            await cache.set(key, data)
+        response = Response(content=data, media_type=ORJSONResponse.media_type)
+    else:
+        response = serialize(await producer())
+    response.headers.update(headers)
+    return response
@@ -1,7 +1,42 @@
-from typing import Callable
+from typing import Callable, Any
 
+import orjson
 from fastapi import Response, status, APIRouter
+from fastapi.responses import JSONResponse
 from headers import LOCATION
+from pydantic import BaseModel
+
+
+def _default(o: Any) -> Any:
+    if isinstance(o, BaseModel):
+        return o.dict(exclude_none=True)
+    raise TypeError
+
+
+def exclude_none(content: Any) -> Any:
+    """Drops None values from dictionaries like the routers do for models
+    """
+    if isinstance(content, dict):
+        return {k: exclude_none(v) for k, v in content.items() if v is not None}
+    elif isinstance(content, (list, tuple)):
+        return [exclude_none(v) for v in content]
+    else:
+        return content
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class ORJSONResponse(JSONResponse):
+    """Renders content straight to bytes with orjson
+
+    Pydantic models are rendered without None values, other types are expected to be JSON compatible.
+    Datetimes are rendered in ISO format.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
 
 
 def created(url: str) -> Response:
@@ -21,9 +56,20 @@ def deleted(url: str) -> Response:
     return Response(status_code=status.HTTP_204_NO_CONTENT, headers={LOCATION: url})
 
 
+def serialize(content: Any) -> Response:
+    """Serializes content the same way as the routers without validating it against the response model
+
+    Meant for models constructed from trusted database rows.
+    """
+    if isinstance(content, Response):
+        return content
+    return ORJSONResponse(exclude_none(content))
+
+
 def make_router(**kwargs) -> APIRouter:
     from functools import partial
 
+    kwargs.setdefault("default_response_class", ORJSONResponse)
     router = APIRouter(**kwargs)
 
     error_404 = {"description": "Requested resource was not found"}
@@ -0,0 +1,47 @@
+from typing import Optional, Set, FrozenSet, List, Union, Dict, Type
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from .default_router import serialize
+
+MAX_PAGE_SIZE = 1000
+
+
+def parse_fields(fields: Optional[str], available: FrozenSet[str]) -> Optional[Set[str]]:
+    """Parses a comma separated projection
+
+    Raises
+    ------
+    fastapi.HTTPException
+        On unknown fields
+    """
+    if fields is None:
+        return None
+    out = set(filter(lambda f: len(f) > 0, map(str.strip, fields.split(","))))
+    if not out <= available:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Unknown fields\n" + "\n".join(sorted(out - available)),
+        )
+    return out
+
+
+def page(
+        collection: Type[BaseModel],
+        items: List[Union[BaseModel, Dict]],
+        limit: Optional[int],
+        fields: Optional[Set[str]],
+) -> Response:
+    """Wraps a page of items into a collection
+
+    The items come from the repositories as is, so the collection is not validated again.
+    """
+    cursor = None
+    if limit is not None and len(items) == limit:
+        last = items[-1]
+        cursor = str(last["id"] if isinstance(last, dict) else last.id)
+    if fields is None:
+        return serialize(collection.construct(items=items, next=cursor))
+    return serialize(dict(items=items, next=cursor))
@@ -4,6 +4,8 @@ from fastapi.params import Depends
 from fastapi.requests import Request
 
 from ...repos.base import BaseRepo
+from ....cache import ResponseCache
+from ....middleware.cache import CacheMiddleware
 from ....middleware.database import DatabaseMiddleware, Database
 from ....middleware.language import LanguageMiddleware
 from ....middleware.session import SessionMiddleware, User
@@ -21,10 +23,12 @@ class Repo(Depends):
             db: Database = Depends(DatabaseMiddleware.default),
             user: User = Depends(SessionMiddleware.user),
             lang: str = Depends(LanguageMiddleware.get),
+            cache: ResponseCache = Depends(CacheMiddleware.get),
     ):
         return self.repo_class(
             db=db,
             user=user,
             lang=lang,
+            cache=cache,
             **request.path_params,
         )
@@ -0,0 +1,36 @@
+from typing import AsyncIterator, Union, Dict
+
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from .default_router import ORJSONResponse, dumps, exclude_none
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _dumps(item: Union[BaseModel, Dict]) -> bytes:
+    # Same format as the routers
+    return dumps(exclude_none(item))
+
+
+async def _encode(items: AsyncIterator[Union[BaseModel, Dict]], chunk_size: int) -> AsyncIterator[bytes]:
+    chunk = bytearray(b'{"items":[')
+    first = True
+    async for item in items:
+        if not first:
+            chunk += b","
+        chunk += _dumps(item)
+        first = False
+        if len(chunk) >= chunk_size:
+            yield bytes(chunk)
+            chunk.clear()
+    chunk += b"]}"
+    yield bytes(chunk)
+
+
+def stream(items: AsyncIterator[Union[BaseModel, Dict]], *, chunk_size: int = CHUNK_SIZE) -> StreamingResponse:
+    """Streams a collection as JSON while the items are being fetched
+
+    The output matches the collection models, so clients can't tell the difference.
+    """
+    return StreamingResponse(_encode(items, chunk_size), media_type=ORJSONResponse.media_type)
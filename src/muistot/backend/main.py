@@ -4,20 +4,22 @@ import textwrap
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
 
 from .api import common_paths, api_paths
+from .api.utils import ORJSONResponse
 from ..config import Config
 from ..errors import exception_handlers, modify_openapi
 from ..logging import log
 from ..login import login_router
 from ..middleware import (
+    CacheMiddleware,
     RedisMiddleware,
     LanguageMiddleware,
     TimingMiddleware,
     SessionMiddleware,
     DatabaseMiddleware,
     MailerMiddleware,
+    RateLimitMiddleware,
 )
 
 description = textwrap.dedent(
@@ -37,6 +39,9 @@ description = textwrap.dedent(
     The content is safe to be cached, if any parent node is deleted all children can be assumed gone as well.
     This means that a project being deleted (or unpublished) will lead to all its children being deleted.
     
+    Project, site and memory reads return weak `ETag` headers.
+    Sending the tag back in `If-None-Match` returns `304` if the data has not changed.
+    
     Auth
     ----
     The authentication and session management is handled by the backend server.
@@ -61,6 +66,10 @@ description = textwrap.dedent(
     and an error response is returned in the event the session had expired.
     The session expiry is only possible through inactivity or session purging by the user/admin.
     
+    If access tokens are enabled on the server, the session token can be exchanged for a short-lived
+    access token at `/auth/refresh`. The access token is used the same way as the session token
+    and a new one is requested with the session token once it expires.
+    
     #### Auth Errors
     
     If the session is expired a `401` code is returned. Similarly, if the session token is invalid an error is returned. 
@@ -118,15 +127,31 @@ middlewares = [
         RedisMiddleware,
         url=Config.cache.redis_url,
     ),
+    Middleware(
+        RateLimitMiddleware,
+        url=Config.cache.redis_url,
+    ),
+    Middleware(
+        CacheMiddleware,
+        url=Config.cache.redis_url,
+        ttl=Config.cache.cache_ttl,
+        settle=max((c.sticky_seconds for c in Config.database.values() if c.replica_of is not None), default=0),
+    ),
     Middleware(
         SessionMiddleware,
         url=Config.sessions.redis_url,
         token_bytes=Config.sessions.token_bytes,
         lifetime=Config.sessions.token_lifetime,
+        sweep_interval=Config.sessions.sweep_interval,
+        local_ttl=Config.sessions.local_ttl,
+        extend_interval=Config.sessions.extend_interval,
+        access_secret=Config.sessions.access_secret,
+        access_lifetime=Config.sessions.access_lifetime,
     ),
     Middleware(
         DatabaseMiddleware,
         databases=Config.database,
+        redis_url=Config.cache.redis_url,
     ),
     Middleware(
         MailerMiddleware,
@@ -142,7 +167,7 @@ app = FastAPI(
     version="1.1.0",
     docs_url="/docs",
     redoc_url=None,
-    default_response_class=JSONResponse,
+    default_response_class=ORJSONResponse,
     openapi_tags=tags,
     root_path=os.getenv("PROXY_ROOT", ""),
     middleware=middlewares,
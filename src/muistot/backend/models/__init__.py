@@ -4,6 +4,7 @@ from .memory import *
 from .project import *
 from .site import *
 from .user import *
+from .rows import from_row, project_row
 
 __all__ = [
     # User
@@ -18,6 +19,8 @@ __all__ = [
     "Site",
     "SiteInfo",
     "Point",
+    "BoundingBox",
+    "Cluster",
     "NewSite",
     "ModifiedSite",
     # Project
@@ -30,6 +33,7 @@ __all__ = [
     "Projects",
     "Sites",
     "Memories",
+    "Clusters",
     # Types
     "PID",
     "SID",
@@ -37,4 +41,7 @@ __all__ = [
     "UID",
     # Email
     "EmailStr",
+    # Rows
+    "from_row",
+    "project_row",
 ]
@@ -1,11 +1,11 @@
 from textwrap import dedent
-from typing import List, Type
+from typing import List, Type, Optional
 
-from pydantic import BaseModel, create_model, BaseConfig
+from pydantic import BaseModel, create_model, BaseConfig, Field
 
 from .memory import Memory
 from .project import Project
-from .site import Site
+from .site import Site, Cluster
 
 
 def make_collection(model_cls: Type[BaseModel]):
@@ -15,7 +15,10 @@ def make_collection(model_cls: Type[BaseModel]):
         pass
 
     collection_model = create_model(
-        type_name, __config__=Config, items=(List[model_cls], None)
+        type_name,
+        __config__=Config,
+        items=(List[model_cls], None),
+        next=(Optional[str], Field(None, description="Cursor for the next page when the page was full")),
     )
 
     collection_model.__doc__ = f"{model_cls.__name__} Collection"
@@ -26,6 +29,7 @@ def make_collection(model_cls: Type[BaseModel]):
 Projects = make_collection(Project)
 Sites = make_collection(Site)
 Memories = make_collection(Memory)
+Clusters = make_collection(Cluster)
 
 
 
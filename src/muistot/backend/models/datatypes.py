@@ -78,7 +78,7 @@ Supports ISO3166-1 and ISO3316-3
 """
 
 IMAGE_TXT = "Image file name to be fetched from the image endpoint."
-IMAGE_NEW = "Image data in base64."
+IMAGE_NEW = "Image data in base64 or the name of an image uploaded to the image endpoint."
 IMAGE = constr(
     strict=True,
     strip_whitespace=True,
@@ -89,7 +89,7 @@ Image Data
 
 Notes
 -----
-Contains image data in base64
+Contains image data in base64 or the name of an uploaded image
 """
 
 LAT = confloat(ge=-90, le=90)
@@ -0,0 +1,54 @@
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Tuple, Type, TypeVar
+
+from pydantic import BaseModel
+
+M = TypeVar("M", bound=BaseModel)
+
+
+@lru_cache(maxsize=None)
+def _fields(model: Type[BaseModel]) -> Tuple[Tuple[str, bool], ...]:
+    return tuple((name, field.type_ is bool) for name, field in model.__fields__.items())
+
+
+def from_row(model: Type[M], row: Mapping[str, Any], **values: Any) -> M:
+    """Builds a model from a database row without validation
+
+    Only meant for rows from our own schema as the data was validated when it was written.
+    Booleans are stored as integers, so they are the only values converted.
+
+    Parameters
+    ----------
+    model
+        Model to construct
+    row
+        Row containing the fields by name, other columns are left out
+    values
+        Fields to use instead of the row e.g. nested models
+    """
+    data = dict()
+    for name, is_bool in _fields(model):
+        if name in values:
+            value = values[name]
+        elif name in row:
+            value = row[name]
+        else:
+            continue
+        if is_bool and value is not None:
+            value = bool(value)
+        data[name] = value
+    return model.construct(**data)
+
+
+def project_row(model: Type[BaseModel], row: Mapping[str, Any]) -> Dict[str, Any]:
+    """Copies a projected row converting the boolean fields of the model
+
+    Parameters
+    ----------
+    model
+        Model the projection is taken from
+    row
+        Row containing only the projected columns
+    """
+    bools = {name for name, is_bool in _fields(model) if is_bool}
+    return {k: bool(v) if k in bools and v is not None else v for k, v in row.items()}
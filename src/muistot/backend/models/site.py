@@ -15,6 +15,36 @@ class Point(BaseModel):
     lat: LAT = Field(description="Latitude")
 
 
+class BoundingBox(BaseModel):
+    """
+    Area on the map between two corners in geographic coordinates on earth.
+    """
+
+    min_lon: LON = Field(description="Western edge")
+    min_lat: LAT = Field(description="Southern edge")
+    max_lon: LON = Field(description="Eastern edge")
+    max_lat: LAT = Field(description="Northern edge")
+
+    @validator("max_lon")
+    def validate_lon(cls, value, values):
+        assert "min_lon" not in values or values["min_lon"] <= value, "Western edge is east of the eastern edge"
+        return value
+
+    @validator("max_lat")
+    def validate_lat(cls, value, values):
+        assert "min_lat" not in values or values["min_lat"] <= value, "Southern edge is north of the northern edge"
+        return value
+
+    @classmethod
+    def parse(cls, value: str) -> "BoundingBox":
+        """Parses a box from the format minLon,minLat,maxLon,maxLat
+        """
+        parts = value.split(",")
+        if len(parts) != 4:
+            raise ValueError("Expected four coordinates")
+        return cls(**dict(zip(("min_lon", "min_lat", "max_lon", "max_lat"), map(float, parts))))
+
+
 class SiteInfo(BaseModel):
     """
     Localized information about a site.
@@ -156,3 +186,29 @@ class ModifiedSite(BaseModel):
                 }
             }
         }
+
+
+class Cluster(BaseModel):
+    """
+    Group of published sites close to each other on the map.
+    """
+
+    location: Point = Field(description="Centroid of the sites")
+    count: int = Field(ge=1, description="Total amount of sites in this cluster")
+    site: SID = Field(description="One of the sites in this cluster")
+
+    class Config:
+        __examples__ = {
+            "basic": {
+                "summary": "Basic",
+                "value": {
+                    "location": {
+                        "lat": 60.75,
+                        "lon": 24.56
+                    },
+                    "count": 12,
+                    "site": "my-awesome-site#1",
+                },
+                "description": "The site can be used to show a preview of the cluster."
+            },
+        }
@@ -1,8 +1,9 @@
 from abc import ABC, abstractmethod
-from functools import wraps
+from functools import wraps, partial
 from typing import List, Any, NoReturn, Optional, Dict
 
 from .status import StatusProvider
+from ...cache import ResponseCache
 from ...database import Database
 from ...files import Files
 from ...security import User
@@ -18,6 +19,7 @@ class BaseRepo(StatusProvider, ABC):
     db: Database
     lang: str
     user: User
+    cache: Optional[ResponseCache]
     identifiers: Dict[str, Any]
 
     def __init__(
@@ -25,6 +27,8 @@ class BaseRepo(StatusProvider, ABC):
             db: Database,
             lang: str,
             user: User,
+            *,
+            cache: Optional[ResponseCache] = None,
             **identifiers: Dict[str, Any]
     ):
         """Inject
@@ -32,6 +36,7 @@ class BaseRepo(StatusProvider, ABC):
         self.db = db
         self.lang = lang
         self.user = user
+        self.cache = cache
         self.identifiers = identifiers
 
     def __getattr__(self, item: str):
@@ -41,7 +46,7 @@ class BaseRepo(StatusProvider, ABC):
 
     @classmethod
     def from_repo(cls, repo: "BaseRepo") -> "BaseRepo":
-        return cls(repo.db, repo.lang, repo.user, **repo.identifiers)
+        return cls(repo.db, repo.lang, repo.user, cache=repo.cache, **repo.identifiers)
 
     @abstractmethod
     async def all(self, *args) -> List:
@@ -95,6 +100,12 @@ class BaseRepo(StatusProvider, ABC):
     def files(self) -> Files:
         return Files(self.db, self.user)
 
+    def invalidate(self, *, listing: bool = False):
+        """Invalidates cached responses for the current project once the changes are committed
+        """
+        if self.cache is not None:
+            self.db.on_commit(partial(self.cache.invalidate, self.identifiers.get("project", None), listing=listing))
+
 
 def append_identifier(identifier: str, *, value: bool = False, key: str = None, literal: Any = None):
     def decorator(f):
@@ -111,3 +122,16 @@ def append_identifier(identifier: str, *, value: bool = False, key: str = None,
         return wrapper
 
     return decorator
+
+
+def invalidates_cache(*, listing: bool = False):
+    def decorator(f):
+        @wraps(f)
+        async def wrapper(self: BaseRepo, *args, **kwargs):
+            out = await f(self, *args, **kwargs)
+            self.invalidate(listing=listing)
+            return out
+
+        return wrapper
+
+    return decorator
@@ -1,21 +1,40 @@
-from typing import List
+from typing import List, Optional, Set, Dict, Union, AsyncIterator
 
-from .base import BaseRepo, append_identifier
+from .base import BaseRepo, append_identifier, invalidates_cache
 from .status import MemoryStatus, Status, require_status
-from ..models import SID, PID, MID, NewMemory, Memory, ModifiedMemory
+from ..models import SID, PID, MID, NewMemory, Memory, ModifiedMemory, from_row, project_row
 
 
 class MemoryRepo(BaseRepo, MemoryStatus):
     project: PID
     site: SID
 
+    _columns = {
+        "id": "m.id",
+        "title": "m.title AS title",
+        "story": "m.story AS story",
+        "user": "u.username AS user",
+        "image": "i.file_name AS image",
+        "modified_at": "m.modified_at",
+    }
+
+    _columns_for_user = {
+        **_columns,
+        "waiting_approval": "IF(u2.id IS NOT NULL, NOT m.published, NULL) AS waiting_approval",
+        "own": "u.username = :user AS own",
+    }
+
+    _columns_for_admin = {
+        **_columns,
+        "waiting_approval": "IF(m.published, NULL, 1) AS waiting_approval",
+        "own": "u.username = :user AS own",
+    }
+
+    fields = frozenset(_columns_for_admin.keys())
+    """Fields available for projections"""
+
     _select = """
-        SELECT m.id,
-               m.title                                          AS title,
-               m.story                                          AS story,
-               u.username                                       AS user,
-               i.file_name                                      AS image,
-               m.modified_at
+        SELECT {columns}
         FROM memories m
                  JOIN sites s ON m.site_id = s.id
             AND s.name = :site
@@ -23,74 +42,78 @@ class MemoryRepo(BaseRepo, MemoryStatus):
             AND p.name = :project
                  JOIN users u ON m.user_id = u.id
                  LEFT JOIN images i ON m.image_id = i.id
-        WHERE m.published {}
+                 {joins}
+        WHERE {where}
         GROUP BY m.id
+        {order}
         """
 
-    _select_for_user = """
-        SELECT m.id,
-               m.title                                          AS title,
-               m.story                                          AS story,
-               u.username                                       AS user,
-               i.file_name                                      AS image,
-               m.modified_at,               
-               IF(u2.id IS NOT NULL, NOT m.published, NULL)     AS waiting_approval,
-               u.username = :user                               AS own
-        FROM memories m
-                 JOIN sites s ON m.site_id = s.id
-            AND s.name = :site
-                 JOIN projects p ON s.project_id = p.id
-            AND p.name = :project
-                 JOIN users u ON m.user_id = u.id
-                 LEFT JOIN images i ON m.image_id = i.id
-                 LEFT JOIN users u2 ON u2.id = m.user_id
-                    AND u2.username = :user
-        WHERE (m.published OR u2.id IS NOT NULL) {}
-        GROUP BY m.id
-        """
+    def _query(self, status: Status, values: Dict, where: str = "", *, fields: Optional[Set[str]] = None, order=""):
+        """Builds the select visible to the current user
 
-    _select_for_admin = """
-        SELECT m.id,
-               m.title                                          AS title,
-               m.story                                          AS story,
-               u.username                                       AS user,
-               i.file_name                                      AS image,
-               m.modified_at,               
-               IF(m.published, NULL, 1)                         AS waiting_approval,
-               u.username = :user                               AS own
-        FROM memories m
-                 JOIN sites s ON m.site_id = s.id
-            AND s.name = :site
-                 JOIN projects p ON s.project_id = p.id
-            AND p.name = :project
-                 JOIN users u ON m.user_id = u.id
-                 LEFT JOIN images i ON m.image_id = i.id
-        WHERE TRUE {}
-        GROUP BY m.id
+        Only the requested fields are selected if fields are given.
         """
+        joins = ""
+        if Status.ADMIN in status:
+            columns = self._columns_for_admin
+            condition = "TRUE"
+            values.update(user=self.identity)
+        elif self.authenticated:
+            columns = self._columns_for_user
+            joins = "LEFT JOIN users u2 ON u2.id = m.user_id AND u2.username = :user"
+            condition = "(m.published OR u2.id IS NOT NULL)"
+            values.update(user=self.identity)
+        else:
+            columns = self._columns
+            condition = "m.published"
+        return self._select.format(
+            columns=",\n".join(v for k, v in columns.items() if fields is None or k == "id" or k in fields),
+            joins=joins,
+            where=f"{condition} {where}",
+            order=order,
+        )
 
     @staticmethod
     def construct_memory(m) -> Memory:
-        return Memory(**m)
+        return from_row(Memory, m)
 
     @append_identifier('memory', literal=None)
     @require_status(Status.NONE)
-    async def all(self, status: Status) -> List[Memory]:
+    async def all(
+            self,
+            *,
+            after: Optional[MID] = None,
+            limit: Optional[int] = None,
+            fields: Optional[Set[str]] = None,
+            status: Status,
+    ) -> List[Union[Memory, Dict]]:
+        """All memories visible to the user ordered by id
+
+        Pages start after the given memory and projections return plain dictionaries.
+        """
         values = dict(site=self.site, project=self.project)
-        if Status.ADMIN in status:
-            sql = self._select_for_admin
-            values.update(user=self.identity)
-        elif self.authenticated:
-            sql = self._select_for_user
-            values.update(user=self.identity)
-        else:
-            sql = self._select
-        out = [
-            self.construct_memory(m)
-            async for m in self.db.iterate(sql.format(""), values=values)
-            if m is not None
-        ]
-        return out
+        where = ""
+        order = ""
+        if after is not None:
+            where = "AND m.id > :after"
+            values.update(after=after)
+        if limit is not None:
+            order = f"ORDER BY m.id LIMIT {limit:d}"
+        sql = self._query(status, values, where, fields=fields, order=order)
+        if fields is not None:
+            return [project_row(Memory, m) for m in await self.db.fetch_all(sql, values=values)]
+        return [self.construct_memory(m) for m in await self.db.fetch_all(sql, values=values)]
+
+    @append_identifier('memory', literal=None)
+    @require_status(Status.NONE)
+    async def stream(self, *, fields: Optional[Set[str]] = None, status: Status) -> AsyncIterator[Union[Memory, Dict]]:
+        """All memories visible to the user one at a time from a server-side cursor
+        """
+        values = dict(site=self.site, project=self.project)
+        rows = self.db.stream(self._query(status, values, fields=fields), values=values)
+        if fields is not None:
+            return (project_row(Memory, m) async for m in rows)
+        return (self.construct_memory(m) async for m in rows)
 
     @append_identifier('memory', value=True)
     @require_status(
@@ -100,22 +123,12 @@ class MemoryRepo(BaseRepo, MemoryStatus):
     )
     async def one(self, memory: MID, status: Status) -> Memory:
         values = dict(memory=memory, site=self.site, project=self.project)
-        if Status.ADMIN in status:
-            sql = self._select_for_admin
-            values.update(user=self.identity)
-        elif self.authenticated:
-            sql = self._select_for_user
-            values.update(user=self.identity)
-        else:
-            sql = self._select
-
-        out = self.construct_memory(
-            await self.db.fetch_one(sql.format("AND m.id = :memory"), values=values)
+        return self.construct_memory(
+            await self.db.fetch_one(self._query(status, values, "AND m.id = :memory"), values=values)
         )
 
-        return out
-
     @append_identifier('memory', literal=None)
+    @invalidates_cache()
     @require_status(Status.AUTHENTICATED)
     async def create(self, model: NewMemory, status: Status) -> MID:
         if model.image is not None:
@@ -142,6 +155,7 @@ class MemoryRepo(BaseRepo, MemoryStatus):
         )
 
     @append_identifier('memory', value=True)
+    @invalidates_cache()
     @require_status(Status.OWN)
     async def modify(self, memory: MID, model: ModifiedMemory) -> bool:
         data = model.dict(exclude_unset=True)
@@ -161,6 +175,7 @@ class MemoryRepo(BaseRepo, MemoryStatus):
         return False
 
     @append_identifier('memory', value=True)
+    @invalidates_cache()
     @require_status(Status.OWN, Status.EXISTS | Status.ADMIN)
     async def delete(self, memory: MID):
         await self.db.execute(
@@ -171,6 +186,7 @@ class MemoryRepo(BaseRepo, MemoryStatus):
         )
 
     @append_identifier('memory', value=True)
+    @invalidates_cache()
     @require_status(Status.EXISTS | Status.ADMIN)
     async def toggle_publish(self, memory: MID, publish: bool) -> bool:
         await self.db.execute(
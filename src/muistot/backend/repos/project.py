@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import List, Optional, Dict
 
 from starlette.exceptions import HTTPException
 from starlette.status import (
@@ -8,7 +8,7 @@ from starlette.status import (
     HTTP_403_FORBIDDEN,
 )
 
-from .base import BaseRepo, append_identifier
+from .base import BaseRepo, append_identifier, invalidates_cache
 from .status import ProjectStatus, Status, require_status
 from ..models import (
     PID,
@@ -18,6 +18,7 @@ from ..models import (
     ProjectInfo,
     ProjectContact,
     UID,
+    from_row,
 )
 
 
@@ -76,20 +77,20 @@ class ProjectRepo(BaseRepo, ProjectStatus):
     def _check_dates(m) -> bool:
         return m["start_date"] == 1 and m["end_date"] == 1
 
-    async def _get_admins(self, project_id: int):
-        out = [
-            admin[0]
+    async def _get_admins(self, project_ids: List[int]) -> Dict[int, List[str]]:
+        out = {project_id: list() for project_id in project_ids}
+        if len(project_ids) > 0:
             for admin in await self.db.fetch_all(
-                """
-            SELECT u.username
-            FROM project_admins pa
-                JOIN users u ON pa.user_id = u.id
-            WHERE project_id = :pid
-            """,
-                values=dict(pid=project_id),
-            )
-        ]
-        return out if len(out) > 0 else list()
+                f"""
+                SELECT pa.project_id, u.username
+                FROM project_admins pa
+                    JOIN users u ON pa.user_id = u.id
+                WHERE pa.project_id IN ({",".join(f":pid_{i}" for i in range(0, len(project_ids)))})
+                """,
+                values={f"pid_{i}": v for i, v in enumerate(project_ids)},
+            ):
+                out[admin[0]].append(admin[1])
+        return out
 
     async def _handle_localization(self, project: PID, localized_data: ProjectInfo):
         if localized_data is not None:
@@ -193,18 +194,22 @@ class ProjectRepo(BaseRepo, ProjectStatus):
                 ),
             )
 
-    async def construct_project(self, m) -> Project:
-        pi = ProjectInfo(**m)
-        if m["has_contact_data"]:
-            pc = ProjectContact(**m)
-        else:
-            pc = None
-        return Project(**m, info=pi, contact=pc, admins=await self._get_admins(m[0]))
+    async def construct_projects(self, rows: List) -> List[Project]:
+        admins = await self._get_admins([m[0] for m in rows])
+        out = list()
+        for m in rows:
+            pi = from_row(ProjectInfo, m)
+            if m["has_contact_data"]:
+                pc = from_row(ProjectContact, m)
+            else:
+                pc = None
+            out.append(from_row(Project, m, info=pi, contact=pc, admins=admins[m[0]]))
+        return out
 
     @append_identifier("project", literal=None)
     async def all(self) -> List[Project]:
-        return [
-            await self.construct_project(m)
+        return await self.construct_projects([
+            m
             for m in await self.db.fetch_all(
                 self._select
                 % (
@@ -228,7 +233,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
                 ProjectRepo._check_dates(m)
                 or (self.superuser or m["is_admin"] if self.authenticated else False)
             )
-        ]
+        ])
 
     @append_identifier("project", value=True)
     @require_status(Status.PUBLISHED, Status.EXISTS | Status.ADMIN)
@@ -246,10 +251,11 @@ class ProjectRepo(BaseRepo, ProjectStatus):
             raise HTTPException(
                 status_code=HTTP_404_NOT_FOUND, detail="Project not found"
             )
-        out = await self.construct_project(m)
+        out, = await self.construct_projects([m])
         return out
 
     @append_identifier("project", key="id")
+    @invalidates_cache(listing=True)
     @require_status(
         Status.DOES_NOT_EXIST | Status.AUTHENTICATED,
         errors={
@@ -302,6 +308,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
         return model.id
 
     @append_identifier("project", value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN)
     async def modify(self, project: PID, model: ModifiedProject) -> bool:
         data = model.dict(exclude_unset=True)
@@ -340,6 +347,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
             return modified
 
     @append_identifier("project", value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.SUPERUSER)
     async def delete(self, project: PID):
         await self.db.execute(
@@ -350,6 +358,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
         )
 
     @append_identifier("project", value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN)
     async def toggle_publish(self, project: PID, publish: bool) -> bool:
         await self.db.execute(
@@ -361,6 +370,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
         return await self.db.fetch_val("SELECT ROW_COUNT()")
 
     @append_identifier("project", value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN)
     async def add_admin(self, project: PID, user: UID):
         m = await self.db.fetch_one(
@@ -394,6 +404,7 @@ class ProjectRepo(BaseRepo, ProjectStatus):
             )
 
     @append_identifier("project", value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN)
     async def delete_admin(self, project: PID, user: UID):
         if await self.db.fetch_val(
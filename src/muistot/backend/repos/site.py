@@ -1,34 +1,53 @@
-import random
-from typing import List, Optional
+from math import asin, cos, radians, sin
+from typing import List, Optional, Dict, Set, Union, AsyncIterator
 
 from starlette.exceptions import HTTPException
 from starlette.status import HTTP_406_NOT_ACCEPTABLE, HTTP_403_FORBIDDEN
 
-from .base import BaseRepo, append_identifier
+from .base import BaseRepo, append_identifier, invalidates_cache
 from .memory import MemoryRepo
 from .status import SiteStatus, Status, require_status
-from ..models import PID, SID, Site, SiteInfo, NewSite, ModifiedSite, Point
+from ..models import PID, SID, Site, SiteInfo, NewSite, ModifiedSite, Point, BoundingBox, Cluster, Clusters, from_row, project_row
+
+EARTH_RADIUS = 6_370_986
+"""Radius used by ST_DISTANCE_SPHERE in meters"""
+
+NEAREST_INITIAL_RADIUS = 0.5
+"""Half width of the first box searched for nearest sites in degrees"""
+
+NEAREST_RADIUS_FACTOR = 4
+"""Growth of the box between nearest site searches"""
+
+CLUSTER_CELLS_PER_TILE = 8
+"""Cluster grid cells along one side of a map tile"""
 
 
 class SiteRepo(BaseRepo, SiteStatus):
     project: PID
 
-    __select = """
+    _columns = {
+        "id": ("s.name AS id",),
+        "name": ("COALESCE(si.name, def_si.name, s.name) AS name", "IFNULL(l.lang, def_l.lang) AS lang"),
+        "location": ("Y(s.location) AS lat", "X(s.location) AS lon"),
+        "image": ("i.file_name AS image", "COUNT(m.id) AS memories_count"),
+        "memories_count": ("COUNT(m.id) AS memories_count",),
+        "abstract": ("IFNULL(si.abstract, def_si.abstract) AS abstract", "IFNULL(l.lang, def_l.lang) AS lang"),
+        "description": (
+            "IFNULL(si.description, def_si.description) AS description",
+            "IFNULL(l.lang, def_l.lang) AS lang",
+        ),
+        "waiting_approval": ("IF(s.published, NULL, 1) AS waiting_approval",),
+        "own": ("IF(uc.username = :user, TRUE, NULL) AS own",),
+        "creator": ("uc.username AS creator",),
+        "modifier": ("um.username AS modifier",),
+    }
+
+    fields = frozenset(_columns.keys())
+    """Fields available for projections"""
+
+    _select = """
         SELECT
-            s.name                                      AS id,
-            COALESCE(si.name, def_si.name, s.name)      AS name,
-            Y(s.location)                               AS lat,
-            X(s.location)                               AS lon,
-            i.file_name                                 AS image,
-            COUNT(m.id)                                 AS memories_count,
-            IFNULL(l.lang, def_l.lang)                  AS lang,
-            IFNULL(si.abstract, def_si.abstract)        AS abstract,
-            IFNULL(si.description, def_si.description)  AS description,
-            IF(s.published, NULL, 1)                    AS waiting_approval,
-            IF(uc.username = :user, TRUE, NULL)         AS own,
-            uc.username                                 AS creator,
-            um.username                                 AS modifier
-            %s
+            {columns}
         FROM sites s
             JOIN projects p ON p.id = s.project_id
                 AND p.name = :project
@@ -46,16 +65,28 @@ class SiteRepo(BaseRepo, SiteStatus):
             LEFT JOIN images i ON i.id = s.image_id
             LEFT JOIN users um ON um.id = si.modifier_id
             LEFT JOIN users uc ON uc.id = s.creator_id
-        {}
+        {where}
         GROUP BY s.id
-        %s
+        {order}
         """
 
-    _select = __select % ("", "")
-    _select_dist = __select % (
-        ",\nST_DISTANCE_SPHERE(s.location, POINT(:lon, :lat)) AS distance",
-        " ORDER BY distance LIMIT {:d}",
-    )
+    _distance = "ST_DISTANCE_SPHERE(s.location, POINT(:lon, :lat)) AS distance"
+
+    _random_image = """COALESCE(i.file_name, (
+                SELECT ri.file_name
+                FROM memories rm
+                    JOIN images ri ON rm.image_id = ri.id
+                WHERE rm.site_id = s.id AND rm.published
+                ORDER BY RAND()
+                LIMIT 1
+            )) AS image"""
+
+    _within = """
+        AND MBRContains(
+            ST_Envelope(LINESTRING(POINT(:min_lon, :min_lat), POINT(:max_lon, :max_lat))),
+            s.location
+        )
+        """
 
     @staticmethod
     def check_admin_posting(status: Status):
@@ -147,26 +178,118 @@ class SiteRepo(BaseRepo, SiteStatus):
         )
         return project_default
 
-    async def _get_random_image(self, site: SID):
-        images = list(map(lambda m: m[0], await self.db.fetch_all(
-            """
-            SELECT i.file_name FROM  sites s
-                JOIN memories m ON s.id = m.site_id
-                    AND m.published
-                JOIN images i ON m.image_id = i.id
-            WHERE s.name = :site
-            ORDER BY RAND()
-            LIMIT 1
+    async def _get_random_images(self, sites: List[SID]) -> Dict[SID, str]:
+        """Picks a random published memory image for each of the given sites in a single query
+        """
+        if len(sites) == 0:
+            return dict()
+        return {m[0]: m[1] for m in await self.db.fetch_all(
+            f"""
+            SELECT r.site, r.image FROM (
+                SELECT s.name                                                   AS site,
+                       i.file_name                                              AS image,
+                       ROW_NUMBER() OVER (PARTITION BY s.id ORDER BY RAND())    AS n
+                FROM sites s
+                    JOIN projects p ON p.id = s.project_id
+                        AND p.name = :project
+                    JOIN memories m ON s.id = m.site_id
+                        AND m.published
+                    JOIN images i ON m.image_id = i.id
+                WHERE s.name IN ({",".join(f":site_{i}" for i in range(0, len(sites)))})
+            ) r
+            WHERE r.n = 1
             """,
-            values=dict(site=site)
-        )))
-        return random.choice(images) if len(images) > 0 else None
+            values=dict(project=self.project, **{f"site_{i}": v for i, v in enumerate(sites)}),
+        )}
+
+    def _query(
+            self,
+            where: str,
+            *,
+            fields: Optional[Set[str]] = None,
+            distance: bool = False,
+            random_image: bool = False,
+            order: str = "",
+    ):
+        """Builds the select for sites
+
+        Only the requested fields are selected if fields are given.
+        Random memory images can be picked in the same query instead of a separate one.
+        """
+        columns = [c for k, v in self._columns.items() if fields is None or k == "id" or k in fields for c in v]
+        if random_image:
+            columns = [self._random_image if c == self._columns["image"][0] else c for c in columns]
+        if distance:
+            columns.append(self._distance)
+        return self._select.format(columns=",\n".join(dict.fromkeys(columns)), where=where, order=order)
 
-    async def construct_site(self, m) -> Site:
-        if m.get("memories_count", 0) > 0 and m.get("image", None) is None:
-            m = dict(**m)
-            m["image"] = await self._get_random_image(m["id"])
-        return Site(location=Point(**m), info=SiteInfo(**m), **m)
+    def _visible(self, status: Status) -> str:
+        if Status.ADMIN in status:
+            return "WHERE TRUE"
+        elif self.authenticated:
+            return "WHERE (s.published OR uc.username = :user)"
+        else:
+            return "WHERE s.published"
+
+    @staticmethod
+    def project_site(m, fields: Set[str]) -> Dict:
+        """Shapes a projected row like a Site with only the requested fields
+        """
+        out = project_row(Site, {
+            k: m[k]
+            for k in ("id", "image", "memories_count", "waiting_approval", "own", "creator", "modifier")
+            if (k == "id" or k in fields) and k in m
+        })
+        if "location" in fields:
+            out["location"] = dict(lat=m["lat"], lon=m["lon"])
+        info = {k: m[k] for k in ("lang", "name", "abstract", "description") if k in m}
+        if len(info) > 0:
+            out["info"] = info
+        return out
+
+    async def construct_sites(self, rows: List, fields: Optional[Set[str]] = None) -> List[Union[Site, Dict]]:
+        missing = [m["id"] for m in rows if m.get("memories_count", 0) > 0 and m.get("image", None) is None]
+        images = await self._get_random_images(missing)
+        out = list()
+        for m in rows:
+            if m["id"] in images:
+                m = dict(**m)
+                m["image"] = images[m["id"]]
+            out.append(self.construct_site(m, fields))
+        return out
+
+    @staticmethod
+    def construct_site(m, fields: Optional[Set[str]] = None) -> Union[Site, Dict]:
+        if fields is None:
+            return from_row(Site, m, location=from_row(Point, m), info=from_row(SiteInfo, m))
+        return SiteRepo.project_site(m, fields)
+
+    async def _nearest(self, where: str, values: Dict, n: int, lat: float, lon: float, fields: Optional[Set[str]]):
+        """Finds the nearest sites searching growing boxes around the point
+
+        The boxes can use the spatial index. The search stops once the n:th site is inside
+        the circle fitting in the box, as nothing outside the box can be closer than that.
+        """
+        radius = NEAREST_INITIAL_RADIUS
+        while -90 < lat - radius and lat + radius < 90 and -180 <= lon - radius and lon + radius <= 180:
+            rows = await self.db.fetch_all(
+                self._query(where + self._within, fields=fields, distance=True, order=f"ORDER BY distance LIMIT {n:d}"),
+                values=dict(
+                    **values,
+                    min_lon=lon - radius,
+                    min_lat=lat - radius,
+                    max_lon=lon + radius,
+                    max_lat=lat + radius,
+                ),
+            )
+            inscribed = EARTH_RADIUS * min(radians(radius), asin(sin(radians(radius)) * cos(radians(lat))))
+            if len(rows) == n and rows[-1]["distance"] <= inscribed:
+                return rows
+            radius *= NEAREST_RADIUS_FACTOR
+        return await self.db.fetch_all(
+            self._query(where, fields=fields, distance=True, order=f"ORDER BY distance LIMIT {n:d}"),
+            values=values,
+        )
 
     @append_identifier('site', literal=None)
     @require_status(Status.NONE)
@@ -176,33 +299,95 @@ class SiteRepo(BaseRepo, SiteStatus):
             lat: Optional[float] = None,
             lon: Optional[float] = None,
             *,
+            bbox: Optional[BoundingBox] = None,
+            after: Optional[SID] = None,
+            limit: Optional[int] = None,
+            fields: Optional[Set[str]] = None,
             status: Status,
-    ) -> List[Site]:
+    ) -> List[Union[Site, Dict]]:
+        """All sites visible to the user
+
+        Pages are ordered by id and start after the given site. Projections return plain dictionaries.
+        """
         values = dict(lang=self.lang, project=self.project, user=self.identity)
-        if Status.ADMIN in status:
-            where = "WHERE TRUE"
-        elif self.authenticated:
-            where = "WHERE (s.published OR uc.username = :user)"
-        else:
-            where = "WHERE s.published"
+        where = self._visible(status)
         if n is not None and lat is not None and lon is not None:
             values.update(lon=lon, lat=lat)
-            out = [
-                await self.construct_site(m)
-                async for m in self.db.iterate(
-                    self._select_dist.format(where, n), values=values
-                )
-                if m is not None
-            ]
+            rows = await self._nearest(where, values, n, lat, lon, fields)
         else:
-            out = [
-                await self.construct_site(m)
-                async for m in self.db.iterate(
-                    self._select.format(where), values=values
-                )
-                if m is not None
+            if bbox is not None:
+                where += self._within
+                values.update(bbox.dict())
+            if after is not None:
+                where += " AND s.name > :after"
+                values.update(after=after)
+            order = f"ORDER BY s.name LIMIT {limit:d}" if limit is not None else ""
+            rows = await self.db.fetch_all(self._query(where, fields=fields, order=order), values=values)
+        return await self.construct_sites(rows, fields)
+
+    @append_identifier('site', literal=None)
+    @require_status(Status.NONE)
+    async def stream(
+            self,
+            *,
+            bbox: Optional[BoundingBox] = None,
+            fields: Optional[Set[str]] = None,
+            status: Status,
+    ) -> AsyncIterator[Union[Site, Dict]]:
+        """All sites visible to the user one at a time
+
+        The rows come from a server-side cursor which blocks the connection until it is exhausted,
+        so the memory images are picked in the same query.
+        """
+        values = dict(lang=self.lang, project=self.project, user=self.identity)
+        where = self._visible(status)
+        if bbox is not None:
+            where += self._within
+            values.update(bbox.dict())
+        rows = self.db.stream(self._query(where, fields=fields, random_image=True), values=values)
+        return (self.construct_site(m, fields) async for m in rows)
+
+    async def _get_clusters(self, zoom: int) -> List[Cluster]:
+        cell = 360 / (2 ** zoom * CLUSTER_CELLS_PER_TILE)
+        return [
+            Cluster(location=Point(lon=m["lon"], lat=m["lat"]), count=m["count"], site=m["site"])
+            for m in await self.db.fetch_all(
+                """
+                SELECT AVG(X(s.location))   AS lon,
+                       AVG(Y(s.location))   AS lat,
+                       COUNT(s.id)          AS count,
+                       MIN(s.name)          AS site
+                FROM sites s
+                    JOIN projects p ON p.id = s.project_id
+                        AND p.name = :project
+                WHERE s.published
+                GROUP BY FLOOR(X(s.location) / :cell), FLOOR(Y(s.location) / :cell)
+                """,
+                values=dict(project=self.project, cell=cell),
+            )
+        ]
+
+    @append_identifier('site', literal=None)
+    @require_status(Status.NONE)
+    async def clusters(self, zoom: int, bbox: Optional[BoundingBox] = None) -> List[Cluster]:
+        """Published sites grouped into a grid sized by the map zoom level
+
+        The clusters for the whole project are cached per zoom level.
+        """
+        key = await self.cache.key(f"clusters:{zoom}", project=self.project) if self.cache is not None else None
+        data = await self.cache.get(key) if key is not None else None
+        if data is not None:
+            clusters = Clusters.parse_raw(data).items
+        else:
+            clusters = await self._get_clusters(zoom)
+            if key is not None:
+                await self.cache.set(key, Clusters(items=clusters).json().encode("utf-8"))
+        if bbox is not None:
+            clusters = [
+                c for c in clusters
+                if bbox.min_lon <= c.location.lon <= bbox.max_lon and bbox.min_lat <= c.location.lat <= bbox.max_lat
             ]
-        return out
+        return clusters
 
     @append_identifier('site', value=True)
     @require_status(
@@ -214,24 +399,20 @@ class SiteRepo(BaseRepo, SiteStatus):
         values = dict(
             lang=self.lang, project=self.project, site=site, user=self.identity
         )
-        if Status.ADMIN in status:
-            where = "WHERE TRUE"
-        elif self.authenticated:
-            where = "WHERE (s.published OR uc.username = :user)"
-        else:
-            where = "WHERE s.published"
-        m = await self.db.fetch_one(self._select.format(where + " AND s.name = :site"), values=values)
+        where = self._visible(status)
+        m = await self.db.fetch_one(self._query(where + " AND s.name = :site"), values=values)
         if m is None:
             raise HTTPException(
                 status_code=HTTP_406_NOT_ACCEPTABLE,
                 detail="Site missing default localization"
             )
-        out = await self.construct_site(m)
+        out, = await self.construct_sites([m])
         if include_memories:
             out.memories = await MemoryRepo.from_repo(self).all()
         return out
 
     @append_identifier('site', key='id')
+    @invalidates_cache(listing=True)
     @require_status(Status.DOES_NOT_EXIST | Status.AUTHENTICATED)
     async def create(self, model: NewSite, status: Status) -> SID:
         SiteRepo.check_admin_posting(status)
@@ -273,6 +454,7 @@ class SiteRepo(BaseRepo, SiteStatus):
         return name
 
     @append_identifier('site', value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN, Status.EXISTS | Status.OWN)
     async def modify(self, site: SID, model: ModifiedSite, status: Status) -> bool:
         SiteRepo.check_admin_posting(status)
@@ -286,6 +468,7 @@ class SiteRepo(BaseRepo, SiteStatus):
         return bool(modified)
 
     @append_identifier('site', value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.OWN, Status.EXISTS | Status.ADMIN)
     async def delete(self, site: SID):
         await self.db.execute(
@@ -296,6 +479,7 @@ class SiteRepo(BaseRepo, SiteStatus):
         )
 
     @append_identifier('site', value=True)
+    @invalidates_cache(listing=True)
     @require_status(Status.EXISTS | Status.ADMIN)
     async def toggle_publish(self, site: SID, publish: bool) -> bool:
         await self.db.execute(
@@ -73,20 +73,29 @@ class StatusProvider(ABC):
         return status | await self.derive_status(await self.query())
 
     async def query(self):
+        return await self.fetch_status(self.query_authenticated, self.query_anonymous, self.identifiers)
+
+    async def fetch_status(self, query_authenticated: str, query_anonymous: str, identifiers: Mapping[str, Any]):
+        """Fetches the status row
+
+        The row is shared by all repos using the same connection until something is written.
+        """
         if self.user.is_authenticated:
             return await self.db.fetch_one(
-                self.query_authenticated,
+                query_authenticated,
                 {
                     "user": self.user.identity,
-                    **self.identifiers,
+                    **identifiers,
                 },
+                cached=True,
             )
         else:
             return await self.db.fetch_one(
-                self.query_anonymous,
+                query_anonymous,
                 {
-                    **self.identifiers,
+                    **identifiers,
                 },
+                cached=True,
             )
 
     @property
@@ -4,6 +4,7 @@ from starlette.exceptions import HTTPException
 from starlette.status import HTTP_404_NOT_FOUND
 
 from .base import StatusProvider, Status
+from .site import SiteStatus
 from ...models import PID, SID, MID
 
 
@@ -56,6 +57,17 @@ class MemoryStatus(StatusProvider):
             """
         )
 
+    async def query(self):
+        if self.identifiers.get("memory", None) is None:
+            # Without a memory the status only depends on the site, reuse its status row
+            m = await self.fetch_status(
+                SiteStatus.query_authenticated.fget(self),
+                SiteStatus.query_anonymous.fget(self),
+                dict(project=self.identifiers["project"], site=self.identifiers["site"]),
+            )
+            return {**m, "is_creator": False} if m is not None else None
+        return await super(MemoryStatus, self).query()
+
     async def derive_status(self, m: Mapping) -> Status:
         if m is None:
             raise HTTPException(
@@ -32,14 +32,14 @@ async def change_email(db: Database, username: str, email: str, mgr: SessionMana
             return False
         elif m[0]:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email in use")
-        mgr.clear_sessions(username)
+        await mgr.clear_sessions(username)
         await db.execute(
             """
             UPDATE users SET email = :email WHERE username = :user
             """,
             values=dict(email=email, user=username)
         )
-        mgr.clear_sessions(username)
+        await mgr.clear_sessions(username)
         return True
     except IntegrityError:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Email in use")
@@ -49,8 +49,8 @@ async def change_username(db: Database, username_old: str, username_new: str, mg
     if username_old != username_new:
         try:
             await check_username_not_exists(db, username_new)
-            mgr.clear_sessions(username_old)
-            mgr.clear_sessions(username_new)
+            await mgr.clear_sessions(username_old)
+            await mgr.clear_sessions(username_new)
             await db.execute(
                 """
                 UPDATE users SET username = :new WHERE username = :old
@@ -61,8 +61,8 @@ async def change_username(db: Database, username_old: str, username_new: str, mg
         except IntegrityError:
             raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Username in use")
         finally:
-            mgr.clear_sessions(username_old)
-            mgr.clear_sessions(username_new)
+            await mgr.clear_sessions(username_old)
+            await mgr.clear_sessions(username_new)
     return False
 
 
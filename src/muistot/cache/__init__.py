@@ -0,0 +1,5 @@
+from .responses import ResponseCache
+
+__all__ = [
+    "ResponseCache",
+]
@@ -0,0 +1,147 @@
+"""
+Read-through cache for serialized public responses.
+"""
+from collections import OrderedDict
+from time import monotonic, time_ns
+from typing import Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from ..logging import log
+
+CACHE_PREFIX = "cache:response:"
+GENERATION_PREFIX = "cache:generation:"
+SETTLING_PREFIX = "cache:settling:"
+
+
+class ResponseCache:
+    """Caches serialized responses in Redis and a small in-process LRU
+
+    Every entry is keyed with the generation of the data it depends on.
+    Project listings depend on the global generation and project scoped listings
+    depend on the generation of their project. Invalidation bumps the generation,
+    which leaves all older entries unreachable until they expire.
+
+    Replicas can still serve the data from before a write for a while after it.
+    The generation is marked settling for that time and keys resolved during it
+    differ from the later ones, as if the generation was bumped again once it ends.
+    """
+
+    redis: Redis
+    local: "OrderedDict[str, Tuple[float, bytes]]"
+
+    def __init__(self, *, redis: Redis, ttl: int, local_size: int = 128, settle: int = 0):
+        """Create a new ResponseCache
+
+        Parameters
+        ----------
+        redis
+            Asyncio Redis instance
+        ttl
+            Entry lifetime in seconds
+        local_size
+            Maximum amount of entries held in process
+        settle
+            Seconds replicas may lag behind a write, 0 without replicas
+        """
+        super(ResponseCache, self).__init__()
+        self.redis = redis
+        self.ttl = ttl
+        self.local_size = local_size
+        self.settle = settle
+        self.local = OrderedDict()
+
+    async def key(
+            self,
+            endpoint: str,
+            *,
+            lang: Optional[str] = None,
+            project: Optional[str] = None,
+            site: Optional[str] = None,
+            memory: Optional[str] = None,
+    ) -> Optional[str]:
+        """Resolves the current key for a response
+
+        Returns None if the generation could not be resolved.
+        """
+        generation_key = f"{GENERATION_PREFIX}{project or ''}"
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.set(generation_key, time_ns(), nx=True)
+                pipe.get(generation_key)
+                pipe.exists(f"{SETTLING_PREFIX}{project or ''}")
+                _, generation, settling = await pipe.execute()
+        except RedisError as e:
+            log.warning("Failed to resolve cache generation", exc_info=e)
+            return None
+        suffix = ":settling" if settling > 0 else ""
+        scope = ":".join(part or "" for part in (project, site, memory, lang))
+        return f"{CACHE_PREFIX}{endpoint}:{scope}:{int(generation)}{suffix}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Fetches a cached response if one is available
+        """
+        entry = self.local.get(key, None)
+        if entry is not None:
+            expires, data = entry
+            if expires > monotonic():
+                self.local.move_to_end(key)
+                return data
+            del self.local[key]
+        try:
+            data = await self.redis.get(key)
+        except RedisError as e:
+            log.warning("Failed to fetch cached response", exc_info=e)
+            return None
+        if data is not None:
+            self._store_local(key, data)
+        return data
+
+    async def set(self, key: str, data: bytes):
+        """Stores a response for the lifetime of the cache
+        """
+        self._store_local(key, data)
+        try:
+            await self.redis.set(key, data, ex=self.ttl)
+        except RedisError as e:
+            log.warning("Failed to store cached response", exc_info=e)
+
+    async def invalidate(self, project: Optional[str] = None, *, listing: bool = False):
+        """Invalidates cached responses
+
+        Parameters
+        ----------
+        project
+            Project whose sites and memories changed
+        listing
+            True if the change is visible in the project listing
+        """
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                if project is not None:
+                    self._bump(pipe, project)
+                if listing:
+                    self._bump(pipe, "")
+                await pipe.execute()
+        except RedisError as e:
+            log.warning("Failed to invalidate cached responses", exc_info=e)
+
+    def _bump(self, pipe, project: str):
+        generation_key = f"{GENERATION_PREFIX}{project}"
+        # Never restart from zero after an eviction
+        pipe.set(generation_key, time_ns(), nx=True)
+        pipe.incr(generation_key)
+        if self.settle > 0:
+            pipe.set(f"{SETTLING_PREFIX}{project}", 1, ex=self.settle)
+
+    def _store_local(self, key: str, data: bytes):
+        self.local[key] = (monotonic() + self.ttl, data)
+        self.local.move_to_end(key)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
+
+
+__all__ = [
+    "ResponseCache",
+]
@@ -1,5 +1,5 @@
 from pathlib import Path
-from typing import Dict, Set
+from typing import Dict, Set, Optional
 
 from pydantic import BaseModel, Field, AnyUrl, AnyHttpUrl, Extra, DirectoryPath
 
@@ -32,6 +32,15 @@ class Database(BaseModel):
     # -----------------------
     ssl: bool = False
 
+    # Read Replica
+    # -----------------------
+    # replica_of:     Name of the primary database, reads are routed here and fall back to the primary
+    # sticky_seconds: Time a user keeps reading from the primary after writing,
+    #                 cached responses made during it are not reused after it
+    # -----------------------
+    replica_of: Optional[str] = None
+    sticky_seconds: int = 5
+
     class Config:
         extra = Extra.ignore
 
@@ -49,6 +58,11 @@ class Sessions(BaseModel):
     redis_url: AnyUrl
     token_lifetime: int = 60 * 16
     token_bytes: int = 32
+    sweep_interval: Optional[int] = 60 * 5
+    local_ttl: Optional[int] = 10
+    extend_interval: int = 30
+    access_secret: Optional[str] = None
+    access_lifetime: int = 60 * 5
 
 
 class FileStore(BaseModel):
@@ -58,6 +72,17 @@ class FileStore(BaseModel):
         "image/jpeg",
         "image/png"
     })
+    max_upload_bytes: int = 16 * 1024 * 1024
+
+    # File Workers
+    # -----------------------
+    # workers:  Threads doing decoding, type checks and writes
+    # backlog:  Jobs allowed to wait for a thread before refusing
+    # fsync:    Sync written files to disk before they are referenced
+    # -----------------------
+    workers: int = 4
+    backlog: int = 32
+    fsync: bool = False
 
     class Config:
         extra = Extra.ignore
@@ -76,12 +101,19 @@ class Cache(BaseModel):
     cache_ttl: int = 60 * 10
 
 
+class RateLimit(BaseModel):
+    rate: float
+    # Omitted keeps the burst of the endpoint
+    burst: Optional[int] = None
+
+
 class BaseConfig(BaseModel):
     # Can be omitted
     testing: bool = Field(default_factory=lambda: True)
     files: FileStore = Field(default_factory=FileStore)
     mailer: Mailer = Field(default_factory=Mailer)
     localization: Localization = Field(default_factory=Localization)
+    ratelimits: Dict[str, RateLimit] = Field(default_factory=dict)
 
     # Required
     sessions: Sessions = Field()
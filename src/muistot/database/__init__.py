@@ -6,6 +6,7 @@ from .connection import (
     OperationalError,
     InterfaceError,
 )
+from .routing import ReplicaRouter
 
 __all__ = [
     "Database",
@@ -14,4 +15,5 @@ __all__ = [
     "OperationalError",
     "InterfaceError",
     "DatabaseProvider",
+    "ReplicaRouter",
 ]
@@ -1,11 +1,18 @@
 import contextlib
-from typing import Mapping, Any
+from functools import lru_cache
+from time import perf_counter, monotonic
+from typing import Mapping, Any, Callable, Awaitable, List, Dict, Tuple, Optional
 
-from sqlalchemy import exc, text, Result
+from sqlalchemy import exc, text, Result, TextClause
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncConnection
 
 from .resultset import ResultSet
 from ..config.models import Database
+from ..logging import log
+
+SLOW_CHECKOUT_SECONDS = 0.1
+FAILOVER_SECONDS = 30
+STATEMENT_CACHE_SIZE = 1024
 
 
 class DatabaseError(Exception):
@@ -28,22 +35,143 @@ class InterfaceError(DatabaseError):
     """
 
 
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def statement(query: str) -> TextClause:
+    """Parses a query once per distinct query string
+
+    The clauses are never modified after creation, so they can be shared between connections.
+    """
+    return text(query)
+
+
+class PoolMetrics:
+    """Statistics of connection checkouts from the pool
+    """
+    __slots__ = ["checkouts", "timeouts", "wait_total", "wait_max"]
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, wait: float):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def dict(self) -> Dict[str, Any]:
+        return dict(
+            checkouts=self.checkouts,
+            timeouts=self.timeouts,
+            wait_total=self.wait_total,
+            wait_max=self.wait_max,
+            wait_avg=self.wait_total / self.checkouts if self.checkouts else 0.0,
+        )
+
+
+class StatementMetrics:
+    """Statistics of statements executed per request
+    """
+    __slots__ = ["reads", "writes", "read_statements", "write_statements"]
+
+    def __init__(self):
+        self.reads = 0
+        self.writes = 0
+        self.read_statements = 0
+        self.write_statements = 0
+
+    def record(self, read_only: bool, statements: int):
+        if read_only:
+            self.reads += 1
+            self.read_statements += statements
+        else:
+            self.writes += 1
+            self.write_statements += statements
+
+    def dict(self) -> Dict[str, Any]:
+        return dict(
+            reads=self.reads,
+            writes=self.writes,
+            read_statements=self.read_statements,
+            write_statements=self.write_statements,
+            statements_per_read=self.read_statements / self.reads if self.reads else 0.0,
+            statements_per_write=self.write_statements / self.writes if self.writes else 0.0,
+        )
+
+
 class ConnectionWrapper:
     """Wraps connection operations to something a bit more concise
+
+    The connection is checked out and the transaction started on the first statement,
+    so requests that never reach the database don't hold on to a pooled connection.
     """
-    connection: AsyncConnection
+    connection: Optional[AsyncConnection]
+    commit_callbacks: List[Callable[[], Awaitable]]
+    read_cache: Dict[Tuple[str, Tuple], Any]
+    read_only: bool
+    statements: int
 
-    def __init__(self, connection: AsyncConnection):
+    def __init__(self, connect: Callable[[], Awaitable[AsyncConnection]], read_only: bool = False):
         super(ConnectionWrapper, self).__init__()
-        self.connection = connection
+        self.connect = connect
+        self.connection = None
+        self.commit_callbacks = list()
+        self.read_cache = dict()
+        self.read_only = read_only
+        self.statements = 0
+
+    async def _connection(self) -> AsyncConnection:
+        if self.connection is None:
+            connection = await self.connect()
+            try:
+                await connection.begin()
+            except BaseException:
+                await connection.close()
+                raise
+            self.connection = connection
+        return self.connection
+
+    async def release(self, commit: bool):
+        """Ends the transaction and returns the connection to the pool
+
+        Does nothing if no statement has been executed.
+        """
+        connection, self.connection = self.connection, None
+        if connection is not None:
+            try:
+                if commit:
+                    await connection.commit()
+                else:
+                    await connection.rollback()
+            finally:
+                await connection.close()
+
+    def on_commit(self, callback: Callable[[], Awaitable]):
+        """Registers a coroutine function to be awaited once the transaction has been committed
+        """
+        self.commit_callbacks.append(callback)
+
+    @staticmethod
+    def _index(result: Result) -> Dict[str, int]:
+        """Column positions shared by all rows of a result
+        """
+        return {k: i for i, k in enumerate(result.keys())}
 
     @contextlib.asynccontextmanager
     async def _query(self, query: str, values: Mapping[str, Any]) -> Result:
-        query = text(query)
+        if not query.lstrip()[:6].upper() == "SELECT":
+            # Anything but a plain read may change the cached results
+            # and the transaction has to be committed after all
+            self.read_cache.clear()
+            self.read_only = False
+        query = statement(query)
+        connection = await self._connection()
+        self.statements += 1
         if values:
-            result = await self.connection.execute(query, parameters=values)
+            result = await connection.execute(query, parameters=values)
         else:
-            result = await self.connection.execute(query)
+            result = await connection.execute(query)
         yield result
 
     async def execute(self, query: str, values: Mapping[str, Any] = None):
@@ -55,22 +183,47 @@ class ConnectionWrapper:
             res = c.fetchone()
             return res[0] if res is not None else res
 
-    async def fetch_one(self, query: str, values: Mapping[str, Any] = None):
+    async def fetch_one(self, query: str, values: Mapping[str, Any] = None, *, cached: bool = False):
+        """Fetch a single row
+
+        Cached results are reused until the next statement that is not a SELECT on this connection.
+        """
+        if cached:
+            key = (query, tuple(sorted(values.items())) if values else tuple())
+            if key not in self.read_cache:
+                self.read_cache[key] = await self.fetch_one(query, values)
+            return self.read_cache[key]
         async with self._query(query, values) as c:
-            res = c.mappings().fetchone()
-            if res:
-                return ResultSet(res.items())
+            res = c.fetchone()
+            if res is not None:
+                return ResultSet.of(self._index(c), res)
 
     async def fetch_all(self, query: str, values: Mapping[str, Any] = None):
         async with self._query(query, values) as c:
-            rs = c.mappings().fetchall()
-            return [ResultSet(res.items()) for res in rs] if rs is not None else []
+            index = self._index(c)
+            return [ResultSet.of(index, res) for res in c.fetchall()]
+
+    async def stream(self, query: str, values: Mapping[str, Any] = None):
+        """Iterate rows from a server-side cursor
+
+        Rows are fetched while iterating, so no other statement can run on this connection
+        before the iteration is finished.
+        """
+        connection = await self._connection()
+        self.statements += 1
+        result = await connection.stream(statement(query), parameters=values or None)
+        try:
+            index = self._index(result)
+            async for res in result:
+                yield ResultSet.of(index, res)
+        finally:
+            await result.close()
 
     async def iterate(self, query: str, values: Mapping[str, Any] = None):
         async with self._query(query, values) as c:
-            rs = c.mappings()
-            for res in rs:
-                yield ResultSet(res.items())
+            index = self._index(c)
+            for res in c:
+                yield ResultSet.of(index, res)
 
 
 class DatabaseProvider:
@@ -83,9 +236,16 @@ class DatabaseProvider:
     gets overloaded with requests.
     """
     engine: AsyncEngine
+    metrics: PoolMetrics
+    statements: StatementMetrics
+    fallback: Optional['DatabaseProvider']
 
-    def __init__(self, config: Database):
+    def __init__(self, config: Database, fallback: Optional['DatabaseProvider'] = None):
         self.config = config
+        self.metrics = PoolMetrics()
+        self.statements = StatementMetrics()
+        self.fallback = fallback
+        self.unhealthy_until = 0.0
         try:
             self.engine = create_async_engine(
                 f"{config.driver}://{config.user}:{config.password}@{config.host}:{config.port}/{config.database}",
@@ -99,18 +259,88 @@ class DatabaseProvider:
         except exc.DBAPIError as e:
             raise OperationalError(f"{config.driver}://{config.host}:{config.port}/{config.database}") from e
 
+    def stats(self) -> Dict[str, Any]:
+        """Checkout metrics with the current pool usage
+        """
+        return dict(
+            **self.metrics.dict(),
+            **self.statements.dict(),
+            statement_cache_hits=statement.cache_info().hits,
+            statement_cache_misses=statement.cache_info().misses,
+            pool_size=self.engine.pool.size(),
+            checked_out=self.engine.pool.checkedout(),
+            overflow=self.engine.pool.overflow(),
+        )
+
+    @property
+    def healthy(self) -> bool:
+        return monotonic() >= self.unhealthy_until
+
+    async def _fail_over(self, e: Exception) -> AsyncConnection:
+        self.unhealthy_until = monotonic() + FAILOVER_SECONDS
+        log.warning("Database %s unavailable, using fallback for %d seconds", self.config.host, FAILOVER_SECONDS, exc_info=e)
+        return await self.fallback.checkout()
+
+    async def checkout(self) -> AsyncConnection:
+        """Takes a connection from the pool and records the time spent waiting for it
+
+        If this database has a fallback it is used instead while this one is unavailable.
+        """
+        if self.fallback is not None and not self.healthy:
+            return await self.fallback.checkout()
+        start = perf_counter()
+        try:
+            connection = await self.engine.connect()
+        except exc.TimeoutError as e:
+            self.metrics.timeouts += 1
+            if self.fallback is not None:
+                return await self._fail_over(e)
+            raise OperationalError("Database Connections Exhausted") from TimeoutError(*e.args)
+        except exc.DBAPIError as e:
+            if self.fallback is not None:
+                return await self._fail_over(e)
+            raise
+        wait = perf_counter() - start
+        self.metrics.record(wait)
+        if wait > SLOW_CHECKOUT_SECONDS:
+            log.warning(
+                "Waited %.3f seconds for a database connection (%d/%d checked out)",
+                wait,
+                self.engine.pool.checkedout(),
+                self.engine.pool.size(),
+            )
+        return connection
+
     @contextlib.asynccontextmanager
-    async def __call__(self):
+    async def __call__(self, read_only: bool = False):
         """Allocates a single connection
+
+        The connection is only checked out once the first statement is executed.
+        Read-only transactions are rolled back instead of committed and skip the commit callbacks.
+        This is not cheaper than a commit, both end the transaction in one round trip,
+        it only keeps a read from committing anything.
+
+        Parameters
+        ----------
+        read_only
+            No statements changing data are expected in the transaction,
+            if one is executed anyway the transaction is committed as usual
         """
         try:
-            async with self.engine.connect() as connection:
-                async with connection.begin() as tsx:
-                    yield ConnectionWrapper(connection)
-                    if self.config.rollback:
-                        await tsx.rollback()
-                    else:
-                        await tsx.commit()
+            wrapper = ConnectionWrapper(self.checkout, read_only=read_only)
+            try:
+                yield wrapper
+            except BaseException:
+                await wrapper.release(commit=False)
+                raise
+            finally:
+                self.statements.record(wrapper.read_only, wrapper.statements)
+            if self.config.rollback or wrapper.read_only:
+                await wrapper.release(commit=False)
+            else:
+                await wrapper.release(commit=True)
+                for callback in wrapper.commit_callbacks:
+                    await callback()
         except exc.DBAPIError as e:
             if isinstance(e, exc.IntegrityError):
                 raise IntegrityError() from e
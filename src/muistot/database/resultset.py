@@ -1,4 +1,4 @@
-from typing import Tuple, Iterable, Any, Union
+from typing import Tuple, Iterable, Any, Union, Mapping, Sequence
 
 
 class ResultSet:
@@ -16,22 +16,38 @@ class ResultSet:
     1
     >>> print(c2)
     b
+
+    Rows of the same result share the column index, so a row only holds a reference to its values.
     """
+    __slots__ = ["_index", "_values"]
+
+    _index: Mapping[str, int]
+    _values: Sequence[Any]
 
     def __init__(self, items: Iterable[Tuple[str, Any]]):
-        super(ResultSet, self).__init__()
-        self.dict = dict()
-        self.list = list()
+        index = dict()
+        values = list()
         for k, v in items:
-            self.dict[k] = v
-            self.list.append(v)
-        # Dict
-        self.values = self.dict.values
-        self.items = self.dict.items
-        self.get = self.dict.get
-        # List
-        self.count = self.list.count
-        self.__reversed__ = self.list.__reversed__
+            index[k] = len(values)
+            values.append(v)
+        self._index = index
+        self._values = values
+
+    @classmethod
+    def of(cls, index: Mapping[str, int], values: Sequence[Any]) -> 'ResultSet':
+        """Creates a row without copying the values
+
+        Parameters
+        ----------
+        index
+            Column name to position, shared by all rows of a result
+        values
+            Row values in column order
+        """
+        row = cls.__new__(cls)
+        row._index = index
+        row._values = values
+        return row
 
     def __getitem__(self, item: Union[str, int]):
         """Maps item to a value
@@ -40,36 +56,52 @@ class ResultSet:
         - Str is viewed as a column key
         """
         if isinstance(item, int):
-            return self.list[item]
+            return self._values[item]
         else:
-            return self.dict[item]
+            return self._values[self._index[item]]
 
     def __iter__(self):
         """Return all values from result
         """
-        return self.list.__iter__()
+        return iter(self._values)
+
+    def __reversed__(self):
+        return reversed(self._values)
 
     def __len__(self) -> int:
         """Results length e.i. number of columns
         """
-        return self.dict.__len__()
+        return len(self._index)
 
     def __repr__(self):
         """Dict.__repr__
         """
-        return self.dict.__repr__()
+        return dict(self.items()).__repr__()
 
     def __str__(self):
         """Dict.__str__
         """
-        return self.dict.__str__()
+        return dict(self.items()).__str__()
 
     def __contains__(self, key: str):
         """Checks for column in result set
         """
-        return key in self.dict
+        return key in self._index
 
     def keys(self):
         """Returns a view of result columns
         """
-        return self.dict.keys()
+        return self._index.keys()
+
+    def values(self):
+        return list(self._values)
+
+    def items(self):
+        return zip(self._index.keys(), self._values)
+
+    def get(self, key: str, default: Any = None):
+        i = self._index.get(key, None)
+        return self._values[i] if i is not None else default
+
+    def count(self, value: Any) -> int:
+        return list(self._values).count(value)
@@ -0,0 +1,74 @@
+import contextlib
+from functools import partial
+from typing import Optional
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from .connection import DatabaseProvider, ConnectionWrapper
+from ..logging import log
+
+
+class ReplicaRouter:
+    """Routes reads to a replica and everything else to the primary
+
+    Users who have just written keep reading from the primary for a while,
+    so they see their own changes even if the replica is lagging behind.
+    Unhealthy replicas fall back to the primary on their own.
+    """
+    primary: DatabaseProvider
+    replica: Optional[DatabaseProvider]
+    redis: Optional[Redis]
+
+    def __init__(self, primary: DatabaseProvider, replica: Optional[DatabaseProvider], redis: Optional[Redis]):
+        self.primary = primary
+        self.replica = replica
+        self.redis = redis
+
+    @staticmethod
+    def key(user: str) -> str:
+        return f"database:sticky:{user}"
+
+    async def wrote(self, user: str):
+        """Marks the user to read from the primary until the replica has caught up
+        """
+        try:
+            await self.redis.set(self.key(user), 1, ex=self.replica.config.sticky_seconds)
+        except RedisError as e:
+            log.warning("Failed to mark database writes", exc_info=e)
+
+    async def is_sticky(self, user: Optional[str]) -> bool:
+        if user is None:
+            return False
+        try:
+            return await self.redis.exists(self.key(user)) > 0
+        except RedisError as e:
+            log.warning("Failed to check database writes", exc_info=e)
+            return True
+
+    async def provider(self, read_only: bool, user: Optional[str] = None) -> DatabaseProvider:
+        if (
+                read_only
+                and self.replica is not None
+                and self.replica.healthy
+                and not (self.redis is not None and await self.is_sticky(user))
+        ):
+            return self.replica
+        return self.primary
+
+    @contextlib.asynccontextmanager
+    async def __call__(self, read_only: bool, user: Optional[str] = None) -> ConnectionWrapper:
+        """Allocates a connection from the database suitable for the request
+
+        Parameters
+        ----------
+        read_only
+            True if the request is not going to write
+        user
+            Identity of the user making the request if any
+        """
+        provider = await self.provider(read_only, user)
+        async with provider(read_only=read_only) as database:
+            if not read_only and user is not None and self.replica is not None and self.redis is not None:
+                database.on_commit(partial(self.wrote, user))
+            yield database
@@ -1,12 +1,18 @@
 import base64
 import binascii
+import os
 import re
+import tempfile
+import threading
 from collections import namedtuple
-from functools import lru_cache
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Any, Tuple, Optional
+from typing import Any, Callable, Tuple, Optional, TypeVar
 
-from fastapi import HTTPException, status
+import anyio
+import multipart
+from fastapi import HTTPException, Request, status
+from multipart.multipart import parse_options_header
 
 from ..config import Config
 from ..database import Database
@@ -15,6 +21,60 @@ from ..logging import log
 PREFIX = re.compile(r"^data:image/[a-z]+;base64,")
 MIME_PREFIX = re.compile(r"^.+?/")
 
+SNIFF_BYTES = 4096
+CHUNK_BYTES = 64 * 1024
+MULTIPART_OVERHEAD = 16 * 1024
+"""Allowance for the multipart boundaries and part headers on top of the upload limit"""
+
+T = TypeVar("T")
+
+_local = threading.local()
+
+
+def _magic():
+    """
+    Returns the libmagic instance of the current worker thread
+
+    The instances are not thread safe, so each worker keeps its own.
+    """
+    try:
+        return _local.magic
+    except AttributeError:
+        import magic
+        _local.magic = magic.Magic(mime=True)
+        return _local.magic
+
+
+class Workers:
+    """
+    Bounded thread pool for the blocking file work
+
+    At most ``workers`` jobs run at a time and at most ``backlog`` wait for a thread.
+    Anything beyond that is refused with a 503 to push back on the clients.
+    """
+
+    def __init__(self):
+        self._limiter: Optional[anyio.CapacityLimiter] = None
+
+    @property
+    def limiter(self) -> anyio.CapacityLimiter:
+        if self._limiter is None:
+            self._limiter = anyio.CapacityLimiter(Config.files.workers)
+        return self._limiter
+
+    async def run(self, f: Callable[..., T], *args: Any) -> T:
+        limiter = self.limiter
+        if limiter.available_tokens == 0 and limiter.statistics().tasks_waiting >= Config.files.backlog:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many uploads",
+                headers={"Retry-After": "1"},
+            )
+        return await anyio.to_thread.run_sync(partial(f, *args), limiter=limiter)
+
+
+workers = Workers()
+
 
 def is_allowed(file_type: str):
     return file_type in Config.files.allowed_filetypes
@@ -26,10 +86,9 @@ def check_file(input_data: str) -> Tuple[Optional[bytes], Optional[str]]:
     """
     file_type = "None"
     try:
-        import magic
         input_data = re.sub(PREFIX, "", input_data[:100], count=1) + input_data[100:]
         raw_data = base64.b64decode(input_data, validate=True)
-        file_type: str = magic.Magic(mime=True).from_buffer(raw_data)
+        file_type: str = _magic().from_buffer(raw_data[:SNIFF_BYTES])
         if is_allowed(file_type):
             return raw_data, re.sub(MIME_PREFIX, "", file_type)
     except (binascii.Error, UnicodeEncodeError):
@@ -42,6 +101,157 @@ def check_file(input_data: str) -> Tuple[Optional[bytes], Optional[str]]:
     return None, None
 
 
+def sniff(head: bytes) -> Optional[str]:
+    """
+    Detects the file type from the first bytes of a file
+
+    Returns the allowed subtype or None
+    """
+    file_type: str = _magic().from_buffer(head)
+    if is_allowed(file_type):
+        return re.sub(MIME_PREFIX, "", file_type)
+
+
+def write(path: Path, data: bytes):
+    """
+    Writes the file and syncs it to disk if configured
+    """
+    with open(path, "wb") as f:
+        f.write(data)
+        if Config.files.fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Image too large")
+
+
+def _open_temporary():
+    return tempfile.NamedTemporaryFile(dir=Config.files.location, prefix=".upload-", delete=False)
+
+
+def _finish(tmp):
+    with tmp:
+        if Config.files.fsync:
+            tmp.flush()
+            os.fsync(tmp.fileno())
+
+
+def _discard(tmp):
+    tmp.close()
+    os.unlink(tmp.name)
+
+
+class Upload:
+    """
+    Receives a multipart image upload straight into a temporary file in the file store
+
+    The body is parsed as it arrives and only the ``file`` field is kept.
+    The type is sniffed from the first bytes and the rest is written in chunks by the file workers.
+    Both the declared Content-Length and the received bytes are checked against the upload limit.
+    """
+
+    FIELD = b"file"
+
+    def __init__(self):
+        self.header_field = b""
+        self.header_value = b""
+        self.headers = dict()
+        self.active = False
+        self.ended = False
+        self.size = 0
+        self.pending = bytearray()
+        self.tmp = None
+        self.file_type: Optional[str] = None
+
+    def on_part_begin(self):
+        self.headers = dict()
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self.header_field += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self.header_value += data[start:end]
+
+    def on_header_end(self):
+        self.headers[self.header_field.lower()] = self.header_value
+        self.header_field = b""
+        self.header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self.headers.get(b"content-disposition", b""))
+        self.active = not self.ended and options.get(b"name", None) == Upload.FIELD
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self.active:
+            self.size += end - start
+            if self.size > Config.files.max_upload_bytes:
+                raise _too_large()
+            self.pending += data[start:end]
+
+    def on_part_end(self):
+        if self.active:
+            self.active = False
+            self.ended = True
+
+    async def _flush(self):
+        if self.tmp is None:
+            if len(self.pending) < SNIFF_BYTES and not self.ended:
+                return
+            self.file_type = await workers.run(sniff, bytes(self.pending[:SNIFF_BYTES]))
+            if self.file_type is None:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bad image")
+            self.tmp = await workers.run(_open_temporary)
+        if len(self.pending) >= CHUNK_BYTES or (self.ended and len(self.pending) > 0):
+            data = bytes(self.pending)
+            self.pending.clear()
+            await workers.run(self.tmp.write, data)
+
+    async def receive(self, request: Request) -> Tuple[str, str]:
+        """
+        Receives the upload
+
+        Returns the temporary file name and the file subtype
+        """
+        limit = Config.files.max_upload_bytes + MULTIPART_OVERHEAD
+        try:
+            if int(request.headers.get("content-length", 0)) > limit:
+                raise _too_large()
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bad Content-Length")
+        content_type, options = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected multipart form data")
+        parser = multipart.MultipartParser(options[b"boundary"], callbacks=dict(
+            on_part_begin=self.on_part_begin,
+            on_part_data=self.on_part_data,
+            on_part_end=self.on_part_end,
+            on_header_field=self.on_header_field,
+            on_header_value=self.on_header_value,
+            on_header_end=self.on_header_end,
+            on_headers_finished=self.on_headers_finished,
+        ))
+        received = 0
+        try:
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > limit:
+                    raise _too_large()
+                parser.write(chunk)
+                await self._flush()
+            parser.finalize()
+            if not self.ended:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Missing file")
+            await self._flush()
+            await workers.run(_finish, self.tmp)
+        except BaseException:
+            if self.tmp is not None:
+                _discard(self.tmp)
+            raise
+        return self.tmp.name, self.file_type
+
+
 class Files:
     """
     Interfacing with files in base64 strings
@@ -52,6 +262,38 @@ class Files:
         self.db = db
         self.user = user
 
+    async def _insert(self, file_type: str) -> Tuple[int, str]:
+        m = await self.db.fetch_one(
+            """
+            INSERT INTO images (uploader_id, file_name) 
+            SELECT
+                u.id,
+                CONCAT_WS('.', UUID(), :file_type)
+            FROM users u
+                WHERE u.username = :user
+            RETURNING id, file_name
+            """,
+            values=dict(user=self.user.identity, file_type=file_type),
+        )
+        if m is None:
+            log.warning(f"Failure to insert file\n{self.user.identity}")
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
+        return m[0], m[1]
+
+    async def _reference(self, file_name: str) -> int:
+        image_id = await self.db.fetch_val(
+            """
+            SELECT i.id
+            FROM images i
+                JOIN users u ON u.id = i.uploader_id
+            WHERE i.file_name = :image AND u.username = :user
+            """,
+            values=dict(image=file_name, user=self.user.identity),
+        )
+        if image_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bad image")
+        return image_id
+
     async def handle(self, file_data: Optional[str]) -> int:
         """
         Handle incoming image file data.
@@ -59,42 +301,48 @@ class Files:
         Checks filetype and saves the file.
         Name is generated from Database defaults.
 
-        :param file_data:   data in base64
+        The data can also be the name of an image the user has uploaded
+        through the upload endpoint in which case it is only referenced.
+
+        :param file_data:   data in base64 or an uploaded image name
         :return:            image_id if one was generated
         """
         if file_data is not None and self.user.is_authenticated:
-            data, file_type = check_file(file_data)
+            if Files.PATH.fullmatch(file_data):
+                return await self._reference(file_data)
+            data, file_type = await workers.run(check_file, file_data)
             if data is None:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Bad image")
-            m = await self.db.fetch_one(
-                """
-                INSERT INTO images (uploader_id, file_name) 
-                SELECT
-                    u.id,
-                    CONCAT_WS('.', UUID(), :file_type)
-                FROM users u
-                    WHERE u.username = :user
-                RETURNING id, file_name
-                """,
-                values=dict(user=self.user.identity, file_type=file_type),
-            )
-            if m is None:
-                log.warning(f"Failure to insert file\n{self.user.identity}")
-                raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE)
-            image_id = m[0]
-            file_name = m[1]
-            with open(self.path(file_name), "wb") as f:
-                f.write(data)
+            image_id, file_name = await self._insert(file_type)
+            await workers.run(write, self.path(file_name), data)
             return image_id
 
+    async def upload(self, request: Request) -> Tuple[int, str]:
+        """
+        Handle an uploaded image file.
+
+        The file is received straight into a temporary file next to the final one
+        while the request body arrives. The temporary file is renamed once the image
+        is in the database.
+
+        :param request: request with the image as multipart form data
+        :return:        image_id and file name
+        """
+        tmp, file_type = await Upload().receive(request)
+        try:
+            image_id, file_name = await self._insert(file_type)
+            os.replace(tmp, self.path(file_name))
+            return image_id, file_name
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
     @staticmethod
     def get_mime(file: Path):
         """
         raises FileNotFoundError
         """
-        import magic
-
-        return magic.Magic(mime=True).from_file(file)
+        return _magic().from_file(file)
 
     @staticmethod
     def path(image: str):
@@ -1,2 +1 @@
 from .login import start_email_login, complete_email_login
-from .utils import ratelimit
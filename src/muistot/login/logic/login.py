@@ -38,7 +38,7 @@ async def check_token(token: str, verifier: str) -> bool:
 
 
 async def start_session(username: str, db: Database, sm: SessionManager) -> Response:
-    token = sm.start_session(
+    token = await sm.start_session(
         Session(
             user=username,
             data=await load_session_data(username, db)
@@ -82,7 +82,7 @@ async def load_session_data(username: str, db: Database) -> Dict:
 
 
 async def start_session(username: str, db: Database, sm: SessionManager) -> Response:
-    token = sm.start_session(
+    token = await sm.start_session(
         Session(
             user=username,
             data=await load_session_data(username, db)
@@ -5,18 +5,21 @@ Requires the following middleware:
 - RedisMiddleware
 - SessionMiddleware
 - DatabaseMiddleware
+- RateLimitMiddleware
 """
 
 import urllib.parse as url
 from textwrap import dedent
 
-from fastapi import APIRouter, Request, Response, HTTPException, Depends
+import headers
+from fastapi import APIRouter, Response, HTTPException, Depends
 from pydantic import EmailStr
 
-from .logic import complete_email_login, start_email_login, ratelimit
+from .logic import complete_email_login, start_email_login
 from ..middleware.database import DatabaseMiddleware, Database
 from ..middleware.language import LanguageMiddleware
 from ..middleware.mailer import MailerMiddleware, Mailer
+from ..middleware.ratelimit import RateLimitMiddleware
 from ..middleware.session import SessionMiddleware, SessionManager, User
 from ..middleware.storage import RedisMiddleware, Redis
 
@@ -37,13 +40,11 @@ router = APIRouter(tags=["Auth"])
         This method is rate limited to ~1 r/s.
         """
     ),
+    dependencies=[RateLimitMiddleware.limit("status", rate=1)],
 )
 def get_status(
-        r: Request,
-        redis: Redis = Depends(RedisMiddleware.get),
         user: User = Depends(SessionMiddleware.user),
 ):
-    ratelimit(redis, "status", r.client.host, ttl_seconds=1)
     return Response(status_code=200 if user.is_authenticated else 401)
 
 
@@ -66,9 +67,9 @@ def get_status(
         This method is rate limited to ~10 r/min.
         """
     ),
+    dependencies=[RateLimitMiddleware.limit("exchange", rate=1 / 6, params=["email"])],
 )
 async def email_only_login(
-        r: Request,
         email: EmailStr,
         mailer: Mailer = Depends(MailerMiddleware.get),
         redis: Redis = Depends(RedisMiddleware.get),
@@ -78,7 +79,6 @@ async def email_only_login(
 ):
     if user.is_authenticated:
         raise HTTPException(status_code=403, detail="Already logged in")
-    ratelimit(redis, "exchange", r.client.host, email, ttl_seconds=6)
     return await start_email_login(email, db, language, mailer, redis)
 
 
@@ -101,9 +101,9 @@ async def email_only_login(
         This method is rate limited to ~10 r/min.
         """
     ),
+    dependencies=[RateLimitMiddleware.limit("login", rate=1 / 6, params=["user"])],
 )
 async def exchange_code(
-        r: Request,
         user: str,
         token: str,
         redis: Redis = Depends(RedisMiddleware.get),
@@ -113,5 +113,38 @@ async def exchange_code(
 ) -> Response:
     if user_instance.is_authenticated:
         raise HTTPException(status_code=403, detail="Already logged in")
-    ratelimit(redis, "login", r.client.host, user, ttl_seconds=6)
     return await complete_email_login(url.unquote(user), token, db, sm, redis)
+
+
+@router.post(
+    "/refresh",
+    status_code=200,
+    response_class=Response,
+    responses={
+        200: {"description": "Access token issued"},
+        401: {"description": "Not logged in with a session token"},
+        404: {"description": "Access tokens are not enabled"},
+    },
+    description=dedent(
+        """
+        Exchanges the session token for a short-lived access token.
+
+        The access token is returned in the Authorization header like the session token.
+        It is valid until it expires or the session is ended, after which a new one can be requested here
+        with the session token.
+        """
+    ),
+)
+async def refresh_access(
+        user: User = Depends(SessionMiddleware.user),
+        sm: SessionManager = Depends(SessionMiddleware.get),
+) -> Response:
+    if sm.access is None:
+        raise HTTPException(status_code=404, detail="Access tokens are not enabled")
+    if not user.is_authenticated:
+        raise HTTPException(status_code=401, detail="Not logged in")
+    try:
+        token = await sm.issue(user.token)
+    except ValueError as e:
+        raise HTTPException(status_code=401, detail=e.args[0])
+    return Response(status_code=200, headers={headers.AUTHORIZATION: f"bearer {token}"})
@@ -1,6 +1,8 @@
+from .cache import CacheMiddleware
 from .database import DatabaseMiddleware
 from .language import LanguageMiddleware
 from .mailer import MailerMiddleware
+from .ratelimit import RateLimitMiddleware
 from .session import SessionMiddleware
 from .storage import RedisMiddleware
 from .timing import TimingMiddleware
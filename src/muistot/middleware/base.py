@@ -0,0 +1,25 @@
+from abc import ABC, abstractmethod
+from typing import Any, Dict
+
+from starlette.types import ASGIApp, Scope, Receive, Send
+
+
+class StateMiddleware(ABC):
+    """Pure ASGI middleware adding values to the request state
+
+    The values are put in ``scope["state"]`` which backs ``request.state``.
+    Unlike ``BaseHTTPMiddleware`` this does not run the rest of the app in a separate task,
+    so the cost per request is a dictionary update and responses are streamed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    @abstractmethod
+    def state(self, scope: Scope) -> Dict[str, Any]:
+        """Values to add to the request state"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in {"http", "websocket"}:
+            scope.setdefault("state", dict()).update(self.state(scope))
+        await self.app(scope, receive, send)
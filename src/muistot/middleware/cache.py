@@ -0,0 +1,20 @@
+from redis.asyncio import Redis
+from starlette.requests import Request
+
+from .base import StateMiddleware
+from ..cache import ResponseCache
+
+
+class CacheMiddleware(StateMiddleware):
+
+    @staticmethod
+    def get(r: Request) -> ResponseCache:
+        return r.state.cache
+
+    def __init__(self, app, url: str, ttl: int, settle: int = 0):
+        super(CacheMiddleware, self).__init__(app)
+        self.url = url
+        self.cache = ResponseCache(redis=Redis.from_url(url), ttl=ttl, settle=settle)
+
+    def state(self, scope):
+        return dict(cache=self.cache)
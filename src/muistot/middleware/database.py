@@ -1,16 +1,18 @@
 from types import SimpleNamespace
-from typing import Dict
+from typing import Dict, Optional
 
+from redis.asyncio import Redis
 from starlette.applications import ASGIApp
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
 
+from .base import StateMiddleware
 from ..config.models import Database as DatabaseConfig
-from ..database import DatabaseProvider, Database
+from ..database import DatabaseProvider, Database, ReplicaRouter
 
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
 
-class DatabaseMiddleware(BaseHTTPMiddleware):
+
+class DatabaseMiddleware(StateMiddleware):
     instances: Dict[str, DatabaseProvider]
 
     @staticmethod
@@ -19,16 +21,35 @@ class DatabaseMiddleware(BaseHTTPMiddleware):
 
     @staticmethod
     async def default(r: Request) -> Database:
-        async with r.state.databases.default() as database:
+        """Connection to the default database or its replica for reads
+        """
+        user = r.scope.get("user", None)
+        async with r.state.database_router(
+                read_only=r.method in SAFE_METHODS,
+                user=user.identity if user is not None and user.is_authenticated else None,
+        ) as database:
             yield database
 
-    def __init__(self, app: ASGIApp, databases: Dict[str, DatabaseConfig]):
+    def __init__(self, app: ASGIApp, databases: Dict[str, DatabaseConfig], redis_url: Optional[str] = None):
         super(DatabaseMiddleware, self).__init__(app)
         self.instances = {
             database: DatabaseProvider(config)
             for database, config in databases.items()
+            if config.replica_of is None
         }
-
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request.state.databases = SimpleNamespace(**self.instances)
-        return await call_next(request)
+        for database, config in databases.items():
+            if config.replica_of is not None:
+                self.instances[database] = DatabaseProvider(config, fallback=self.instances[config.replica_of])
+        self.databases = SimpleNamespace(**self.instances)
+        self.router = ReplicaRouter(
+            primary=self.instances["default"],
+            replica=next((
+                self.instances[database]
+                for database, config in databases.items()
+                if config.replica_of == "default"
+            ), None),
+            redis=Redis.from_url(redis_url) if redis_url is not None else None,
+        )
+
+    def state(self, scope):
+        return dict(databases=self.databases, database_router=self.router)
@@ -1,10 +1,11 @@
 from typing import Optional, Iterable, Set
 
 from headers import ACCEPT_LANGUAGE, CONTENT_LANGUAGE
+from starlette.datastructures import Headers
 from starlette.exceptions import HTTPException
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
+
+from .base import StateMiddleware
 
 
 class LanguageChecker:
@@ -18,7 +19,7 @@ class LanguageChecker:
             raise HTTPException(status_code=406, detail="Language not supported")
 
 
-class LanguageMiddleware(BaseHTTPMiddleware):
+class LanguageMiddleware(StateMiddleware):
 
     @staticmethod
     def get(r: Request) -> str:
@@ -42,22 +43,24 @@ class LanguageMiddleware(BaseHTTPMiddleware):
             if lang in self.languages:
                 return lang
 
-    def extract_language(self, request: Request):
+    def extract_language(self, scope):
         """Extract language from request.
         """
         try:
-            language_header = request.headers.get("Muistot-Language", None)
+            headers = Headers(scope=scope)
+            language_header = headers.get("Muistot-Language", None)
             if not language_header:
-                if request.method == "GET":
-                    language_header = request.headers[ACCEPT_LANGUAGE]
+                if scope.get("method", "GET") == "GET":
+                    language_header = headers[ACCEPT_LANGUAGE]
                 else:
-                    language_header = request.headers[CONTENT_LANGUAGE]
+                    language_header = headers[CONTENT_LANGUAGE]
             return self.validate_language(language_header)
         except KeyError:
             return None
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request.state.language = self.extract_language(request)
-        request.state.default_language = self.default_language
-        request.state.language_checker = self.checker
-        return await call_next(request)
+    def state(self, scope):
+        return dict(
+            language=self.extract_language(scope),
+            default_language=self.default_language,
+            language_checker=self.checker,
+        )
@@ -1,12 +1,11 @@
 from starlette.applications import ASGIApp
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
 
+from .base import StateMiddleware
 from ..mailer import *
 
 
-class MailerMiddleware(BaseHTTPMiddleware):
+class MailerMiddleware(StateMiddleware):
     DRIVERS = {
         impl.__name__: impl
         for impl in [
@@ -30,6 +29,5 @@ class MailerMiddleware(BaseHTTPMiddleware):
         self.data = config
         self.instance = MailerMiddleware.DRIVERS[driver](**config)
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request.state.mailer = self.instance
-        return await call_next(request)
+    def state(self, scope):
+        return dict(mailer=self.instance)
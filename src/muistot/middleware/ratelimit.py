@@ -0,0 +1,82 @@
+import math
+from typing import Sequence
+
+from fastapi import Depends, HTTPException, status
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from starlette.requests import Request
+
+from .base import StateMiddleware
+from ..config import Config
+from ..logging import log
+from ..security.ratelimit import RateLimiter
+
+
+class RateLimitMiddleware(StateMiddleware):
+
+    @staticmethod
+    def get(r: Request) -> RateLimiter:
+        return r.state.limiter
+
+    @staticmethod
+    def client(r: Request) -> str:
+        """Authenticated users are limited by identity and others by address
+        """
+        user = r.scope.get("user", None)
+        if user is not None and user.is_authenticated:
+            return f"user:{user.identity}"
+        return f"host:{r.client.host if r.client is not None else ''}"
+
+    @staticmethod
+    def limit(name: str, *, rate: float, burst: int = 1, params: Sequence[str] = ()) -> Depends:
+        """Creates a dependency rate limiting an endpoint
+
+        The client and each listed request parameter get their own bucket.
+        The rate and burst can be overridden by name in the ratelimits config,
+        an override without a burst keeps the one given here.
+
+        Parameters
+        ----------
+        name
+            Name of the limit
+        rate
+            Requests allowed per second on average
+        burst
+            Requests allowed at once
+        params
+            Names of the query or path parameters to limit separately
+        """
+
+        async def check_limit(r: Request):
+            override = Config.ratelimits.get(name, None)
+            values = [RateLimitMiddleware.client(r)]
+            for param in params:
+                value = r.path_params.get(param, None) or r.query_params.get(param, None)
+                if value is not None:
+                    values.append(f"{param}:{value}")
+            try:
+                wait = await RateLimitMiddleware.get(r).take(
+                    name,
+                    *values,
+                    rate=override.rate if override is not None else rate,
+                    burst=override.burst if override is not None and override.burst is not None else burst,
+                )
+            except RedisError as e:
+                log.warning("Failed to check rate limit", exc_info=e)
+                return
+            if wait > 0:
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Too many requests",
+                    headers={"Retry-After": str(math.ceil(wait))},
+                )
+
+        return Depends(check_limit)
+
+    def __init__(self, app, url: str):
+        super(RateLimitMiddleware, self).__init__(app)
+        self.url = url
+        self.limiter = RateLimiter(redis=Redis.from_url(url))
+
+    def state(self, scope):
+        return dict(limiter=self.limiter)
@@ -4,7 +4,6 @@ Supplies dependencies needed for session resolution.
 
 from typing import Optional, Tuple
 
-import redis
 from headers import AUTHORIZATION
 from starlette import status
 from starlette.applications import ASGIApp
@@ -14,6 +13,7 @@ from starlette.middleware.authentication import (
     AuthenticationError,
     AuthenticationMiddleware,
 )
+from redis.asyncio import Redis, ConnectionPool
 from starlette.requests import HTTPConnection, Request
 
 from ..errors import ErrorResponse, ApiError
@@ -31,13 +31,31 @@ class SessionMiddleware(AuthenticationMiddleware, AuthenticationBackend):
     def user(r: Request) -> User:
         return r.user
 
-    def __init__(self, app: ASGIApp, url: str, token_bytes: int, lifetime: int):
+    def __init__(
+            self,
+            app: ASGIApp,
+            url: str,
+            token_bytes: int,
+            lifetime: int,
+            sweep_interval: Optional[int] = None,
+            local_ttl: Optional[int] = None,
+            extend_interval: int = 0,
+            access_secret: Optional[str] = None,
+            access_lifetime: int = 60 * 5,
+    ):
         super(SessionMiddleware, self).__init__(app, backend=self, on_error=SessionMiddleware.on_error)
-        self.redis = redis.from_url(url)
-        self.manager = SessionManager(redis=self.redis, token_bytes=token_bytes, lifetime=lifetime)
-
-    def __del__(self):
-        self.redis.close()
+        self.pool = ConnectionPool.from_url(url)
+        self.redis = Redis(connection_pool=self.pool)
+        self.manager = SessionManager(
+            redis=self.redis,
+            token_bytes=token_bytes,
+            lifetime=lifetime,
+            local_ttl=local_ttl,
+            extend_interval=extend_interval,
+            access_secret=access_secret,
+            access_lifetime=access_lifetime,
+        )
+        self.sweep_interval = sweep_interval
 
     @staticmethod
     def on_error(_: HTTPConnection, exc: AuthenticationError):
@@ -57,13 +75,16 @@ class SessionMiddleware(AuthenticationMiddleware, AuthenticationBackend):
                 r.state.sessions: SessionManager
         """
         conn.state.sessions = self.manager
+        if self.sweep_interval is not None:
+            self.manager.start_sweeper(self.sweep_interval)
+        self.manager.start_listener()
         header = conn.headers.get(AUTHORIZATION, None)
         if header is not None:
             scheme, _, credentials = header.partition(" ")
             if scheme.lower() != "bearer":
                 raise AuthenticationError() from ValueError("Wrong Scheme")
             try:
-                session = self.manager.get_session(credentials)
+                session = await self.manager.get_session(credentials)
                 user = User.from_cache(username=session.user, token=credentials)
                 session_data = session.data
                 if "projects" in session_data:
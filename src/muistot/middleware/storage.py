@@ -1,10 +1,10 @@
 from redis import Redis
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
 from starlette.requests import Request
-from starlette.responses import Response
 
+from .base import StateMiddleware
 
-class RedisMiddleware(BaseHTTPMiddleware):
+
+class RedisMiddleware(StateMiddleware):
 
     @staticmethod
     def get(r: Request) -> Redis:
@@ -15,6 +15,5 @@ class RedisMiddleware(BaseHTTPMiddleware):
         self.url = url
         self.redis = Redis.from_url(url)
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        request.state.redis = self.redis
-        return await call_next(request)
+    def state(self, scope):
+        return dict(redis=self.redis)
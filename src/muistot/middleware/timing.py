@@ -1,26 +1,26 @@
 from logging import Logger
 from time import time_ns
 
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
-from starlette.requests import Request
-from starlette.responses import Response
-from starlette.types import ASGIApp
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Scope, Receive, Send
 
 
-class TimingMiddleware(BaseHTTPMiddleware):
+class TimingMiddleware:
 
     def __init__(self, app: ASGIApp, logger: Logger) -> None:
-        super(TimingMiddleware, self).__init__(app)
+        self.app = app
         self.logger = logger
 
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
         start = time_ns()
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send)
         finally:
             self.logger.info(
                 "%s request to %s took %.3f millis",
-                request.method,
-                request.url,
+                scope["method"],
+                HTTPConnection(scope).url,
                 (time_ns() - start) / 1E6,
             )
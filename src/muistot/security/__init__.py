@@ -1,4 +1,5 @@
 from . import scopes
+from .ratelimit import RateLimiter
 from .sessions import SessionManager, Session
 from .user import User
 
@@ -7,4 +8,5 @@ __all__ = [
     "scopes",
     "Session",
     "SessionManager",
+    "RateLimiter",
 ]
@@ -0,0 +1,97 @@
+"""
+Token bucket rate limits kept in Redis.
+"""
+from hashlib import sha1
+
+from redis.asyncio import Redis
+
+RATELIMIT_PREFIX = "ratelimit:"
+
+# Buckets refill continuously at rate tokens per second up to burst tokens.
+# A request is allowed only if every bucket has enough tokens and then takes from all of them.
+# Time comes from the Redis server so that all workers agree on it.
+#
+# KEYS: buckets
+# ARGV: rate, burst, cost
+# Returns seconds to wait before the request would be allowed, 0 if allowed
+TOKEN_BUCKET = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local state = redis.call('HMGET', key, 'tokens', 'at')
+    local tokens = tonumber(state[1]) or burst
+    local at = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+    levels[i] = tokens
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+local ttl = math.ceil(burst / rate * 1000)
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - cost), 'at', tostring(now))
+    redis.call('PEXPIRE', key, ttl)
+end
+return '0'
+"""
+
+
+class RateLimiter:
+    """Rate limits requests with token buckets in Redis
+
+    Each check is a single script call regardless of the amount of buckets.
+    """
+
+    redis: Redis
+
+    def __init__(self, *, redis: Redis):
+        """Create a new RateLimiter
+
+        Parameters
+        ----------
+        redis
+            Asyncio Redis instance
+        """
+        super(RateLimiter, self).__init__()
+        self.redis = redis
+        self._take = redis.register_script(TOKEN_BUCKET)
+
+    @staticmethod
+    def key(name: str, value: str) -> str:
+        return f"{RATELIMIT_PREFIX}{name}:{sha1(value.encode('utf-8')).hexdigest()}"
+
+    async def take(self, name: str, *values: str, rate: float, burst: int = 1, cost: int = 1) -> float:
+        """Takes tokens from the buckets of a limit
+
+        Parameters
+        ----------
+        name
+            Name of the limit
+        values
+            Values to limit separately e.g. client address or email
+        rate
+            Tokens added per second
+        burst
+            Maximum amount of tokens in a bucket
+        cost
+            Tokens taken by this request
+
+        Returns
+        -------
+        Seconds until the request would be allowed, 0 if it was allowed
+        """
+        keys = [RateLimiter.key(name, value) for value in values]
+        return float(await self._take(keys=keys, args=[rate, burst, cost]))
+
+
+__all__ = [
+    "RateLimiter",
+]
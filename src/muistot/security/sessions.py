@@ -1,20 +1,128 @@
 """
 Supplies dependencies needed for session resolution.
 """
+import asyncio
 import base64
 import binascii
 import dataclasses
 import json
 import secrets
+import time
+from collections import OrderedDict
 from hashlib import sha256
-from typing import Optional, Dict, NoReturn, Union, List
+from typing import Optional, Dict, NoReturn, Union, List, Tuple
 
-from redis import Redis
+from redis.asyncio import Redis
+
+from .tokens import AccessTokens, BloomFilter, is_access_token
+from ..logging import log
 
 ALT = b":-"
-USER_PREFIX = "user:"
+USER_PREFIX = "user-sessions:"
+LEGACY_USER_PREFIX = "user:"
 TOKEN_PREFIX = b"token:"
 
+UNLINK_BATCH = 1000
+SWEEP_BATCH = 1000
+
+# Sessions cached in process are dropped on messages in this channel
+INVALIDATION_CHANNEL = "sessions:invalidate"
+INVALIDATE_TOKEN = b"token:"
+INVALIDATE_USER = b"user:"
+INVALIDATE_ALL = b"*"
+
+# Invalidation messages scored by their time, kept for the access token lifetime
+REVOKED = "sessions:revoked"
+
+# The per-user index is a sorted set of token hashes scored by their expiry time.
+# Expired members can then be pruned with a single ZREMRANGEBYSCORE.
+# Sessions started before the index existed are listed in plain sets under LEGACY_USER_PREFIX,
+# they are added to the index when resolved and cleared together with it.
+
+# KEYS: user, token_hash
+# ARGV: session, lifetime, now, expiry
+START_SESSION = """
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+redis.call('ZADD', KEYS[1], ARGV[4], KEYS[2])
+if ARGV[2] == '' then
+    redis.call('SET', KEYS[2], ARGV[1])
+else
+    redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[2])
+end
+return 1
+"""
+
+# KEYS: token_hash
+# ARGV: user prefix, lifetime, expiry
+GET_SESSION = """
+local data = redis.call('GET', KEYS[1])
+if data then
+    if ARGV[2] ~= '' then
+        redis.call('EXPIRE', KEYS[1], ARGV[2])
+    end
+    redis.call('ZADD', ARGV[1] .. cjson.decode(data)['user'], ARGV[3], KEYS[1])
+end
+return data
+"""
+
+# KEYS: token_hash, revoked
+# ARGV: user prefix, channel, message, now, cutoff
+END_SESSION = """
+local data = redis.call('GET', KEYS[1])
+if data then
+    redis.call('UNLINK', KEYS[1])
+    redis.call('ZREM', ARGV[1] .. cjson.decode(data)['user'], KEYS[1])
+end
+if ARGV[4] ~= '' then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[5])
+    redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+end
+redis.call('PUBLISH', ARGV[2], ARGV[3])
+return data
+"""
+
+# KEYS: user, revoked, legacy user
+# ARGV: batch size, channel, message, now, cutoff
+CLEAR_SESSIONS = """
+local tokens = redis.call('ZRANGE', KEYS[1], 0, -1)
+if redis.call('TYPE', KEYS[3])['ok'] == 'set' then
+    for _, token in ipairs(redis.call('SMEMBERS', KEYS[3])) do
+        table.insert(tokens, token)
+    end
+    redis.call('UNLINK', KEYS[3])
+end
+local batch = tonumber(ARGV[1])
+for i = 1, #tokens, batch do
+    redis.call('UNLINK', unpack(tokens, i, math.min(i + batch - 1, #tokens)))
+end
+redis.call('UNLINK', KEYS[1])
+if ARGV[4] ~= '' then
+    redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', ARGV[5])
+    redis.call('ZADD', KEYS[2], ARGV[4], ARGV[3])
+end
+redis.call('PUBLISH', ARGV[2], ARGV[3])
+return #tokens
+"""
+
+# KEYS: user
+# ARGV: now
+GET_SESSIONS = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local sessions = {}
+for _, token in ipairs(redis.call('ZRANGE', KEYS[1], 0, -1)) do
+    local data = redis.call('GET', token)
+    if data then
+        table.insert(sessions, data)
+    else
+        redis.call('ZREM', KEYS[1], token)
+    end
+end
+return sessions
+"""
+
 
 @dataclasses.dataclass
 class Session:
@@ -35,9 +143,17 @@ def decode(token: str) -> bytes:
 
 class SessionManager:
     """Manages Session in Redis
+
+    Sessions can also be cached in process for a short time.
+    The cache is only used while subscribed to the invalidation channel
+    and the expiry of cached sessions is extended at most once per ``extend_interval``.
+
+    With an ``access_secret`` the session tokens can be exchanged for short-lived signed access tokens.
+    These are verified without Redis unless the revocation filter reports a possible revocation.
     """
 
     redis: Redis
+    local: "OrderedDict[bytes, Tuple[float, float, Session]]"
 
     def __init__(
             self,
@@ -45,37 +161,94 @@ class SessionManager:
             redis: Redis,
             token_bytes: int = 64,
             lifetime: Optional[int] = None,
+            local_ttl: Optional[float] = None,
+            local_size: int = 1024,
+            extend_interval: float = 0,
+            access_secret: Optional[str] = None,
+            access_lifetime: int = 60 * 5,
     ):
         """Create a new SessionManager
 
         Parameters
         ----------
         redis
-            Redis instance
+            Asyncio Redis instance, usually sharing a connection pool
         token_bytes
             Amount of bytes in token
         lifetime
             Session Token expiry time in seconds
+        local_ttl
+            Seconds a session is cached in process, None disables the cache
+        local_size
+            Maximum amount of sessions cached in process
+        extend_interval
+            Minimum seconds between expiry extensions of a cached session
+        access_secret
+            Key for signing access tokens, None disables access tokens
+        access_lifetime
+            Access Token expiry time in seconds
         """
         super(SessionManager, self).__init__()
         self.bytes = token_bytes
         self.redis = redis
         self.lifetime = lifetime
+        self.local_ttl = local_ttl
+        self.local_size = local_size
+        self.extend_interval = extend_interval
+        self.local = OrderedDict()
+        self.listening = False
+        self._generation = 0
+        self._listener: Optional[asyncio.Task] = None
+        self.access = AccessTokens(secret=access_secret, lifetime=access_lifetime) if access_secret else None
+        self.revoked = BloomFilter()
+        self._loading: Optional[BloomFilter] = None
+        self._start = redis.register_script(START_SESSION)
+        self._get = redis.register_script(GET_SESSION)
+        self._end = redis.register_script(END_SESSION)
+        self._clear = redis.register_script(CLEAR_SESSIONS)
+        self._get_all = redis.register_script(GET_SESSIONS)
+        self._sweeper: Optional[asyncio.Task] = None
 
-    def extend(self, value: Union[bytes, str]):
+    def _expiry(self) -> Union[float, str]:
+        return time.time() + self.lifetime if self.lifetime is not None else "+inf"
+
+    def _revocation(self) -> Tuple[Union[float, str], Union[float, str]]:
+        if self.access is None:
+            return "", ""
+        now = time.time()
+        return now, now - self.access.lifetime
+
+    def _session_id(self, token: str) -> bytes:
+        if is_access_token(token):
+            if self.access is None:
+                raise ValueError("Invalid Token Format")
+            return self.access.verify(token, allow_expired=True)[2]
+        return decode(token)
+
+    async def extend(self, value: Union[bytes, str], user: Optional[str] = None):
         """Extends a key in the Redis
 
+        The expiry in the user session index is updated in the same pipeline.
+
         Parameters
         ----------
         value
             Key to extend
+        user
+            Owner of the session if the key is a session
         """
         if self.lifetime is not None:
-            self.redis.expire(value, self.lifetime)
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.expire(value, self.lifetime)
+                if user is not None:
+                    pipe.zadd(f"{USER_PREFIX}{user}", {value: self._expiry()}, xx=True)
+                await pipe.execute()
 
-    def get_session(self, token: str) -> Session:
+    async def get_session(self, token: str) -> Session:
         """Fetches a session if one exists
 
+        The fetch and the expiry extension are done in a single script call.
+
         Parameters
         ----------
         token
@@ -90,27 +263,86 @@ class SessionManager:
         ValueError
             On failure to resolve session
         """
-        token = decode(token)
-        self.extend(token)
-        data = self.redis.get(token)
+        if is_access_token(token):
+            return await self._verify_access(token)
+        token_hash = decode(token)
+        caching = self.listening and self.local_ttl is not None
+        entry = self.local.get(token_hash, None) if caching else None
+        if entry is not None:
+            expires, extended, session = entry
+            now = time.monotonic()
+            if expires > now:
+                self.local.move_to_end(token_hash)
+                if now - extended >= self.extend_interval:
+                    self.local[token_hash] = (expires, now, session)
+                    await self.extend(token_hash, session.user)
+                return session
+            del self.local[token_hash]
+        generation = self._generation
+        lifetime = self.lifetime if self.lifetime is not None else ""
+        data = await self._get(keys=[token_hash], args=[USER_PREFIX, lifetime, self._expiry()])
         if data is not None:
-            return Session(**json.loads(data))
+            session = Session(**json.loads(data))
+            if caching and generation == self._generation:
+                self._store_local(token_hash, session)
+            return session
         raise ValueError("Invalid Session")
 
-    def start_session(self, session: Session) -> str:
+    async def _verify_access(self, token: str) -> Session:
+        if self.access is None:
+            raise ValueError("Invalid Token Format")
+        user, data, session_id, issued = self.access.verify(token)
+        members = [INVALIDATE_TOKEN + session_id, INVALIDATE_USER + user.encode("utf-8"), INVALIDATE_ALL]
+        if not self.listening or any(member in self.revoked for member in members):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for member in members:
+                    pipe.zscore(REVOKED, member)
+                revoked = await pipe.execute()
+            if any(at is not None and at >= issued for at in revoked):
+                raise ValueError("Invalid Session")
+        return Session(user=user, data=data)
+
+    async def issue(self, token: str) -> str:
+        """Issues an access token for a session
+
+        Parameters
+        ----------
+        token
+            Session Token the access token is refreshed with
+
+        Returns
+        -------
+        Signed access token
+
+        Raises
+        ------
+        ValueError
+            If access tokens are disabled or the session is not valid
+        """
+        if self.access is None:
+            raise ValueError("Access Tokens Disabled")
+        if is_access_token(token):
+            raise ValueError("Session Token Required")
+        session = await self.get_session(token)
+        return self.access.sign(session.user, session.data, decode(token))
+
+    async def start_session(self, session: Session) -> str:
         """Returns a session id for given user and stores session data
+
+        Stale sessions are cleared and the new one is stored in a single script call.
         """
-        self.clear_stale(session.user)
+        data = json.dumps(dataclasses.asdict(session))
+        lifetime = self.lifetime if self.lifetime is not None else ""
         while True:
             token = TOKEN_PREFIX + secrets.token_bytes(nbytes=self.bytes)
             token_hash = sha256(token).digest()
-            if not self.redis.exists(token_hash):
-                break
-        self.redis.sadd(f"{USER_PREFIX}{session.user}", token_hash)
-        self.redis.set(token_hash, json.dumps(dataclasses.asdict(session)), ex=self.lifetime)
-        return encode(token)
+            if await self._start(
+                    keys=[f"{USER_PREFIX}{session.user}", token_hash],
+                    args=[data, lifetime, time.time(), self._expiry()],
+            ):
+                return encode(token)
 
-    def end_session(self, token: str) -> NoReturn:
+    async def end_session(self, token: str) -> NoReturn:
         """Ends a session
 
         Parameters
@@ -118,13 +350,15 @@ class SessionManager:
         token
             Session token
         """
-        token = decode(token)
-        data = self.redis.get(token)
-        self.redis.delete(token)
-        if data is not None:
-            self.redis.srem(f"{USER_PREFIX}{Session(**json.loads(data)).user}", token)
+        token_hash = self._session_id(token)
+        message = INVALIDATE_TOKEN + token_hash
+        self._invalidate(message)
+        await self._end(
+            keys=[token_hash, REVOKED],
+            args=[USER_PREFIX, INVALIDATION_CHANNEL, message, *self._revocation()],
+        )
 
-    def clear_sessions(self, user: str) -> NoReturn:
+    async def clear_sessions(self, user: str) -> NoReturn:
         """Clears all sessions for a user
 
         Parameters
@@ -132,35 +366,144 @@ class SessionManager:
         user
             Username of user for which the sessions should be cleared
         """
-        key = f"{USER_PREFIX}{user}"
-        tokens = self.redis.smembers(key)
-        self.redis.delete(key)
-        for token in tokens:
-            self.redis.delete(token)
+        message = INVALIDATE_USER + user.encode("utf-8")
+        self._invalidate(message)
+        await self._clear(
+            keys=[f"{USER_PREFIX}{user}", REVOKED, f"{LEGACY_USER_PREFIX}{user}"],
+            args=[UNLINK_BATCH, INVALIDATION_CHANNEL, message, *self._revocation()],
+        )
 
-    def clear_all_sessions(self) -> NoReturn:
+    async def clear_all_sessions(self) -> NoReturn:
         """Clears all sessions in the database
         """
-        self.redis.flushdb()
+        self._invalidate(INVALIDATE_ALL)
+        await self.redis.flushdb()
+        if self.access is not None:
+            await self.redis.zadd(REVOKED, {INVALIDATE_ALL: time.time()})
+        await self.redis.publish(INVALIDATION_CHANNEL, INVALIDATE_ALL)
 
-    def clear_stale(self, user: str):
+    async def clear_stale(self, user: str):
         """Clears all stale user sessions
         """
-        user_sessions = f"{USER_PREFIX}{user}"
-        for session in self.redis.smembers(user_sessions):
-            if not self.redis.exists(session):
-                self.redis.srem(user_sessions, session)
+        await self.redis.zremrangebyscore(f"{USER_PREFIX}{user}", "-inf", time.time())
 
-    def get_sessions(self, user: str) -> List[Session]:
+    async def get_sessions(self, user: str) -> List[Session]:
         """Gets all open user sessions
+
+        Stale sessions are cleared in the same script call.
+        """
+        sessions = await self._get_all(keys=[f"{USER_PREFIX}{user}"], args=[time.time()])
+        return [Session(**json.loads(data)) for data in sessions]
+
+    async def sweep(self) -> int:
+        """Prunes expired sessions from all user session indexes
+
+        Returns
+        -------
+        Amount of pruned sessions
+        """
+        removed = 0
+        cursor = 0
+        while True:
+            cursor, keys = await self.redis.scan(cursor, match=f"{USER_PREFIX}*", count=SWEEP_BATCH)
+            if keys:
+                now = time.time()
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for key in keys:
+                        pipe.zremrangebyscore(key, "-inf", now)
+                    removed += sum(await pipe.execute())
+            if cursor == 0:
+                break
+        if self.access is not None:
+            await self.redis.zremrangebyscore(REVOKED, "-inf", self._revocation()[1])
+            if self.listening:
+                await self._load_revoked()
+        return removed
+
+    async def _sweep(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                log.warning("Failed to sweep sessions", exc_info=e)
+
+    def start_sweeper(self, interval: float):
+        """Starts sweeping expired sessions in the background if not running
+
+        Parameters
+        ----------
+        interval
+            Seconds between sweeps
+        """
+        if not self._running(self._sweeper):
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep(interval))
+
+    def start_listener(self):
+        """Starts listening for session invalidations in the background if not running
+
+        Sessions are only cached in process while listening.
+        """
+        if (self.local_ttl is not None or self.access is not None) and not self._running(self._listener):
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+    @staticmethod
+    def _running(task: Optional[asyncio.Task]) -> bool:
+        return task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop()
+
+    async def _listen(self):
+        pubsub = self.redis.pubsub()
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            async for message in pubsub.listen():
+                if message["type"] == "subscribe":
+                    if self.access is not None:
+                        await self._load_revoked()
+                    self.listening = True
+                elif message["type"] == "message":
+                    self._invalidate(message["data"])
+        except Exception as e:
+            log.warning("Stopped listening for session invalidations", exc_info=e)
+        finally:
+            self.listening = False
+            self._invalidate(INVALIDATE_ALL)
+            await pubsub.close()
+
+    async def _load_revoked(self):
+        """Rebuilds the revocation filter from the recent revocations
+
+        Invalidations arriving during the load are added to the new filter as well.
         """
-        self.clear_stale(user)
-        out = list()
-        for session in self.redis.smembers(f"{USER_PREFIX}{user}"):
-            data = self.redis.get(session)
-            if data:
-                out.append(Session(**json.loads(data)))
-        return out
+        revoked = BloomFilter()
+        self._loading = revoked
+        try:
+            for member in await self.redis.zrangebyscore(REVOKED, self._revocation()[1], "+inf"):
+                revoked.add(member)
+            self.revoked = revoked
+        finally:
+            self._loading = None
+
+    def _invalidate(self, message: bytes):
+        self._generation += 1
+        if self.access is not None:
+            self.revoked.add(message)
+            if self._loading is not None:
+                self._loading.add(message)
+        if message == INVALIDATE_ALL:
+            self.local.clear()
+        elif message.startswith(INVALIDATE_TOKEN):
+            self.local.pop(message[len(INVALIDATE_TOKEN):], None)
+        elif message.startswith(INVALIDATE_USER):
+            user = message[len(INVALIDATE_USER):].decode("utf-8")
+            for token_hash in [k for k, (_, _, session) in self.local.items() if session.user == user]:
+                del self.local[token_hash]
+
+    def _store_local(self, token_hash: bytes, session: Session):
+        now = time.monotonic()
+        self.local[token_hash] = (now + self.local_ttl, now, session)
+        self.local.move_to_end(token_hash)
+        while len(self.local) > self.local_size:
+            self.local.popitem(last=False)
 
 
 __all__ = [
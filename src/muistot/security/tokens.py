@@ -0,0 +1,116 @@
+"""
+Short-lived signed access tokens and a filter for their revocations.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+import json
+import time
+from typing import Dict, Tuple
+
+SEPARATOR = "."
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data.encode("ascii") + b"=" * (-len(data) % 4))
+
+
+def is_access_token(token: str) -> bool:
+    """Opaque session tokens never contain the separator
+    """
+    return SEPARATOR in token
+
+
+class AccessTokens:
+    """Signs and verifies access tokens with HMAC-SHA256
+
+    The token carries the session user and data together with the id of the
+    session it was issued from, so it can be revoked along with the session.
+    """
+
+    def __init__(self, *, secret: str, lifetime: int):
+        """Create a new AccessTokens
+
+        Parameters
+        ----------
+        secret
+            Key used for signing
+        lifetime
+            Access Token expiry time in seconds
+        """
+        self.key = secret.encode("utf-8")
+        self.lifetime = lifetime
+
+    def _signature(self, payload: bytes) -> bytes:
+        return hmac.new(self.key, payload, hashlib.sha256).digest()
+
+    def sign(self, user: str, data: Dict, session_id: bytes) -> str:
+        """Creates an access token for a session
+        """
+        now = time.time()
+        payload = json.dumps(
+            dict(user=user, data=data, sid=_encode(session_id), iat=now, exp=now + self.lifetime),
+            separators=(",", ":"),
+        ).encode("utf-8")
+        return f"{_encode(payload)}{SEPARATOR}{_encode(self._signature(payload))}"
+
+    def verify(self, token: str, *, allow_expired: bool = False) -> Tuple[str, Dict, bytes, float]:
+        """Verifies an access token
+
+        Returns
+        -------
+        The user, session data, session id and issue time
+
+        Raises
+        ------
+        ValueError
+            If the token is malformed, forged or expired
+        """
+        try:
+            payload, _, signature = token.partition(SEPARATOR)
+            payload = _decode(payload)
+            signature = _decode(signature)
+        except (binascii.Error, UnicodeEncodeError):
+            raise ValueError("Invalid Token Format")
+        if not hmac.compare_digest(self._signature(payload), signature):
+            raise ValueError("Invalid Token")
+        claims = json.loads(payload)
+        if not allow_expired and claims["exp"] <= time.time():
+            raise ValueError("Expired Token")
+        return claims["user"], claims["data"], _decode(claims["sid"]), claims["iat"]
+
+
+class BloomFilter:
+    """Fixed size bloom filter
+
+    Membership can give false positives but never false negatives.
+    """
+
+    def __init__(self, bits: int = 1 << 16, hashes: int = 4):
+        self.bits = bits
+        self.hashes = hashes
+        self.array = bytearray(bits // 8)
+
+    def _positions(self, item: bytes):
+        digest = hashlib.blake2b(item, digest_size=4 * self.hashes).digest()
+        for i in range(0, 4 * self.hashes, 4):
+            yield int.from_bytes(digest[i:i + 4], "little") % self.bits
+
+    def add(self, item: bytes):
+        for position in self._positions(item):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: bytes) -> bool:
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+__all__ = [
+    "AccessTokens",
+    "BloomFilter",
+    "is_access_token",
+]
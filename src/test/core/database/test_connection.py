@@ -0,0 +1,128 @@
+import pytest
+
+from muistot.database.connection import ConnectionWrapper, PoolMetrics, StatementMetrics, statement
+
+
+class Result:
+
+    def keys(self):
+        return ["a"]
+
+    def fetchone(self):
+        return 1,
+
+    def fetchall(self):
+        return [(1,), (2,)]
+
+
+class Connection:
+
+    def __init__(self):
+        self.calls = list()
+
+    async def begin(self):
+        self.calls.append("begin")
+
+    async def execute(self, query, parameters=None):
+        self.calls.append(str(query))
+        return Result()
+
+    async def commit(self):
+        self.calls.append("commit")
+
+    async def rollback(self):
+        self.calls.append("rollback")
+
+    async def close(self):
+        self.calls.append("close")
+
+
+@pytest.fixture
+def connections():
+    yield list()
+
+
+@pytest.fixture
+def wrapper(connections):
+    async def connect():
+        c = Connection()
+        connections.append(c)
+        return c
+
+    yield ConnectionWrapper(connect)
+
+
+@pytest.mark.anyio
+async def test_no_checkout_without_statements(wrapper, connections):
+    await wrapper.release(commit=True)
+    assert connections == []
+
+
+@pytest.mark.anyio
+async def test_checkout_once(wrapper, connections):
+    await wrapper.execute("SELECT 1")
+    await wrapper.execute("SELECT 2")
+    await wrapper.release(commit=True)
+    c, = connections
+    assert c.calls == ["begin", "SELECT 1", "SELECT 2", "commit", "close"]
+
+
+@pytest.mark.anyio
+async def test_release_rollback(wrapper, connections):
+    await wrapper.execute("UPDATE a SET b = 1")
+    await wrapper.release(commit=False)
+    c, = connections
+    assert c.calls == ["begin", "UPDATE a SET b = 1", "rollback", "close"]
+    assert wrapper.connection is None
+
+
+def test_metrics():
+    m = PoolMetrics()
+    m.record(0.5)
+    m.record(1.5)
+    assert m.dict() == dict(checkouts=2, timeouts=0, wait_total=2.0, wait_max=1.5, wait_avg=1.0)
+
+
+@pytest.mark.anyio
+async def test_read_only_counts_statements(connections):
+    async def connect():
+        c = Connection()
+        connections.append(c)
+        return c
+
+    wrapper = ConnectionWrapper(connect, read_only=True)
+    await wrapper.fetch_all("SELECT 1")
+    await wrapper.fetch_val("SELECT 2")
+    assert wrapper.read_only
+    assert wrapper.statements == 2
+
+
+@pytest.mark.anyio
+async def test_read_only_write_commits(connections):
+    async def connect():
+        c = Connection()
+        connections.append(c)
+        return c
+
+    wrapper = ConnectionWrapper(connect, read_only=True)
+    await wrapper.execute("UPDATE a SET b = 1")
+    assert not wrapper.read_only
+
+
+def test_statement_metrics():
+    m = StatementMetrics()
+    m.record(True, 3)
+    m.record(True, 1)
+    m.record(False, 5)
+    data = m.dict()
+    assert data["statements_per_read"] == 2
+    assert data["statements_per_write"] == 5
+
+
+@pytest.mark.anyio
+async def test_statement_cache(wrapper):
+    hits = statement.cache_info().hits
+    await wrapper.execute("SELECT 'test_statement_cache'")
+    await wrapper.execute("SELECT 'test_statement_cache'")
+    assert statement.cache_info().hits == hits + 1
+    assert statement("SELECT 'test_statement_cache'") is statement("SELECT 'test_statement_cache'")
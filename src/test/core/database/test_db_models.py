@@ -53,3 +53,19 @@ def test_str_repr():
 def test_format_string():
     data = ResultSet(dict(a=1, b=2, c="2").items())
     assert "%(a)s %(b)s %(c)s" % data == "1 2 2"
+
+
+def test_shared_index():
+    index = dict(a=0, b=1)
+    first = ResultSet.of(index, (1, 2))
+    second = ResultSet.of(index, (3, 4))
+    assert {**first} == dict(a=1, b=2)
+    assert {**second} == dict(a=3, b=4)
+    assert second.get("b") == 4
+    assert second.get("c") is None
+    assert list(reversed(first)) == [2, 1]
+
+
+def test_no_instance_dict():
+    data = ResultSet(dict(a=1).items())
+    assert not hasattr(data, "__dict__")
@@ -0,0 +1,74 @@
+import contextlib
+from types import SimpleNamespace
+
+import pytest
+from redis import asyncio as redis
+
+from muistot.config import Config
+from muistot.database import ReplicaRouter
+
+
+class Provider:
+
+    def __init__(self):
+        self.config = SimpleNamespace(sticky_seconds=5)
+        self.healthy = True
+        self.callbacks = list()
+
+    @contextlib.asynccontextmanager
+    async def __call__(self, read_only: bool = False):
+        db = SimpleNamespace(on_commit=self.callbacks.append, read_only=read_only)
+        yield db
+        for callback in self.callbacks:
+            await callback()
+
+
+@pytest.fixture
+async def instance(anyio_backend):
+    instance = redis.from_url(Config.cache.redis_url)
+    yield instance
+    await instance.close()
+
+
+@pytest.fixture
+def primary():
+    yield Provider()
+
+
+@pytest.fixture
+def replica():
+    yield Provider()
+
+
+@pytest.fixture
+async def router(primary, replica, instance):
+    yield ReplicaRouter(primary=primary, replica=replica, redis=instance)
+    await instance.delete(ReplicaRouter.key("test_routing"))
+
+
+@pytest.mark.anyio
+async def test_reads_go_to_replica(router, primary, replica):
+    assert await router.provider(read_only=True) is replica
+    assert await router.provider(read_only=True, user="test_routing") is replica
+    assert await router.provider(read_only=False, user="test_routing") is primary
+
+
+@pytest.mark.anyio
+async def test_unhealthy_replica(router, primary, replica):
+    replica.healthy = False
+    assert await router.provider(read_only=True) is primary
+
+
+@pytest.mark.anyio
+async def test_no_replica(primary, instance):
+    router = ReplicaRouter(primary=primary, replica=None, redis=instance)
+    assert await router.provider(read_only=True) is primary
+
+
+@pytest.mark.anyio
+async def test_read_your_writes(router, primary, replica):
+    async with router(read_only=False, user="test_routing"):
+        pass
+    assert await router.provider(read_only=True, user="test_routing") is primary
+    assert await router.provider(read_only=True, user="someone_else") is replica
+    assert await router.provider(read_only=True) is replica
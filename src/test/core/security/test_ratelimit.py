@@ -0,0 +1,121 @@
+import pytest
+from redis import asyncio as redis
+
+from muistot.config import Config
+from muistot.security.ratelimit import RateLimiter, RATELIMIT_PREFIX
+
+
+async def clear_buckets(instance: redis.Redis):
+    async for key in instance.scan_iter(match=f"{RATELIMIT_PREFIX}*"):
+        await instance.delete(key)
+
+
+@pytest.fixture
+async def limiter(anyio_backend) -> RateLimiter:
+    instance = redis.from_url(Config.cache.redis_url)
+    await clear_buckets(instance)
+    yield RateLimiter(redis=instance)
+    await clear_buckets(instance)
+    await instance.close()
+
+
+@pytest.mark.anyio
+async def test_single(limiter):
+    assert await limiter.take("single", "a", rate=1 / 60) == 0
+    assert 59 < await limiter.take("single", "a", rate=1 / 60) <= 60
+
+
+@pytest.mark.anyio
+async def test_burst(limiter):
+    for _ in range(5):
+        assert await limiter.take("burst", "a", rate=1 / 60, burst=5) == 0
+    assert await limiter.take("burst", "a", rate=1 / 60, burst=5) > 0
+
+
+@pytest.mark.anyio
+async def test_refill(limiter):
+    import anyio
+    assert await limiter.take("refill", "a", rate=20) == 0
+    assert await limiter.take("refill", "a", rate=20) > 0
+    await anyio.sleep(0.1)
+    assert await limiter.take("refill", "a", rate=20) == 0
+
+
+@pytest.mark.anyio
+async def test_values_limited_separately(limiter):
+    assert await limiter.take("separate", "a", rate=1 / 60) == 0
+    assert await limiter.take("separate", "b", rate=1 / 60) == 0
+
+
+@pytest.mark.anyio
+async def test_any_value_limits(limiter):
+    assert await limiter.take("any", "host", "email-1", rate=1 / 60) == 0
+    assert await limiter.take("any", "host", "email-2", rate=1 / 60) > 0
+    assert await limiter.take("any", "other-host", "email-1", rate=1 / 60) > 0
+
+
+@pytest.mark.anyio
+async def test_denied_does_not_take(limiter):
+    assert await limiter.take("deny", "a", rate=1 / 60) == 0
+    assert await limiter.take("deny", "b", rate=1 / 60) == 0
+    assert await limiter.take("deny", "a", "c", rate=1 / 60) > 0
+    assert await limiter.take("deny", "c", rate=1 / 60) == 0
+
+
+@pytest.mark.anyio
+async def test_keys_expire(limiter):
+    await limiter.take("expire", "a", rate=1 / 60, burst=2)
+    assert 0 < await limiter.redis.pttl(RateLimiter.key("expire", "a")) <= 120_000
+
+
+@pytest.fixture
+async def client(limiter):
+    import httpx
+    from fastapi import FastAPI
+    from fastapi.middleware import Middleware
+    from muistot.middleware import RateLimitMiddleware
+
+    app = FastAPI(middleware=[Middleware(RateLimitMiddleware, url=Config.cache.redis_url)])
+
+    @app.post("/limited", dependencies=[RateLimitMiddleware.limit("dependency", rate=1 / 60, params=["email"])])
+    async def limited(email: str):
+        return email
+
+    @app.post("/override", dependencies=[RateLimitMiddleware.limit("override", rate=1 / 60)])
+    async def override():
+        return None
+
+    @app.post("/burst", dependencies=[RateLimitMiddleware.limit("burst", rate=1 / 60, burst=2)])
+    async def burst():
+        return None
+
+    async with httpx.AsyncClient(app=app, base_url="http://test") as c:
+        yield c
+
+
+@pytest.mark.anyio
+async def test_dependency(client):
+    assert (await client.post("/limited?email=a")).status_code == 200
+    r = await client.post("/limited?email=b")
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "60"
+
+
+@pytest.mark.anyio
+async def test_dependency_config_override(client, monkeypatch):
+    from muistot.config.models import RateLimit
+    monkeypatch.setitem(Config.ratelimits, "override", RateLimit(rate=1 / 60, burst=3))
+    for _ in range(3):
+        assert (await client.post("/override")).status_code == 200
+    assert (await client.post("/override")).status_code == 429
+
+
+@pytest.mark.anyio
+async def test_dependency_config_override_keeps_burst(client, monkeypatch):
+    from muistot.config.models import RateLimit
+    monkeypatch.setitem(Config.ratelimits, "burst", RateLimit(rate=1 / 120))
+    for _ in range(2):
+        assert (await client.post("/burst")).status_code == 200
+    r = await client.post("/burst")
+    assert r.status_code == 429
+    assert r.headers["Retry-After"] == "120"
@@ -1,164 +1,492 @@
 import json
+import time
 
+import anyio
 import pytest
-import redis
+from redis import asyncio as redis
 
 from muistot.config import Config
-from muistot.security.sessions import SessionManager, Session, USER_PREFIX, TOKEN_PREFIX, decode, encode
+from muistot.security.sessions import (
+    SessionManager,
+    Session,
+    USER_PREFIX,
+    LEGACY_USER_PREFIX,
+    TOKEN_PREFIX,
+    INVALIDATE_TOKEN,
+    decode,
+    encode,
+)
+from muistot.security.tokens import BloomFilter
 
 
 @pytest.fixture
-def mgr() -> SessionManager:
+async def mgr(anyio_backend) -> SessionManager:
+    instance = redis.from_url(Config.sessions.redis_url)
     yield SessionManager(
-        redis=redis.from_url(Config.sessions.redis_url),
+        redis=instance,
         token_bytes=Config.sessions.token_bytes,
         lifetime=Config.sessions.token_lifetime,
     )
+    await instance.close()
 
 
-def test_extend_nonexistent_noop(mgr):
-    mgr.extend("not-existing:dwadwawd")
-    mgr.extend(b"not-existing:dwadwawd")
+async def noop(*_, **__):
+    return None
 
 
-def test_start_end_session(mgr):
-    token = mgr.start_session(Session(user="test", data=dict()))
+@pytest.mark.anyio
+async def test_extend_nonexistent_noop(mgr):
+    await mgr.extend("not-existing:dwadwawd")
+    await mgr.extend(b"not-existing:dwadwawd")
 
-    mgr.end_session(token)
 
-    assert not mgr.redis.exists(TOKEN_PREFIX + decode(token))
-    assert len(mgr.redis.smembers(USER_PREFIX + "test")) == 0
-    assert len(mgr.get_sessions("test")) == 0
+@pytest.mark.anyio
+async def test_start_end_session(mgr):
+    token = await mgr.start_session(Session(user="test", data=dict()))
 
+    await mgr.end_session(token)
 
-def test_cull_old(mgr):
-    mgr.redis.sadd(USER_PREFIX + "tc", b"1234")
-    mgr.clear_stale("tc")
-    assert len(mgr.redis.smembers(USER_PREFIX + "tc")) == 0
+    assert not await mgr.redis.exists(TOKEN_PREFIX + decode(token))
+    assert await mgr.redis.zcard(USER_PREFIX + "test") == 0
+    assert len(await mgr.get_sessions("test")) == 0
 
 
-def test_cull_on_load_all(mgr):
-    mgr.redis.sadd(USER_PREFIX + "tc2", b"1234")
-    assert len(mgr.get_sessions("tc2")) == 0
-    assert len(mgr.redis.smembers(USER_PREFIX + "test_cull_2")) == 0
+@pytest.mark.anyio
+async def test_cull_old(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "tc", {b"1234": time.time() - 1})
+    await mgr.clear_stale("tc")
+    assert await mgr.redis.zcard(USER_PREFIX + "tc") == 0
 
 
-def test_cull_and_get_on_load_all(mgr):
-    mgr.redis.sadd(USER_PREFIX + "tc3", b"1234")
-    mgr.redis.sadd(USER_PREFIX + "tc3", TOKEN_PREFIX + b"12345")
-    mgr.redis.set(TOKEN_PREFIX + b"12345", json.dumps(dict(user="tc3", data=dict())))
+@pytest.mark.anyio
+async def test_cull_on_load_all(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "tc2", {b"1234": time.time() - 1})
+    assert len(await mgr.get_sessions("tc2")) == 0
+    assert await mgr.redis.zcard(USER_PREFIX + "tc2") == 0
 
-    sessions = mgr.get_sessions("tc3")
+
+@pytest.mark.anyio
+async def test_cull_and_get_on_load_all(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "tc3", {b"1234": time.time() + 60})
+    await mgr.redis.zadd(USER_PREFIX + "tc3", {TOKEN_PREFIX + b"12345": time.time() + 60})
+    await mgr.redis.set(TOKEN_PREFIX + b"12345", json.dumps(dict(user="tc3", data=dict())))
+
+    sessions = await mgr.get_sessions("tc3")
 
     assert len(sessions) == 1
     assert sessions[0].user == "tc3" and len(sessions[0].data) == 0
-    assert len(mgr.redis.smembers(USER_PREFIX + "tc3")) == 1
+    assert await mgr.redis.zcard(USER_PREFIX + "tc3") == 1
 
 
-def test_clear_all_user_sessions(mgr):
-    mgr.redis.sadd(USER_PREFIX + "ca", b"abc")
-    mgr.redis.sadd(USER_PREFIX + "ca", TOKEN_PREFIX + b"def")
-    mgr.redis.set(TOKEN_PREFIX + b"def", json.dumps(dict(user="ca", data=dict())))
+@pytest.mark.anyio
+async def test_clear_all_user_sessions(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "ca", {b"abc": time.time() + 60})
+    await mgr.redis.zadd(USER_PREFIX + "ca", {TOKEN_PREFIX + b"def": time.time() + 60})
+    await mgr.redis.set(TOKEN_PREFIX + b"def", json.dumps(dict(user="ca", data=dict())))
 
-    mgr.clear_sessions("ca")
+    await mgr.clear_sessions("ca")
 
-    assert not mgr.redis.exists(TOKEN_PREFIX + b"abc")
-    assert not mgr.redis.exists(TOKEN_PREFIX + b"def")
-    assert len(mgr.redis.smembers(USER_PREFIX + "ca")) == 0
+    assert not await mgr.redis.exists(TOKEN_PREFIX + b"abc")
+    assert not await mgr.redis.exists(TOKEN_PREFIX + b"def")
+    assert await mgr.redis.zcard(USER_PREFIX + "ca") == 0
 
 
-def test_clear_all_sessions(mgr):
-    mgr.redis.sadd(USER_PREFIX + "a", b"a")
-    mgr.redis.sadd(USER_PREFIX + "b", TOKEN_PREFIX + b"b")
-    mgr.redis.set(TOKEN_PREFIX + b"b", json.dumps(dict(user="b", data=dict())))
+@pytest.mark.anyio
+async def test_clear_all_sessions(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "a", {b"a": time.time() + 60})
+    await mgr.redis.zadd(USER_PREFIX + "b", {TOKEN_PREFIX + b"b": time.time() + 60})
+    await mgr.redis.set(TOKEN_PREFIX + b"b", json.dumps(dict(user="b", data=dict())))
 
-    mgr.clear_all_sessions()
+    await mgr.clear_all_sessions()
 
-    assert not mgr.redis.exists(TOKEN_PREFIX + b"a")
-    assert not mgr.redis.exists(TOKEN_PREFIX + b"b")
-    assert len(mgr.redis.smembers(USER_PREFIX + "a")) == 0
-    assert len(mgr.redis.smembers(USER_PREFIX + "b")) == 0
+    assert not await mgr.redis.exists(TOKEN_PREFIX + b"a")
+    assert not await mgr.redis.exists(TOKEN_PREFIX + b"b")
+    assert await mgr.redis.zcard(USER_PREFIX + "a") == 0
+    assert await mgr.redis.zcard(USER_PREFIX + "b") == 0
 
 
-def test_get_session(mgr):
+@pytest.mark.anyio
+async def test_get_session(mgr):
     import hashlib
-    mgr.redis.sadd(USER_PREFIX + "gs", hashlib.sha256(TOKEN_PREFIX + b"gs").digest())
-    mgr.redis.set(hashlib.sha256(TOKEN_PREFIX + b"gs").digest(), json.dumps(dict(user="test", data=dict(success=True))))
+    await mgr.redis.zadd(USER_PREFIX + "gs", {hashlib.sha256(TOKEN_PREFIX + b"gs").digest(): time.time() + 60})
+    await mgr.redis.set(hashlib.sha256(TOKEN_PREFIX + b"gs").digest(), json.dumps(dict(user="test", data=dict(success=True))))
 
-    s = mgr.get_session(encode(TOKEN_PREFIX + b"gs"))
+    s = await mgr.get_session(encode(TOKEN_PREFIX + b"gs"))
     assert s.user == "test"
     assert s.data["success"]
 
 
-def test_start_get_session(mgr):
-    t = mgr.start_session(Session(user="test", data=dict(success=True)))
-    s = mgr.get_session(t)
+@pytest.mark.anyio
+async def test_start_get_session(mgr):
+    t = await mgr.start_session(Session(user="test", data=dict(success=True)))
+    s = await mgr.get_session(t)
     assert s.user == "test"
     assert s.data["success"]
 
 
-def test_get_bad_session(mgr):
+@pytest.mark.anyio
+async def test_get_bad_session(mgr):
     with pytest.raises(ValueError) as e:
-        mgr.get_session(encode(b"will-not-exist"))
+        await mgr.get_session(encode(b"will-not-exist"))
     assert "invalid session" in str(e.value).lower()
 
 
-def test_token_exists_retry(mgr):
-    class MockRedis:
-        cnt = 0
+@pytest.mark.anyio
+async def test_token_exists_retry(mgr):
+    calls = []
+    start = mgr._start
 
-        def exists(self, *_, **__):
-            MockRedis.cnt += 1
-            return MockRedis.cnt < 10
+    async def colliding(**kwargs):
+        calls.append(kwargs["keys"][1])
+        if len(calls) < 10:
+            return 0
+        return await start(**kwargs)
 
-        def smembers(self, *_, **__):
-            yield b"123"
+    mgr._start = colliding
 
-        def __getattr__(self, item):
-            return lambda *_, **__: None
+    s = Session(user="abcd", data=dict())
+    token = await mgr.start_session(s)
+    assert token is not None
+    assert len(calls) == 10
+    assert len(set(calls)) == 10
+    assert await mgr.redis.zrange(USER_PREFIX + "abcd", 0, -1) == [calls[-1]]
 
-    del mgr.redis
-    mgr.redis = MockRedis()
 
-    s = Session(user="abcd", data=dict())
-    assert mgr.start_session(s) is not None
-    assert MockRedis.cnt >= 10
+@pytest.mark.anyio
+async def test_start_session_does_not_overwrite(mgr):
+    import hashlib
+    existing = hashlib.sha256(TOKEN_PREFIX + b"existing").digest()
+    await mgr.redis.set(existing, json.dumps(dict(user="other", data=dict())))
 
+    assert not await mgr._start(keys=[USER_PREFIX + "ow", existing], args=["{}", "", time.time(), "+inf"])
+    assert json.loads(await mgr.redis.get(existing))["user"] == "other"
+    assert await mgr.redis.zcard(USER_PREFIX + "ow") == 0
 
-def test_handle_none_end(mgr):
-    token = encode(b"123")
 
-    class MockRedis:
-        ok = True
+@pytest.mark.anyio
+async def test_handle_none_end(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "ne", {b"123": time.time() + 60})
+    await mgr.end_session(encode(b"123"))
+    assert await mgr.redis.zcard(USER_PREFIX + "ne") == 1
 
-        def get(self, *_, **__):
-            return None
 
-        def srem(self, *_, **__):
-            MockRedis.ok = False
+@pytest.mark.anyio
+async def test_start_clears_stale(mgr):
+    await mgr.redis.zadd(USER_PREFIX + "sc", {b"1234": time.time() - 1})
+    token = await mgr.start_session(Session(user="sc", data=dict()))
+    assert await mgr.redis.zrange(USER_PREFIX + "sc", 0, -1) == [decode(token)]
+
+
+@pytest.mark.anyio
+async def test_clear_many_sessions(mgr, monkeypatch):
+    import muistot.security.sessions
+    monkeypatch.setattr(muistot.security.sessions, "UNLINK_BATCH", 2)
+    tokens = [await mgr.start_session(Session(user="many", data=dict())) for _ in range(5)]
+
+    await mgr.clear_sessions("many")
+
+    for token in tokens:
+        assert not await mgr.redis.exists(decode(token))
+    assert not await mgr.redis.exists(USER_PREFIX + "many")
+
+
+@pytest.mark.anyio
+async def test_get_session_extends_index(mgr):
+    token = await mgr.start_session(Session(user="ext", data=dict()))
+    key = USER_PREFIX + "ext"
+    await mgr.redis.zadd(key, {decode(token): 0})
+
+    await mgr.get_session(token)
+
+    assert await mgr.redis.zscore(key, decode(token)) > time.time()
+
+
+async def legacy_session(mgr, user: str) -> str:
+    token = encode(TOKEN_PREFIX + b"legacy-" + user.encode("utf-8"))
+    await mgr.redis.set(decode(token), json.dumps(dict(user=user, data=dict())), ex=60)
+    await mgr.redis.sadd(LEGACY_USER_PREFIX + user, decode(token))
+    return token
+
+
+@pytest.mark.anyio
+async def test_get_session_indexes_legacy(mgr):
+    token = await legacy_session(mgr, "legacy")
+
+    await mgr.get_session(token)
+
+    assert await mgr.redis.zscore(USER_PREFIX + "legacy", decode(token)) > time.time()
+
+
+@pytest.mark.anyio
+async def test_clear_sessions_legacy(mgr):
+    token = await legacy_session(mgr, "legacy2")
+
+    await mgr.clear_sessions("legacy2")
+
+    assert not await mgr.redis.exists(decode(token))
+    assert not await mgr.redis.exists(LEGACY_USER_PREFIX + "legacy2")
+    with pytest.raises(ValueError):
+        await mgr.get_session(token)
+
+
+@pytest.mark.anyio
+async def test_clear_sessions_legacy_resolved(mgr):
+    token = await legacy_session(mgr, "legacy3")
+    await mgr.get_session(token)
+    await mgr.redis.unlink(LEGACY_USER_PREFIX + "legacy3")
+
+    await mgr.clear_sessions("legacy3")
+
+    assert not await mgr.redis.exists(decode(token))
+
+
+@pytest.mark.anyio
+async def test_extend_updates_index(mgr):
+    token = await mgr.start_session(Session(user="ext2", data=dict()))
+    key = USER_PREFIX + "ext2"
+    await mgr.redis.zadd(key, {decode(token): 0})
+    await mgr.redis.persist(decode(token))
+
+    await mgr.extend(decode(token), user="ext2")
+
+    assert await mgr.redis.zscore(key, decode(token)) > time.time()
+    assert await mgr.redis.ttl(decode(token)) > 0
+
+
+@pytest.mark.anyio
+async def test_extend_does_not_add_ended(mgr):
+    await mgr.extend(b"ended", user="ext3")
+    assert await mgr.redis.zcard(USER_PREFIX + "ext3") == 0
+
+
+@pytest.mark.anyio
+async def test_sweep(mgr):
+    for i in range(3):
+        await mgr.redis.zadd(f"{USER_PREFIX}sweep-{i}", {b"old": time.time() - 1, b"new": time.time() + 60})
+
+    assert await mgr.sweep() >= 3
+
+    for i in range(3):
+        assert await mgr.redis.zrange(f"{USER_PREFIX}sweep-{i}", 0, -1) == [b"new"]
+
+
+@pytest.mark.anyio
+async def test_start_sweeper_once(mgr):
+    mgr.start_sweeper(3600)
+    sweeper = mgr._sweeper
+    mgr.start_sweeper(3600)
+    assert mgr._sweeper is sweeper
+    sweeper.cancel()
+
+
+@pytest.fixture
+async def local(anyio_backend):
+    instance = redis.from_url(Config.sessions.redis_url)
+    mgr = SessionManager(
+        redis=instance,
+        token_bytes=Config.sessions.token_bytes,
+        lifetime=Config.sessions.token_lifetime,
+        local_ttl=60,
+        extend_interval=30,
+    )
+    mgr.start_listener()
+    for _ in range(100):
+        if mgr.listening:
+            break
+        await anyio.sleep(0.01)
+    yield mgr
+    mgr._listener.cancel()
+    await instance.close()
+
+
+async def invalidated(mgr: SessionManager, token: str) -> bool:
+    for _ in range(100):
+        if decode(token) not in mgr.local:
+            return True
+        await anyio.sleep(0.01)
+    return False
+
+
+@pytest.mark.anyio
+async def test_local_session_skips_redis(local):
+    token = await local.start_session(Session(user="local", data=dict()))
+    await local.get_session(token)
+    await local.redis.delete(decode(token))
+
+    assert (await local.get_session(token)).user == "local"
+
+
+@pytest.mark.anyio
+async def test_local_session_not_used_without_listener(mgr):
+    token = await mgr.start_session(Session(user="local2", data=dict()))
+    await mgr.get_session(token)
+    assert len(mgr.local) == 0
 
-        def __getattr__(self, item):
-            return lambda *_, **__: None
 
-    del mgr.redis
-    mgr.redis = MockRedis()
-    mgr.end_session(token)
+@pytest.mark.anyio
+async def test_local_session_extend_coalesced(local):
+    calls = []
 
-    assert MockRedis.ok  # Fails if rem is called
+    async def extend(*args, **kwargs):
+        calls.append(args)
 
+    token = await local.start_session(Session(user="local3", data=dict()))
+    await local.get_session(token)
+    local.extend = extend
+    for _ in range(5):
+        await local.get_session(token)
+    assert len(calls) == 0
 
-def test_handle_none_in_gets(mgr):
-    class MockRedis:
+    local.extend_interval = 0
+    await local.get_session(token)
+    assert calls == [(decode(token), "local3")]
 
-        def smembers(self, *_, **__):
-            yield b"123"
 
-        def get(self, *_, **__):
-            return None
+@pytest.mark.anyio
+async def test_local_session_end_broadcast(local, mgr):
+    token = await local.start_session(Session(user="local4", data=dict()))
+    await local.get_session(token)
 
+    await mgr.end_session(token)
+
+    assert await invalidated(local, token)
+    with pytest.raises(ValueError):
+        await local.get_session(token)
+
+
+@pytest.mark.anyio
+async def test_local_session_clear_broadcast(local, mgr):
+    token = await local.start_session(Session(user="local5", data=dict()))
+    other = await local.start_session(Session(user="local6", data=dict()))
+    await local.get_session(token)
+    await local.get_session(other)
+
+    await mgr.clear_sessions("local5")
+
+    assert await invalidated(local, token)
+    assert decode(other) in local.local
+    with pytest.raises(ValueError):
+        await local.get_session(token)
+
+
+@pytest.fixture
+async def signed(anyio_backend):
+    instance = redis.from_url(Config.sessions.redis_url)
+    mgr = SessionManager(
+        redis=instance,
+        token_bytes=Config.sessions.token_bytes,
+        lifetime=Config.sessions.token_lifetime,
+        access_secret="secret",
+        access_lifetime=60,
+    )
+    mgr.start_listener()
+    for _ in range(100):
+        if mgr.listening:
+            break
+        await anyio.sleep(0.01)
+    yield mgr
+    mgr._listener.cancel()
+    await instance.close()
+
+
+async def revoked(mgr: SessionManager, access: str) -> bool:
+    for _ in range(100):
+        try:
+            await mgr.get_session(access)
+        except ValueError:
+            return True
+        await anyio.sleep(0.01)
+    return False
+
+
+@pytest.mark.anyio
+async def test_access_token_without_redis(signed):
+    token = await signed.start_session(Session(user="acc", data=dict(scopes=["admin"], projects=["p"])))
+    access = await signed.issue(token)
+
+    class NoRedis:
         def __getattr__(self, item):
-            return lambda *_, **__: None
+            raise AssertionError(item)
+
+    signed.redis = NoRedis()
+    session = await signed.get_session(access)
+    assert session.user == "acc"
+    assert session.data == dict(scopes=["admin"], projects=["p"])
+
+
+@pytest.mark.anyio
+async def test_access_token_disabled(mgr, signed):
+    token = await signed.start_session(Session(user="acc2", data=dict()))
+    access = await signed.issue(token)
+    with pytest.raises(ValueError):
+        await mgr.get_session(access)
+    with pytest.raises(ValueError):
+        await mgr.issue(token)
+
+
+@pytest.mark.anyio
+async def test_access_token_not_refresh(signed):
+    token = await signed.start_session(Session(user="acc3", data=dict()))
+    with pytest.raises(ValueError):
+        await signed.issue(await signed.issue(token))
+
+
+@pytest.mark.anyio
+async def test_access_token_revoked_on_end(signed):
+    token = await signed.start_session(Session(user="acc4", data=dict()))
+    access = await signed.issue(token)
+    other = SessionManager(redis=signed.redis, access_secret="secret", access_lifetime=60)
+
+    await other.end_session(token)
+
+    assert await revoked(signed, access)
+    assert await revoked(other, access)
+
+
+@pytest.mark.anyio
+async def test_access_token_ends_session(signed):
+    token = await signed.start_session(Session(user="acc5", data=dict()))
+    access = await signed.issue(token)
+
+    await signed.end_session(access)
+
+    with pytest.raises(ValueError):
+        await signed.get_session(token)
+    assert await revoked(signed, access)
+
+
+@pytest.mark.anyio
+async def test_access_token_revoked_on_clear(signed):
+    token = await signed.start_session(Session(user="acc6", data=dict()))
+    access = await signed.issue(token)
+
+    await SessionManager(redis=signed.redis, access_secret="secret", access_lifetime=60).clear_sessions("acc6")
+
+    assert await revoked(signed, access)
+
+    token = await signed.start_session(Session(user="acc6", data=dict()))
+    access = await signed.issue(token)
+    assert (await signed.get_session(access)).user == "acc6"
+
+
+@pytest.mark.anyio
+async def test_revocations_loaded_on_listen(signed):
+    token = await signed.start_session(Session(user="acc7", data=dict()))
+    access = await signed.issue(token)
+    await signed.end_session(token)
+
+    signed._listener.cancel()
+    signed.revoked = BloomFilter()
+    for _ in range(100):
+        if not signed.listening:
+            break
+        await anyio.sleep(0.01)
+    signed.start_listener()
+    for _ in range(100):
+        if signed.listening:
+            break
+        await anyio.sleep(0.01)
 
-    del mgr.redis
-    mgr.redis = MockRedis()
-    assert mgr.get_sessions("a") == []  # Fails if none is appended
+    assert INVALIDATE_TOKEN + decode(token) in signed.revoked
+    with pytest.raises(ValueError):
+        await signed.get_session(access)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from muistot.security.tokens import AccessTokens, BloomFilter, is_access_token
+
+
+@pytest.fixture
+def tokens() -> AccessTokens:
+    return AccessTokens(secret="secret", lifetime=60)
+
+
+def test_sign_verify(tokens):
+    token = tokens.sign("user", dict(scopes=["admin"], projects=["p"]), b"sid")
+    user, data, sid, issued = tokens.verify(token)
+    assert user == "user"
+    assert data == dict(scopes=["admin"], projects=["p"])
+    assert sid == b"sid"
+    assert issued <= time.time()
+
+
+def test_is_access_token(tokens):
+    assert is_access_token(tokens.sign("user", dict(), b"sid"))
+    assert not is_access_token("dG9rZW46YWJj")
+
+
+def test_forged(tokens):
+    token = tokens.sign("user", dict(), b"sid")
+    with pytest.raises(ValueError) as e:
+        AccessTokens(secret="other", lifetime=60).verify(token)
+    assert "invalid token" in str(e.value).lower()
+
+
+def test_tampered(tokens):
+    import base64
+    import json
+    payload, _, signature = tokens.sign("user", dict(), b"sid").partition(".")
+    claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    claims["data"] = dict(scopes=["superuser"])
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=").decode()
+    with pytest.raises(ValueError):
+        tokens.verify(f"{payload}.{signature}")
+
+
+def test_expired():
+    tokens = AccessTokens(secret="secret", lifetime=-1)
+    token = tokens.sign("user", dict(), b"sid")
+    with pytest.raises(ValueError) as e:
+        tokens.verify(token)
+    assert "expired" in str(e.value).lower()
+    assert tokens.verify(token, allow_expired=True)[0] == "user"
+
+
+@pytest.mark.parametrize("token", ["a.b", "ö.ä", ".", "abc.!!!"])
+def test_malformed(tokens, token):
+    with pytest.raises(ValueError):
+        tokens.verify(token)
+
+
+def test_bloom_filter():
+    bloom = BloomFilter()
+    items = [f"item-{i}".encode() for i in range(100)]
+    for item in items:
+        bloom.add(item)
+    assert all(item in bloom for item in items)
+    assert sum(f"other-{i}".encode() in bloom for i in range(1000)) < 10
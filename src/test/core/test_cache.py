@@ -0,0 +1,127 @@
+import pytest
+from redis import asyncio as redis
+
+from muistot.cache import ResponseCache
+from muistot.cache.responses import SETTLING_PREFIX
+from muistot.config import Config
+
+
+@pytest.fixture
+async def cache(anyio_backend) -> ResponseCache:
+    instance = redis.from_url(Config.cache.redis_url)
+    yield ResponseCache(redis=instance, ttl=Config.cache.cache_ttl, local_size=2)
+    await instance.close()
+
+
+@pytest.mark.anyio
+async def test_key_stable(cache):
+    a = await cache.key("sites", lang="fi", project="test_key_stable")
+    b = await cache.key("sites", lang="fi", project="test_key_stable")
+    assert a == b
+    assert a != await cache.key("sites", lang="en", project="test_key_stable")
+
+
+@pytest.mark.anyio
+async def test_key_memory(cache):
+    a = await cache.key("memory", lang="fi", project="test_key_memory", site="s", memory="1")
+    assert a != await cache.key("memory", lang="fi", project="test_key_memory", site="s", memory="2")
+
+
+@pytest.mark.anyio
+async def test_set_get(cache):
+    key = await cache.key("projects", lang="fi")
+    await cache.set(key, b"[]")
+    cache.local.clear()
+    assert await cache.get(key) == b"[]"
+    assert key in cache.local
+
+
+@pytest.mark.anyio
+async def test_invalidate_project(cache):
+    project = await cache.key("sites", lang="fi", project="test_invalidate")
+    listing = await cache.key("projects", lang="fi")
+    await cache.invalidate("test_invalidate")
+    assert project != await cache.key("sites", lang="fi", project="test_invalidate")
+    assert listing == await cache.key("projects", lang="fi")
+
+
+@pytest.mark.anyio
+async def test_invalidate_listing(cache):
+    listing = await cache.key("projects", lang="fi")
+    await cache.invalidate(listing=True)
+    assert listing != await cache.key("projects", lang="fi")
+
+
+@pytest.mark.anyio
+async def test_local_bounded(cache):
+    for i in range(4):
+        await cache.set(f"test_local_bounded:{i}", b"{}")
+    assert list(cache.local.keys()) == ["test_local_bounded:2", "test_local_bounded:3"]
+
+
+def request(tag=None):
+    from starlette.requests import Request
+    headers = [(b"if-none-match", tag.encode("ascii"))] if tag is not None else []
+    return Request(dict(type="http", method="GET", path="/", query_string=b"", headers=headers))
+
+
+@pytest.mark.anyio
+async def test_invalidate_settling(cache):
+    cache.settle = 60
+    await cache.invalidate("test_settling")
+    settling = await cache.key("sites", lang="fi", project="test_settling")
+    await cache.redis.delete(SETTLING_PREFIX + "test_settling")
+    assert settling != await cache.key("sites", lang="fi", project="test_settling")
+
+
+@pytest.mark.anyio
+async def test_lagging_replica_not_cached_past_settle(cache):
+    from muistot.backend.api.utils import cached, ORJSONResponse
+
+    class Repo:
+        authenticated = False
+        identity = None
+        lang = "fi"
+        identifiers = dict(project="test_lagging")
+
+    primary = dict(version=1)
+    replica = dict(version=1)
+
+    async def from_replica():
+        return ORJSONResponse(dict(replica))
+
+    cache.settle = 60
+    primary["version"] = 2
+    await cache.invalidate("test_lagging")
+
+    stale = await cached(request(), cache, Repo(), "site", from_replica)
+    assert stale.body == b'{"version":1}'
+
+    replica.update(primary)
+    await cache.redis.delete(SETTLING_PREFIX + "test_lagging")
+
+    fresh = await cached(request(stale.headers["etag"]), cache, Repo(), "site", from_replica)
+    assert fresh.status_code == 200
+    assert fresh.body == b'{"version":2}'
+    assert fresh.headers["etag"] != stale.headers["etag"]
+
+
+@pytest.mark.anyio
+async def test_memory_tags_differ(cache):
+    from muistot.backend.api.utils import cached, ORJSONResponse
+
+    class Repo:
+        authenticated = False
+        identity = None
+        lang = "fi"
+
+        def __init__(self, memory):
+            self.identifiers = dict(project="test_memory_tags", site="s", memory=memory)
+
+    async def producer():
+        return ORJSONResponse(dict())
+
+    first = await cached(request(), cache, Repo("1"), "memory", producer, store=False)
+    second = await cached(request(first.headers["etag"]), cache, Repo("2"), "memory", producer, store=False)
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
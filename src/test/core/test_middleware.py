@@ -0,0 +1,74 @@
+import pytest
+from headers import ACCEPT_LANGUAGE, CONTENT_LANGUAGE
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+
+from muistot.middleware import LanguageMiddleware
+from muistot.middleware.base import StateMiddleware
+
+
+class ValueMiddleware(StateMiddleware):
+
+    def __init__(self, app, value):
+        super(ValueMiddleware, self).__init__(app)
+        self.value = value
+
+    def state(self, scope):
+        return dict(value=self.value)
+
+
+@pytest.fixture
+async def client():
+    app = Starlette()
+
+    @app.route("/", methods=["GET", "POST"])
+    async def state(request: Request):
+        return JSONResponse(dict(
+            value=request.state.value,
+            language=LanguageMiddleware.get(request),
+        ))
+
+    @app.route("/stream")
+    async def stream(_: Request):
+        async def chunks():
+            for i in range(3):
+                yield f"{i}".encode()
+
+        return StreamingResponse(chunks())
+
+    app.add_middleware(ValueMiddleware, value=1)
+    app.add_middleware(LanguageMiddleware, default_language="fi", languages=["fi", "en"])
+    async with AsyncClient(app=app, base_url="http://test") as c:
+        yield c
+
+
+@pytest.mark.anyio
+async def test_state(client):
+    r = await client.get("/")
+    assert r.json() == dict(value=1, language="fi")
+
+
+@pytest.mark.anyio
+async def test_state_language(client):
+    r = await client.get("/", headers={ACCEPT_LANGUAGE: "en-US,fi"})
+    assert r.json()["language"] == "en"
+    r = await client.post("/", headers={CONTENT_LANGUAGE: "en"})
+    assert r.json()["language"] == "en"
+    r = await client.get("/", headers={"Muistot-Language": "sv,en"})
+    assert r.json()["language"] == "en"
+
+
+@pytest.mark.anyio
+async def test_streaming(client):
+    r = await client.get("/stream")
+    assert r.content == b"012"
+
+
+def test_state_middleware_requires_state():
+    class NoState(StateMiddleware):
+        pass
+
+    with pytest.raises(TypeError):
+        NoState(None)
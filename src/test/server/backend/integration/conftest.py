@@ -69,12 +69,12 @@ async def create_users(db_instance, credentials):
 
 
 @pytest.fixture
-def authenticate(client, db, session_redis):
+def authenticate(client, db, async_session_redis):
     async def authenticator(user: User):
         data = await load_session_data(user.username, db)
-        manager = SessionManager(redis=session_redis)
+        manager = SessionManager(redis=async_session_redis)
         session = Session(user.username, data)
-        return {'Authorization': f"Bearer {manager.start_session(session)}"}
+        return {'Authorization': f"Bearer {await manager.start_session(session)}"}
 
     yield authenticator
 
@@ -243,6 +243,48 @@ async def test_image(client, auth, image, setup, auto_publish):
     check_code(status.HTTP_200_OK, r)
 
 
+@pytest.mark.anyio
+async def test_image_upload(client, auth, setup, auto_publish):
+    """Uploaded images can be referenced by name
+    """
+    import pathlib
+    with open(pathlib.Path(__file__).parent / "sample_image.jpg", "rb") as f:
+        r = await client.post(IMAGES, files=dict(file=("sample.jpg", f, "image/jpeg")), headers=auth)
+    check_code(status.HTTP_201_CREATED, r)
+    image = r.json()["image"]
+
+    m = NewMemory(title="has uploaded image", image=image).dict()
+    r = await client.post(MEMORIES.format(*setup), json=m, headers=auth)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(r.headers[LOCATION])
+    m = to(Memory, r)
+    assert m.image == image
+
+    r = await client.get(IMAGE.format(m.image))
+    check_code(status.HTTP_200_OK, r)
+
+
+@pytest.mark.anyio
+async def test_fetch_one_etag_per_memory(client, auth, setup, auto_publish):
+    """A tag of one memory never matches another memory of the same site
+    """
+    from headers import ETAG, IF_NONE_MATCH
+    urls = []
+    for i in range(2):
+        r = await client.post(MEMORIES.format(*setup), json=NewMemory(title=f"tagged {i}").dict(), headers=auth)
+        check_code(status.HTTP_201_CREATED, r)
+        urls.append(r.headers[LOCATION])
+
+    r = await client.get(urls[0])
+    check_code(status.HTTP_200_OK, r)
+    etag = r.headers[ETAG]
+
+    r = await client.get(urls[1], headers={IF_NONE_MATCH: etag})
+    check_code(status.HTTP_200_OK, r)
+    assert r.headers[ETAG] != etag
+
+
 @pytest.mark.anyio
 async def test_image_delete(client, auth, image, setup, auto_publish):
     """Image null should delete
@@ -273,6 +315,36 @@ async def test_fetch_all(client, setup, auto_publish, auth):
     assert len(c.items) == 10
 
 
+@pytest.mark.anyio
+async def test_fetch_pages(client, setup, auto_publish, auth):
+    for i in range(0, 5):
+        m = NewMemory(title=f"Test title {i}").dict()
+        r = await client.post(MEMORIES.format(*setup), json=m, headers=auth)
+        check_code(status.HTTP_201_CREATED, r)
+
+    first = to(Memories, await client.get(MEMORIES.format(*setup) + "?limit=3"))
+    assert len(first.items) == 3
+    second = to(Memories, await client.get(MEMORIES.format(*setup) + f"?limit=3&after={first.next}"))
+    assert len(second.items) == 2
+    assert second.next is None
+
+    ids = [m.id for m in (*first.items, *second.items)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == 5
+
+
+@pytest.mark.anyio
+async def test_fetch_fields(client, setup, auto_publish, auth):
+    r = await client.post(MEMORIES.format(*setup), json=NewMemory(title="projected", story="long").dict(), headers=auth)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(MEMORIES.format(*setup) + "?fields=title")
+    check_code(status.HTTP_200_OK, r)
+    item, = r.json()["items"]
+    assert set(item.keys()) == {"id", "title"}
+    assert item["title"] == "projected"
+
+
 @pytest.mark.anyio
 async def test_modify_empty(client, auth, setup):
     r = await client.post(MEMORIES.format(*setup), json=NewMemory(title="ok").dict(), headers=auth)
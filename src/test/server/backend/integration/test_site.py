@@ -248,6 +248,73 @@ async def test_fetch_all(client, setup, auto_publish, admin):
     assert len(c.items) == 10
 
 
+@pytest.mark.anyio
+async def test_fetch_all_cache_invalidated(client, setup, admin):
+    assert len(to(Sites, await client.get(SITES.format(setup.project))).items) == 0
+
+    _id, site = await _create_site()
+    r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+    check_code(status.HTTP_201_CREATED, r)
+    assert len(to(Sites, await client.get(SITES.format(setup.project))).items) == 0
+
+    check_code(status.HTTP_204_NO_CONTENT, await client.post(
+        PUBLISH,
+        json=PUPOrder(identifier=_id, type="site", parents=dict(project=setup.project)).dict(),
+        headers=admin,
+    ))
+    assert len(to(Sites, await client.get(SITES.format(setup.project))).items) == 1
+
+    check_code(status.HTTP_204_NO_CONTENT, await client.delete(SITE.format(*setup, _id), headers=admin))
+    assert len(to(Sites, await client.get(SITES.format(setup.project))).items) == 0
+
+
+@pytest.mark.anyio
+async def test_fetch_all_etag(client, setup, admin, auto_publish):
+    r = await client.get(SITES.format(setup.project))
+    check_code(status.HTTP_200_OK, r)
+    etag = r.headers[headers.ETAG]
+    assert etag.startswith("W/")
+    assert "public" in r.headers[headers.CACHE_CONTROL]
+
+    r = await client.get(SITES.format(setup.project), headers={headers.IF_NONE_MATCH: etag})
+    check_code(status.HTTP_304_NOT_MODIFIED, r)
+    assert r.headers[headers.ETAG] == etag
+
+    _id, site = await _create_site()
+    r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(SITES.format(setup.project), headers={headers.IF_NONE_MATCH: etag})
+    check_code(status.HTTP_200_OK, r)
+    assert r.headers[headers.ETAG] != etag
+    assert len(to(Sites, r).items) == 1
+
+
+@pytest.mark.anyio
+async def test_fetch_one_etag_wildcard_missing(client, setup):
+    r = await client.get(SITE.format(*setup, "does-not-exist"), headers={headers.IF_NONE_MATCH: "*"})
+    check_code(status.HTTP_404_NOT_FOUND, r)
+
+
+@pytest.mark.anyio
+async def test_fetch_one_etag_private(client, setup, admin, auto_publish):
+    _id, site = await _create_site()
+    r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(SITE.format(*setup, _id), headers=admin)
+    check_code(status.HTTP_200_OK, r)
+    assert "private" in r.headers[headers.CACHE_CONTROL]
+    etag = r.headers[headers.ETAG]
+
+    r = await client.get(SITE.format(*setup, _id), headers={headers.IF_NONE_MATCH: etag, **admin})
+    check_code(status.HTTP_304_NOT_MODIFIED, r)
+
+    r = await client.get(SITE.format(*setup, _id), headers={headers.IF_NONE_MATCH: etag})
+    check_code(status.HTTP_200_OK, r)
+    assert r.headers[headers.ETAG] != etag
+
+
 @pytest.mark.anyio
 async def test_unpublished_project_site(db, setup, client, admin, auth2, auto_publish):
     _id, site = await _create_site()
@@ -327,6 +394,29 @@ async def test_create_memory_for_site_has_image(setup, client, auth2, admin, ima
     assert site2.image is not None
 
 
+@pytest.mark.anyio
+async def test_fetch_all_memory_images(setup, client, admin, image, auto_publish):
+    """Test random assignment of images from memories for the whole listing
+    """
+    ids = list()
+    for _ in range(0, 3):
+        _id, site = await _create_site()
+        r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+        check_code(status.HTTP_201_CREATED, r)
+        ids.append(_id)
+
+    for _id in ids[:2]:
+        r = await client.post(MEMORIES.format(*setup, _id), json=NewMemory(title="abcdefg", image=image).dict(),
+                              headers=admin)
+        check_code(status.HTTP_201_CREATED, r)
+
+    c = to(Sites, await client.get(SITES.format(setup.project), headers=admin))
+    images = {s.id: s.image for s in c.items}
+    assert images[ids[0]] is not None
+    assert images[ids[1]] is not None
+    assert images[ids[2]] is None
+
+
 @pytest.mark.anyio
 async def test_create_site_non_default_locale_creates_default_placeholder(setup, client, admin, auto_publish):
     _id, site = await _create_site()
@@ -416,6 +506,155 @@ async def test_site_fetch_by_distance(client, setup, db, auth, auto_publish):
     assert b != a != c
 
 
+@pytest.mark.anyio
+async def test_site_fetch_by_bbox(client, setup, db, auth, auto_publish):
+    sites_data = []
+    for i in range(0, 5):
+        _id = genword(length=128)
+        _site = NewSite(
+            id=_id,
+            info=SiteInfo(lang="fi", name=genword(length=50)),
+            location=Point(lon=i * 10 + 1, lat=i * 10 + 1),
+        )
+        r = await client.post(SITES.format(*setup), json=_site.dict(), headers=auth)
+        check_code(status.HTTP_201_CREATED, r)
+        sites_data.append(_site.id)
+
+    r = await client.get(SITES.format(*setup) + "?bbox=5,5,35,35")
+    check_code(status.HTTP_200_OK, r)
+    sites = to(Sites, r)
+
+    assert set(map(lambda o: o.id, sites.items)) == set(sites_data[1:4])
+
+
+@pytest.mark.anyio
+async def test_site_fetch_pages(client, setup, admin, auto_publish):
+    ids = list()
+    for _ in range(0, 5):
+        _id, site = await _create_site()
+        r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+        check_code(status.HTTP_201_CREATED, r)
+        ids.append(_id)
+
+    r = await client.get(SITES.format(*setup) + "?limit=2")
+    check_code(status.HTTP_200_OK, r)
+    first = to(Sites, r)
+    assert len(first.items) == 2
+    assert first.next == first.items[-1].id
+
+    r = await client.get(SITES.format(*setup) + f"?limit=3&after={first.next}")
+    check_code(status.HTTP_200_OK, r)
+    second = to(Sites, r)
+    assert len(second.items) == 3
+
+    r = await client.get(SITES.format(*setup) + f"?limit=3&after={second.next}")
+    check_code(status.HTTP_200_OK, r)
+    assert len(to(Sites, r).items) == 0
+
+    paged = [s.id for s in (*first.items, *second.items)]
+    assert len(paged) == 5
+    assert set(paged) == set(ids)
+
+
+@pytest.mark.anyio
+async def test_site_fetch_fields(client, setup, admin, auto_publish):
+    _id, site = await _create_site()
+    r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(SITES.format(*setup) + "?fields=name,location")
+    check_code(status.HTTP_200_OK, r)
+    item, = r.json()["items"]
+    assert item == dict(
+        id=_id,
+        info=dict(lang="fi", name=site.info.name),
+        location=dict(lat=site.location.lat, lon=site.location.lon),
+    )
+
+
+@pytest.mark.anyio
+async def test_site_fetch_streamed(client, setup, admin, auto_publish):
+    ids = list()
+    for _ in range(3):
+        _id, site = await _create_site()
+        r = await client.post(SITES.format(*setup), json=site.dict(), headers=admin)
+        check_code(status.HTTP_201_CREATED, r)
+        ids.append(_id)
+
+    r = await client.get(SITES.format(*setup), headers=admin)
+    check_code(status.HTTP_200_OK, r)
+    streamed = to(Sites, r)
+
+    r = await client.get(SITES.format(*setup) + "?limit=10", headers=admin)
+    check_code(status.HTTP_200_OK, r)
+    paged = to(Sites, r)
+
+    assert {s.id for s in streamed.items} == set(ids)
+    assert {s.id: s for s in streamed.items} == {s.id: s for s in paged.items}
+
+
+@pytest.mark.parametrize("q", [
+    "?fields=name,secret",
+    "?limit=0",
+    "?n=1&lat=10&lon=10&limit=1",
+])
+@pytest.mark.anyio
+async def test_site_fetch_pages_bad_params(client, setup, q):
+    r = await client.get(SITES.format(*setup) + q)
+    check_code(status.HTTP_422_UNPROCESSABLE_ENTITY, r)
+
+
+@pytest.mark.anyio
+async def test_site_clusters(client, setup, db, auth, auto_publish):
+    for i in range(0, 4):
+        _site = NewSite(
+            id=genword(length=128),
+            info=SiteInfo(lang="fi", name=genword(length=50)),
+            location=Point(lon=i * 10 + 1, lat=i * 10 + 1),
+        )
+        r = await client.post(SITES.format(*setup), json=_site.dict(), headers=auth)
+        check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(CLUSTERS.format(*setup) + "?zoom=0")
+    check_code(status.HTTP_200_OK, r)
+    clusters = to(Clusters, r)
+    assert len(clusters.items) == 1
+    assert clusters.items[0].count == 4
+    assert clusters.items[0].location.lon == pytest.approx(16)
+
+    r = await client.get(CLUSTERS.format(*setup) + "?zoom=5")
+    check_code(status.HTTP_200_OK, r)
+    assert len(to(Clusters, r).items) == 4
+
+    r = await client.get(CLUSTERS.format(*setup) + "?zoom=5&bbox=5,5,25,25")
+    check_code(status.HTTP_200_OK, r)
+    assert len(to(Clusters, r).items) == 2
+
+    _site = NewSite(
+        id=genword(length=128),
+        info=SiteInfo(lang="fi", name=genword(length=50)),
+        location=Point(lon=2, lat=2),
+    )
+    r = await client.post(SITES.format(*setup), json=_site.dict(), headers=auth)
+    check_code(status.HTTP_201_CREATED, r)
+
+    r = await client.get(CLUSTERS.format(*setup) + "?zoom=0")
+    check_code(status.HTTP_200_OK, r)
+    assert to(Clusters, r).items[0].count == 5
+
+
+@pytest.mark.parametrize("q", [
+    "",
+    "?zoom=-1",
+    "?zoom=21",
+    "?zoom=1&bbox=1,2,3",
+])
+@pytest.mark.anyio
+async def test_site_clusters_bad_params(client, setup, q):
+    r = await client.get(CLUSTERS.format(*setup) + q)
+    check_code(status.HTTP_422_UNPROCESSABLE_ENTITY, r)
+
+
 @pytest.mark.anyio
 async def test_sites_include_memories(client, setup, db, auth, auto_publish, repo_config):
     _id, site = await _create_site()
@@ -443,6 +682,11 @@ async def test_sites_include_memories(client, setup, db, auth, auto_publish, rep
     "?n=1&lat=100&lon=10",
     "?n=1&lat=10&lon=-190",
     "?n=1&lat=10&lon=190",
+    "?bbox=1,2,3",
+    "?bbox=a,b,c,d",
+    "?bbox=3,0,1,1",
+    "?bbox=0,-100,1,1",
+    "?n=1&lat=10&lon=10&bbox=0,0,1,1",
 ])
 @pytest.mark.anyio
 async def test_site_fetch_by_distance_bad_params(client, setup, q):
@@ -5,12 +5,14 @@ PROJECTS = ROOT + "/projects"
 PROJECT = PROJECTS + "/{}"
 SITES = PROJECT + "/sites"
 SITE = SITES + "/{}"
+CLUSTERS = PROJECT + "/clusters"
 MEMORIES = SITE + "/memories"
 MEMORY = MEMORIES + "/{}"
 COMMENTS = MEMORY + "/comments"
 COMMENT = COMMENTS + "/{}"
 
-IMAGE = "/images/{}"
+IMAGES = "/images"
+IMAGE = IMAGES + "/{}"
 ADMINS = PROJECT + "/admins"
 
 PUBLISH = "/admin/publish"
@@ -336,3 +336,48 @@ async def test_project_contact_ok(db, pid):
     p = await repo.one(pid)
     assert p.id == pid
     assert p.contact is not None
+
+
+@pytest.fixture
+async def pids(db, user):
+    names = [f"test_project_batch_{i}" for i in range(0, 5)]
+    for name in names:
+        await db.execute(
+            "INSERT INTO projects (name, default_language_id, published) VALUE (:name, 1, 1)",
+            values=dict(name=name),
+        )
+        await db.execute(
+            """
+            INSERT INTO project_information (name, lang_id, project_id) 
+            SELECT :name, 1, id FROM projects WHERE name = :name
+            """,
+            values=dict(name=name),
+        )
+        await db.execute(
+            """
+            INSERT INTO project_admins (project_id, user_id) 
+            SELECT p.id, u.id FROM projects p JOIN users u ON u.username = :user WHERE p.name = :name
+            """,
+            values=dict(name=name, user=user),
+        )
+    yield names
+    for name in names:
+        await db.execute("DELETE FROM projects WHERE name = :name", values=dict(name=name))
+
+
+@pytest.mark.anyio
+async def test_project_all_query_count(db, pids, user, monkeypatch):
+    queries = list()
+    query = db._query
+
+    def counting_query(*args, **kwargs):
+        queries.append(args[0])
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(db, "_query", counting_query)
+    projects = await ProjectRepo(db, *create_config_unauthenticated()).all()
+
+    assert len(queries) == 2
+    assert set(pids) <= set(map(lambda p: p.id, projects))
+    for project in filter(lambda p: p.id in pids, projects):
+        assert project.admins == [user]
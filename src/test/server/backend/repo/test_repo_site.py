@@ -0,0 +1,59 @@
+import pytest
+
+from muistot.backend.models import NewSite, SiteInfo, Point, NewMemory
+from muistot.backend.repos import SiteRepo, MemoryRepo
+from muistot.security import User
+
+
+@pytest.fixture
+async def user(db):
+    username = "test_user_site_repo"
+    _id = await db.fetch_val(
+        "INSERT INTO users (username, email) VALUE (:uname, 'site_repo@example.com') RETURNING id",
+        values=dict(uname=username),
+    )
+    yield User.from_cache(username=username, token="1234")
+    await db.execute("DELETE FROM users WHERE id = :id", values=dict(id=_id))
+
+
+@pytest.fixture
+async def pid(db, user):
+    name = "test_project_site_repo"
+    await db.execute(
+        f"INSERT INTO projects (name, default_language_id, published, auto_publish) VALUE ('{name}', 1, 1, 1)"
+    )
+    await db.execute(
+        f"INSERT INTO project_information (name, lang_id, project_id) "
+        f"VALUE ('{name}', 1, (SELECT id FROM projects WHERE name = '{name}'))"
+    )
+    yield name
+    await db.execute(f"DELETE FROM projects WHERE name = '{name}'")
+
+
+@pytest.fixture
+async def sid(db, pid, user):
+    name = "test_site_repo_site"
+    await SiteRepo(db, "fi", user, project=pid).create(NewSite(
+        id=name,
+        info=SiteInfo(name=name, lang="fi"),
+        location=Point(lat=10, lon=10),
+    ))
+    await MemoryRepo(db, "fi", user, project=pid, site=name).create(NewMemory(title="test memory"))
+    yield name
+
+
+@pytest.mark.anyio
+async def test_site_with_memories_shares_status(db, pid, sid, user, monkeypatch):
+    queries = list()
+    query = db._query
+
+    def counting_query(*args, **kwargs):
+        queries.append(args[0])
+        return query(*args, **kwargs)
+
+    monkeypatch.setattr(db, "_query", counting_query)
+    site = await SiteRepo(db, "fi", user, project=pid).one(sid, include_memories=True)
+
+    assert len(site.memories) == 1
+    # status, site, memories
+    assert len(queries) == 3
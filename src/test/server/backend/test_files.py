@@ -3,7 +3,7 @@ from pathlib import Path
 
 import pytest
 from fastapi import HTTPException
-from muistot.files.files import check_file, Files
+from muistot.files.files import check_file, sniff, Files
 
 EXPECTED_EMPTY = (None, None)
 SAMPLE_IMAGE = Path(__file__).parent / "integration" / "sample_image.jpg"
@@ -122,3 +122,219 @@ async def test_handle_ok_with_mime():
         data2 = "data:image/jpg;base64," + b64encode(f.read()).decode('ascii')
 
     assert data2 == data
+
+
+class MockUpload:
+    BOUNDARY = "test-boundary"
+
+    def __init__(self, data: bytes, chunk: int = 1000, content_length: bool = True, field: str = "file"):
+        body = b"".join([
+            f"--{self.BOUNDARY}\r\n".encode(),
+            b'Content-Disposition: form-data; name="other"\r\n\r\nvalue\r\n',
+            f"--{self.BOUNDARY}\r\n".encode(),
+            f'Content-Disposition: form-data; name="{field}"; filename="sample.jpg"\r\n'.encode(),
+            b"Content-Type: image/jpeg\r\n\r\n",
+            data,
+            f"\r\n--{self.BOUNDARY}--\r\n".encode(),
+        ])
+        self.headers = {"content-type": f"multipart/form-data; boundary={self.BOUNDARY}"}
+        if content_length:
+            self.headers["content-length"] = str(len(body))
+        self.chunks = [body[i:i + chunk] for i in range(0, len(body), chunk)]
+        self.received = 0
+
+    async def stream(self):
+        for chunk in self.chunks:
+            self.received += 1
+            yield chunk
+
+
+class MockInsertDB:
+    async def fetch_one(self, *_, **__):
+        return [1, "abcd.jpeg"]
+
+
+@pytest.fixture
+def location(tmp_path, monkeypatch):
+    from muistot.config import Config
+    monkeypatch.setattr(Config.files, "location", tmp_path)
+    yield tmp_path
+
+
+def test_sniff_head_only():
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        head = f.read(4096)
+    assert sniff(head) == "jpeg"
+
+
+def test_sniff_disallowed():
+    with open(Path(__file__), 'rb') as f:
+        assert sniff(f.read(4096)) is None
+
+
+@pytest.mark.anyio
+async def test_upload_ok(location):
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+
+    assert await Files(MockInsertDB(), MockUser()).upload(MockUpload(data)) == (1, "abcd.jpeg")
+    assert [p.name for p in location.iterdir()] == ["abcd.jpeg"]
+    assert (location / "abcd.jpeg").read_bytes() == data
+
+
+@pytest.mark.anyio
+async def test_upload_disallowed_filetype(location):
+    with open(Path(__file__), 'rb') as f:
+        data = f.read()
+
+    with pytest.raises(HTTPException) as e:
+        await Files(None, MockUser()).upload(MockUpload(data))
+
+    assert e.value.status_code == 400
+    assert list(location.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_upload_too_large_removes_temporary(location, monkeypatch):
+    from muistot.config import Config
+    monkeypatch.setattr(Config.files, "max_upload_bytes", 8192)
+
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+
+    with pytest.raises(HTTPException) as e:
+        await Files(MockInsertDB(), MockUser()).upload(MockUpload(data))
+
+    assert e.value.status_code == 413
+    assert list(location.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_upload_content_length_rejected_early(location, monkeypatch):
+    from muistot.config import Config
+    monkeypatch.setattr(Config.files, "max_upload_bytes", 8192)
+
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        upload = MockUpload(f.read() * 4)
+
+    with pytest.raises(HTTPException) as e:
+        await Files(MockInsertDB(), MockUser()).upload(upload)
+
+    assert e.value.status_code == 413
+    assert upload.received == 0
+
+
+@pytest.mark.anyio
+async def test_upload_too_large_stops_receiving(location, monkeypatch):
+    from muistot.config import Config
+    monkeypatch.setattr(Config.files, "max_upload_bytes", 8192)
+
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        upload = MockUpload(f.read() * 4, content_length=False)
+
+    with pytest.raises(HTTPException) as e:
+        await Files(MockInsertDB(), MockUser()).upload(upload)
+
+    assert e.value.status_code == 413
+    assert upload.received < len(upload.chunks)
+    assert list(location.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_upload_received_into_temporary(location, monkeypatch):
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = f.read()
+    received = []
+
+    async def failing_insert(*_, **__):
+        received.extend((p.name, p.read_bytes()) for p in location.iterdir())
+        raise HTTPException(status_code=503)
+
+    files = Files(None, MockUser())
+    monkeypatch.setattr(files, "_insert", failing_insert)
+    with pytest.raises(HTTPException):
+        await files.upload(MockUpload(data))
+
+    assert len(received) == 1
+    assert received[0][0].startswith(".upload-")
+    assert received[0][1] == data
+    assert list(location.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_upload_missing_file(location):
+    with pytest.raises(HTTPException) as e:
+        await Files(MockInsertDB(), MockUser()).upload(MockUpload(b"data", field="image"))
+
+    assert e.value.status_code == 400
+    assert list(location.iterdir()) == []
+
+
+@pytest.mark.anyio
+async def test_upload_not_multipart(location):
+    upload = MockUpload(b"data")
+    upload.headers["content-type"] = "image/jpeg"
+
+    with pytest.raises(HTTPException) as e:
+        await Files(MockInsertDB(), MockUser()).upload(upload)
+
+    assert e.value.status_code == 400
+    assert upload.received == 0
+
+
+@pytest.mark.anyio
+async def test_handle_reference():
+    class MockDB:
+        async def fetch_val(self, _, values):
+            return 2 if values["image"] == "abcd.jpeg" else None
+
+    files = Files(MockDB(), MockUser())
+    assert await files.handle("abcd.jpeg") == 2
+    with pytest.raises(HTTPException) as e:
+        await files.handle("efgh.jpeg")
+
+    assert e.value.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_workers_refuse_over_backlog(monkeypatch):
+    import threading
+    import anyio
+    from muistot.config import Config
+    from muistot.files.files import Workers
+
+    monkeypatch.setattr(Config.files, "workers", 1)
+    monkeypatch.setattr(Config.files, "backlog", 0)
+    workers = Workers()
+    release = threading.Event()
+
+    async with anyio.create_task_group() as tg:
+        tg.start_soon(workers.run, release.wait)
+        await anyio.sleep(0.05)
+        with pytest.raises(HTTPException) as e:
+            await workers.run(lambda: None)
+        release.set()
+
+    assert e.value.status_code == 503
+
+
+@pytest.mark.anyio
+async def test_handle_fsync(location, monkeypatch):
+    import os
+    from muistot.config import Config
+    monkeypatch.setattr(Config.files, "fsync", True)
+    synced = []
+    real_fsync = os.fsync
+
+    def fsync(fd):
+        synced.append(fd)
+        real_fsync(fd)
+
+    monkeypatch.setattr(os, "fsync", fsync)
+
+    with open(SAMPLE_IMAGE, 'rb') as f:
+        data = b64encode(f.read()).decode('ascii')
+
+    assert await Files(MockInsertDB(), MockUser()).handle(data) == 1
+    assert (location / "abcd.jpeg").exists()
+    assert len(synced) == 1
@@ -1,9 +1,11 @@
 import datetime
 
+import orjson
 import pytest
 from muistot.backend.api.publish import PUPOrder, BAD_TYPE, BAD_PARENTS_CNT, BAD_PARENTS
-from muistot.backend.models import SiteInfo, ProjectInfo, NewProject
+from muistot.backend.models import SiteInfo, ProjectInfo, NewProject, Site, Point, Memory, from_row, project_row
 from muistot.backend.models.user import _UserBase
+from muistot.database.resultset import ResultSet
 from muistot.security import User
 from pydantic import ValidationError
 
@@ -145,3 +147,41 @@ def test_user_country_validator_alpha2():
 def test_user_country_subdiv_raise():
     with pytest.raises(ValidationError):
         _UserBase(country="Gb-bKm")
+
+
+def test_from_row_matches_validated():
+    row = ResultSet(dict(
+        id="aaaa",
+        lon=10.0,
+        lat=20.0,
+        lang="fi",
+        name="name",
+        abstract=None,
+        description=None,
+        image=None,
+        memories_count=2,
+        waiting_approval=1,
+        own=0,
+        creator="user",
+        modifier=None,
+        published=1,
+    ).items())
+    validated = Site(location=Point(**row), info=SiteInfo(**row), **row)
+    constructed = from_row(Site, row, location=from_row(Point, row), info=from_row(SiteInfo, row))
+    assert constructed.dict(exclude_none=True) == validated.dict(exclude_none=True)
+    assert constructed.waiting_approval is True
+    assert constructed.own is False
+    assert "published" not in constructed.dict()
+
+
+def test_projected_rows_json_types():
+    from muistot.backend.api.utils import ORJSONResponse
+    from muistot.backend.repos.site import SiteRepo
+
+    row = ResultSet(dict(id="aaaa", memories_count=2, waiting_approval=1, own=None, creator="user").items())
+    site = SiteRepo.project_site(row, {"memories_count", "waiting_approval", "own", "creator"})
+    memory = project_row(Memory, ResultSet(dict(id=1, title="t", waiting_approval=0, own=1).items()))
+    listing = orjson.loads(ORJSONResponse(dict(sites=[site], memories=[memory])).body)
+
+    assert listing["sites"] == [dict(id="aaaa", memories_count=2, waiting_approval=True, own=None, creator="user")]
+    assert listing["memories"] == [dict(id=1, title="t", waiting_approval=False, own=True)]
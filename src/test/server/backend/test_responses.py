@@ -0,0 +1,43 @@
+import json
+from datetime import datetime
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from muistot.backend.api.utils import ORJSONResponse, serialize
+from muistot.backend.models import Memory, Memories
+
+
+def _memories():
+    return Memories(items=[
+        Memory(id=1, title="ääkköset", user="user", modified_at=datetime(2022, 1, 2, 3, 4, 5, 6)),
+        Memory(id=2, title="title", user="user", story="story", modified_at=datetime(2022, 1, 2)),
+    ])
+
+
+def test_render_matches_json_response():
+    content = _memories()
+    expected = JSONResponse(jsonable_encoder(content, exclude_none=True)).body
+    assert json.loads(ORJSONResponse(content).body) == json.loads(expected)
+
+
+def test_render_datetime():
+    data = json.loads(ORJSONResponse(_memories()).body)
+    assert data["items"][0]["modified_at"] == "2022-01-02T03:04:05.000006"
+    assert data["items"][1]["modified_at"] == "2022-01-02T00:00:00"
+
+
+def test_serialize_excludes_none():
+    data = json.loads(serialize(dict(items=[dict(id=1, image=None)], next=None)).body)
+    assert data == dict(items=[dict(id=1)])
+
+
+def test_not_modified_ignores_wildcard():
+    from starlette.requests import Request
+    from muistot.backend.api.utils.cache import not_modified
+
+    def request(value: str) -> Request:
+        return Request(dict(type="http", headers=[(b"if-none-match", value.encode())]))
+
+    assert not not_modified(request("*"), 'W/"abc"')
+    assert not_modified(request('W/"abc"'), 'W/"abc"')
+    assert not_modified(request('"abc", "def"'), 'W/"abc"')
@@ -7,7 +7,10 @@ from muistot.database import IntegrityError
 class MockManager:
 
     def __getattr__(self, item):
-        return lambda *_, **__: None
+        async def noop(*_, **__):
+            return None
+
+        return noop
 
 
 @pytest.mark.anyio
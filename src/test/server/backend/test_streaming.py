@@ -0,0 +1,30 @@
+import json
+from datetime import datetime
+
+import pytest
+from muistot.backend.api.utils.streaming import _encode
+from muistot.backend.models import Memory
+
+
+async def _items(*items):
+    for item in items:
+        yield item
+
+
+async def _collect(items, chunk_size):
+    return b"".join([chunk async for chunk in _encode(items, chunk_size)])
+
+
+@pytest.mark.anyio
+async def test_empty():
+    assert json.loads(await _collect(_items(), 1)) == dict(items=[])
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("chunk_size", [1, 64 * 1024])
+async def test_items(chunk_size):
+    out = await _collect(_items(dict(id=1, title="ä"), Memory(id=2, title="bee", user="user", modified_at=datetime.utcnow())), chunk_size)
+    data = json.loads(out)
+    assert data["items"][0] == dict(id=1, title="ä")
+    assert data["items"][1]["id"] == 2
+    assert "image" not in data["items"][1]
@@ -2,6 +2,7 @@ from asyncio import sleep
 
 import pytest
 import redis
+from redis import asyncio as aioredis
 
 from muistot.config import Config
 from muistot.database import Database, DatabaseProvider, OperationalError
@@ -18,7 +19,8 @@ async def db_instance(anyio_backend) -> DatabaseProvider:
     i = 10
     while True:
         try:
-            async with inst():
+            async with inst() as c:
+                await c.execute("SELECT 1")
                 break
         except OperationalError:
             """Database not ready
@@ -51,3 +53,10 @@ def cache_redis():
 @pytest.fixture(scope="session")
 def session_redis():
     yield redis.from_url(Config.sessions.redis_url)
+
+
+@pytest.fixture(scope="session")
+async def async_session_redis(anyio_backend):
+    instance = aioredis.from_url(Config.sessions.redis_url)
+    yield instance
+    await instance.close()
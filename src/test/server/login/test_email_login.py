@@ -80,12 +80,12 @@ async def test_email_login_max_tries(non_existent_email, client, cache_redis, ca
 
     for _ in range(3):
         # Clear email rate limits
-        cache_redis.delete(*cache_redis.keys('email-login:*'))
+        cache_redis.delete(*cache_redis.keys('ratelimit:*'))
         r = await client.post(f"{EMAIL_EXCHANGE}?{urlencode(dict(user=user, token=token[:-1]))}")
         assert r.status_code == status.HTTP_404_NOT_FOUND
 
     # Clear email rate limits
-    cache_redis.delete(*cache_redis.keys('email-login:*'))
+    cache_redis.delete(*cache_redis.keys('ratelimit:*'))
     # Assert after decrementing the key a few time we will not be able to log in with the correct token
     r = await client.post(f"{EMAIL_EXCHANGE}?{urlencode(dict(user=user, token=token))}")
     assert r.status_code == status.HTTP_404_NOT_FOUND